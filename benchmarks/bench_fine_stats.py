@@ -0,0 +1,141 @@
+"""
+Benchmark the vectorized fine statistics engine against the original loop.
+
+Run from the repository root:
+    python benchmarks/bench_fine_stats.py
+"""
+import os
+import sys
+import random
+import timeit
+import datetime
+from collections import Counter, defaultdict
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "traffic_fine_analyzer"))
+
+from app import FineEntry
+from fine_stats import FineColumns, compute_statistics
+
+FINE_TYPES = ["Speeding", "Red Light", "Illegal Parking", "Seatbelt", "Phone Use", "Lane Violation"]
+LOCATIONS = ["Sheikh Zayed Rd", "Al Khail Rd", "Emirates Rd", "Al Wasl Rd", None]
+
+def make_fines(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        FineEntry(
+            date=f"20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            type=rng.choice(FINE_TYPES),
+            amount=float(rng.choice([150, 300, 400, 600, 1000, 3000])),
+            location=rng.choice(LOCATIONS)
+        )
+        for _ in range(count)
+    ]
+
+def loop_statistics(fines):
+    """The per-fine Python loop that analyze_fines used before the columnar engine"""
+    total_fines = len(fines)
+    total_amount = sum(fine.amount for fine in fines)
+    fine_types = {}
+    for fine in fines:
+        if fine.type in fine_types:
+            fine_types[fine.type] += 1
+        else:
+            fine_types[fine.type] = 1
+    sorted_fine_types = sorted(fine_types.items(), key=lambda x: x[1], reverse=True)
+    most_common_fine = sorted_fine_types[0][0] if sorted_fine_types else "None"
+    return {
+        "total_fines": total_fines,
+        "total_amount": total_amount,
+        "fine_types": dict(sorted_fine_types),
+        "most_common_fine": most_common_fine
+    }
+
+def loop_full_statistics(fines):
+    """The same aggregates as compute_statistics, written as per-fine Python loops"""
+    stats = loop_statistics(fines)
+    amount_by_type = defaultdict(float)
+    dates_by_type = defaultdict(list)
+    months = Counter()
+    weekdays = Counter()
+    locations = Counter()
+    for fine in fines:
+        amount_by_type[fine.type] += fine.amount
+        day = datetime.date.fromisoformat(fine.date[:10])
+        dates_by_type[fine.type].append(day)
+        months[day.strftime("%Y-%m")] += 1
+        weekdays[day.weekday()] += 1
+        if fine.location:
+            locations[fine.location] += 1
+
+    amounts = sorted(fine.amount for fine in fines)
+    def percentile(p):
+        position = p / 100 * (len(amounts) - 1)
+        low = int(position)
+        high = min(low + 1, len(amounts) - 1)
+        return amounts[low] + (amounts[high] - amounts[low]) * (position - low)
+
+    intervals = {}
+    for fine_type, days in dates_by_type.items():
+        days.sort()
+        gaps = [(b - a).days for a, b in zip(days, days[1:])]
+        if gaps:
+            intervals[fine_type] = {
+                "repeats": len(gaps),
+                "mean_days": round(sum(gaps) / len(gaps), 1),
+                "min_days": min(gaps)
+            }
+
+    stats.update(
+        amount_by_type={name: round(total, 2) for name, total in amount_by_type.items()},
+        amount_percentiles={p: round(percentile(p), 2) for p in (25, 50, 75, 90)},
+        monthly_histogram=dict(sorted(months.items())),
+        weekday_histogram=[weekdays[i] for i in range(7)],
+        repeat_offense_intervals=intervals,
+        top_locations=locations.most_common(5)
+    )
+    return stats
+
+def vectorized_statistics(fines):
+    return compute_statistics(FineColumns.from_fines(fines))
+
+HEADERS = ["basic loop (ms)", "full loop (ms)", "engine (ms)", "aggregates only (ms)"]
+WIDTHS = [len(header) + 2 for header in HEADERS]
+
+def timing(fn, runs):
+    return min(timeit.repeat(fn, number=runs, repeat=3)) / runs * 1000
+
+def main():
+    # basic loop: the four statistics analyze_fines used to compute
+    # full loop: every statistic the engine computes, in pure Python
+    # engine: column conversion plus vectorized aggregates
+    print(f"{'fines':>8}" + "".join(f"{header:>{width}}" for header, width in zip(HEADERS, WIDTHS)))
+    for count in (100, 1000, 10000, 50000):
+        fines = make_fines(count)
+
+        expected = loop_statistics(fines)
+        actual = vectorized_statistics(fines)
+        for key in ("total_fines", "fine_types", "most_common_fine"):
+            assert actual[key] == expected[key], key
+        assert abs(actual["total_amount"] - expected["total_amount"]) < 1e-6 * count
+
+        full = loop_full_statistics(fines)
+        assert actual["monthly_histogram"] == full["monthly_histogram"]
+        assert list(actual["weekday_histogram"].values()) == full["weekday_histogram"]
+        assert actual["repeat_offense_intervals"] == full["repeat_offense_intervals"]
+        assert [v for k, v in sorted(actual["amount_percentiles"].items()) if k.startswith("p")] == \
+            [full["amount_percentiles"][p] for p in (25, 50, 75, 90)]
+
+        runs = max(3, 20000 // count)
+        columns = FineColumns.from_fines(fines)
+        timings = [
+            timing(lambda: loop_statistics(fines), runs),
+            timing(lambda: loop_full_statistics(fines), runs),
+            timing(lambda: vectorized_statistics(fines), runs),
+            timing(lambda: compute_statistics(columns), runs)
+        ]
+        print(f"{count:>8}" + "".join(f"{ms:>{width}.3f}" for ms, width in zip(timings, WIDTHS)))
+
+if __name__ == "__main__":
+    main()
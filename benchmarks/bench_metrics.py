@@ -0,0 +1,53 @@
+"""
+Measure the cost of the instrumentation added to each request.
+
+Run from the repository root:
+    python benchmarks/bench_metrics.py
+"""
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+
+from common import metrics
+
+RUNS = 200000
+
+def timed_stage():
+    with metrics.stage("bench"):
+        pass
+
+def traced_stage():
+    token = metrics._current_trace.set(metrics.Trace("0" * 32, "bench"))
+    try:
+        with metrics.stage("bench"):
+            pass
+    finally:
+        metrics._current_trace.reset(token)
+
+def upstream():
+    with metrics.upstream_call("bench") as call:
+        call.set_status(200)
+
+def main():
+    histogram = metrics.histogram("bench_seconds", "Benchmark histogram", ("kind",))
+    counter = metrics.counter("bench_total", "Benchmark counter", ("kind",))
+    cases = [
+        ("counter inc", lambda: counter.labels("a").inc()),
+        ("histogram observe", lambda: histogram.labels("a").observe(0.123)),
+        ("stage (untraced)", timed_stage),
+        ("stage (traced)", traced_stage),
+        ("upstream call", upstream)
+    ]
+    print(f"{'operation':>20} {'ns per call':>12}")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=RUNS, repeat=3)) / RUNS
+        print(f"{name:>20} {seconds * 1e9:>12.0f}")
+
+    render_ms = min(timeit.repeat(metrics.registry.render, number=100, repeat=3)) / 100 * 1000
+    print(f"rendering /metrics: {render_ms:.3f} ms")
+
+if __name__ == "__main__":
+    main()
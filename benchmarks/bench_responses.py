@@ -0,0 +1,70 @@
+"""
+Compare response encodings for a typical fine analysis result: stdlib json
+against orjson, with and without full_analysis, uncompressed and compressed.
+
+Run from the repository root:
+    python benchmarks/bench_responses.py
+"""
+import os
+import sys
+import json
+import timeit
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+
+from common import responses
+
+RUNS = 2000
+
+SECTIONS = {
+    "pattern_analysis": "Most of your fines are for speeding on weekday mornings along the same commuter route. " * 6,
+    "safety_tips": "1. Leave ten minutes earlier.\n2. Use cruise control on the highway.\n3. Watch for school zones.\n" * 4,
+    "educational_info": "Speeding raises both the chance of a crash and its severity, since stopping distance grows with the square of speed. " * 4,
+    "financial_savings": "Avoiding repeat speeding fines would save about 1,800 AED a year. " * 3,
+    "behavioral_changes": "Plan trips with slack, keep to the right lane and let navigation warn you about limits. " * 4
+}
+
+def analysis_result():
+    full = "\n\n".join(f"## {name.replace('_', ' ').title()}\n{text}" for name, text in SECTIONS.items())
+    return {
+        "statistics": {
+            "total_fines": 42,
+            "total_amount": 12600.0,
+            "fine_types": {"Speeding": 30, "Parking": 8, "Red light": 4},
+            "most_common_fine": "Speeding",
+            "monthly_histogram": {f"2024-{month:02d}": 3 + month % 4 for month in range(1, 13)},
+            "weekday_histogram": {"Monday": 9, "Tuesday": 8, "Wednesday": 7, "Thursday": 8, "Friday": 6, "Saturday": 2, "Sunday": 2}
+        },
+        "analysis": SECTIONS,
+        "full_analysis": full
+    }
+
+def stdlib(content):
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def main():
+    result = analysis_result()
+    print(f"orjson {'installed' if responses.orjson else 'not installed'}, "
+          f"brotli {'installed' if responses.brotli else 'not installed'}")
+    # Times include encoding, so compressed rows are the full cost of a response body
+    print(f"{'encoding':>26} {'bytes':>8} {'us per response':>16}")
+    cases = [("json", stdlib, result)]
+    if responses.orjson:
+        cases.append(("orjson", responses.dumps, result))
+    cases.append(("orjson lean" if responses.orjson else "json lean", responses.dumps, responses.lean_result(result)))
+    for name, encode, content in cases:
+        body = encode(content)
+        seconds = min(timeit.repeat(lambda: encode(content), number=RUNS, repeat=3)) / RUNS
+        print(f"{name:>26} {len(body):>8} {seconds * 1e6:>16.1f}")
+        for encoding in ("gzip", "br"):
+            if encoding == "br" and responses.brotli is None:
+                continue
+            compressed = responses.compress(body, encoding)
+            seconds = min(timeit.repeat(
+                lambda: responses.compress(encode(content), encoding), number=RUNS // 10, repeat=3
+            )) / (RUNS // 10)
+            print(f"{name + ' + ' + encoding:>26} {len(compressed):>8} {seconds * 1e6:>16.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark the single-pass section parser against the original find-based
+extractors on large outputs. tests/test_sections.py checks that both give
+the same results on fuzzed output.
+
+Run from the repository root:
+    python benchmarks/bench_section_parser.py
+"""
+import os
+import sys
+import random
+import timeit
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "traffic_fine_analyzer"))
+sys.path.insert(0, os.path.join(ROOT, "road_hazard_reporter"))
+
+from sections import SECTIONS, extract_sections
+from fields import FIELDS, extract_fields
+from tests.test_sections import legacy_sections, legacy_fields
+
+def make_output(size, markers, heading, seed=7):
+    """A well-formed output of roughly size characters with one heading per marker"""
+    rng = random.Random(seed)
+    words = ["traffic", "speed", "signal", "lane", "driver", "safety", "road", "limit", "brake"]
+    body_size = size // len(markers)
+    parts = []
+    for marker in markers:
+        body = []
+        length = 0
+        while length < body_size:
+            word = rng.choice(words)
+            body.append(word)
+            length += len(word) + 1
+        parts.append(heading.format(marker) + "\n" + " ".join(body) + "\n")
+    return "".join(parts)
+
+def main():
+    print(f"{'chars':>10} {'kind':>9} {'original (ms)':>14} {'parser (ms)':>12}")
+    for size in (2000, 20000, 200000, 2000000):
+        cases = [
+            ("sections", make_output(size, [s for _, s, _ in SECTIONS], "## {}"), legacy_sections, extract_sections),
+            ("fields", make_output(size, [s for _, s, _ in FIELDS], "{}:"), legacy_fields, extract_fields)
+        ]
+        for kind, text, legacy, parser in cases:
+            runs = max(3, 200000 // size)
+            legacy_ms = min(timeit.repeat(lambda: legacy(text), number=runs, repeat=3)) / runs * 1000
+            parser_ms = min(timeit.repeat(lambda: parser(text), number=runs, repeat=3)) / runs * 1000
+            print(f"{size:>10} {kind:>9} {legacy_ms:>14.3f} {parser_ms:>12.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""
+Drive the road hazard and traffic fine APIs at a target request rate and
+report throughput, latency percentiles and server memory.
+
+With --spawn the DeepSeek mock, the Ollama mock and both APIs are started
+locally on free ports (temporary databases, fixed seeds), so a run only
+depends on its arguments. Mock behaviour is set with --deepseek-profile and
+--ollama-profile, given as FaultProfile query strings. Without --spawn the
+running services at --traffic-url and --road-url are used.
+
+Run from the repository root, for example:
+    python benchmarks/load_test.py --spawn --rps 20 --duration 30 \\
+        --scenario fines=3 --scenario hazard=1 \\
+        --deepseek-profile "latency=lognormal:3000,0.5&tokens_per_second=40" \\
+        --ollama-profile "latency=uniform:3000,30000&error_rate=0.05"
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import socket
+import shutil
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SCENARIOS = ["fines", "fines-stream", "fleet", "hazard", "hazard-stream"]
+FINE_TYPES = ["Speeding", "Red Light", "Illegal Parking", "Seatbelt", "Phone Use", "Lane Violation"]
+LOCATIONS = ["Sheikh Zayed Rd", "Al Khail Rd", "Emirates Rd", "Al Wasl Rd", None]
+
+def percentile(values, share):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class Payloads:
+    """
+    Request bodies generated from a seed.
+
+    Request i gets payload i, except that a `repeat` share of requests reuse
+    an earlier payload so cache behaviour can be exercised on purpose.
+    Images come from a pool of distinct pictures (distinct perceptual hashes
+    too), generated before the run so the client spends no time encoding.
+    """
+
+    def __init__(self, seed, fines_per_history, fleet_size, image_pool, image_size, repeat):
+        self.seed = seed
+        self.fines_per_history = fines_per_history
+        self.fleet_size = fleet_size
+        self.repeat = repeat
+        self.images = [self._image(i, image_size) for i in range(image_pool)]
+
+    def _index(self, i):
+        rng = random.Random(self.seed * 1000003 + i)
+        if i and rng.random() < self.repeat:
+            return rng.randrange(i)
+        return i
+
+    def fines(self, i):
+        rng = random.Random(self.seed * 7919 + self._index(i))
+        return {
+            "fines": [
+                {
+                    "date": f"20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    "type": rng.choice(FINE_TYPES),
+                    "amount": float(rng.choice([150, 300, 400, 600, 1000, 3000])),
+                    "location": rng.choice(LOCATIONS)
+                }
+                for _ in range(self.fines_per_history)
+            ]
+        }
+
+    def fleet(self, i):
+        return {"drivers": {f"driver-{i}-{j}": self.fines(i * self.fleet_size + j) for j in range(self.fleet_size)}}
+
+    def image(self, i):
+        return self.images[self._index(i) % len(self.images)]
+
+    def _image(self, i, size):
+        from PIL import Image
+        rng = random.Random(self.seed * 31 + i)
+        tile = Image.frombytes("RGB", (16, 12), rng.randbytes(16 * 12 * 3))
+        buffer = io.BytesIO()
+        tile.resize(size, Image.BILINEAR).save(buffer, "JPEG", quality=85)
+        return buffer.getvalue()
+
+class Result:
+    __slots__ = ("scenario", "status", "latency", "first_byte", "error")
+
+    def __init__(self, scenario, status=None, latency=None, first_byte=None, error=None):
+        self.scenario = scenario
+        self.status = status
+        self.latency = latency
+        self.first_byte = first_byte
+        self.error = error
+
+async def send(client, scenario, i, args, payloads):
+    """Send request i of a scenario and time it to the last byte (and first byte for streams)"""
+    if scenario.startswith("fines") or scenario == "fleet":
+        path = {"fines": "/analyze", "fines-stream": "/analyze-stream", "fleet": "/analyze-fleet"}[scenario]
+        body = payloads.fleet(i) if scenario == "fleet" else payloads.fines(i)
+        request = client.build_request("POST", args.traffic_url + path, json=body)
+    else:
+        url = args.road_url + "/analyze" + ("?mode=stream" if scenario == "hazard-stream" else "")
+        files = {"file": (f"load-{i}.jpg", payloads.image(i), "image/jpeg")}
+        request = client.build_request("POST", url, files=files, data={"location": "Load test"})
+
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        response = await client.send(request, stream=True)
+        try:
+            async for chunk in response.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+        finally:
+            await response.aclose()
+    except httpx.HTTPError as e:
+        return Result(scenario, latency=time.perf_counter() - started, error=type(e).__name__)
+    return Result(scenario, response.status_code, time.perf_counter() - started, first_byte)
+
+def process_tree(pid):
+    """pid and all of its descendants (Linux /proc)"""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+def rss_bytes(pid):
+    """Resident set size of a process, or None once it is gone"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+class MemorySampler:
+    """Samples the RSS of each server process (and its workers) while the load runs"""
+
+    def __init__(self, pids, interval=0.5):
+        self.pids = pids  # name -> pid
+        self.interval = interval
+        self.peak = {}  # (name, pid) -> bytes
+        self.last = {}
+
+    def sample(self):
+        for name, root in self.pids.items():
+            for pid in process_tree(root):
+                rss = rss_bytes(pid)
+                if rss is not None:
+                    key = (name, pid)
+                    self.last[key] = rss
+                    self.peak[key] = max(self.peak.get(key, 0), rss)
+
+    async def run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+async def run_load(args, payloads, sampler):
+    """Issue requests open-loop at args.rps for args.duration seconds and collect their results"""
+    rng = random.Random(args.seed)
+    weighted = [(name, weight) for name, weight in args.scenario]
+    names = [name for name, _ in weighted]
+    weights = [weight for _, weight in weighted]
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    timeout = httpx.Timeout(args.timeout)
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    tasks = []
+    dropped = 0
+
+    async def one(scenario, i):
+        try:
+            return await send(client, scenario, i, args, payloads)
+        finally:
+            in_flight.release()
+
+    sampler_task = asyncio.ensure_future(sampler.run()) if sampler else None
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        next_at = started
+        i = 0
+        while next_at - started < args.duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scenario = rng.choices(names, weights)[0]
+            if in_flight.locked():
+                # Open loop: a request that cannot be sent on schedule counts as dropped
+                dropped += 1
+            else:
+                await in_flight.acquire()
+                tasks.append(asyncio.ensure_future(one(scenario, i)))
+            i += 1
+            gap = rng.expovariate(args.rps) if args.arrivals == "poisson" else 1 / args.rps
+            next_at += gap
+        sent_for = time.perf_counter() - started
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        health = await upstream_health(client, args)
+    if sampler_task:
+        sampler_task.cancel()
+        sampler.sample()
+    return results, dropped, sent_for, elapsed, health
+
+async def upstream_health(client, args):
+    """Circuit breaker state of each API under test, which shows when a run was served by fallbacks"""
+    health = {}
+    tested = {name for name, _ in args.scenario}
+    for name, url, scenarios in [
+        ("traffic-fine-api", args.traffic_url, {"fines", "fines-stream", "fleet"}),
+        ("road-hazard-api", args.road_url, {"hazard", "hazard-stream"})
+    ]:
+        if not tested & scenarios:
+            continue
+        try:
+            response = await client.get(url + "/health")
+            health[name] = response.json().get("upstreams")
+        except (httpx.HTTPError, ValueError):
+            health[name] = None
+    return health
+
+def summarize(results, dropped, sent_for, elapsed, health, sampler):
+    report = {
+        "sent": len(results),
+        "dropped": dropped,
+        "send_seconds": sent_for,
+        "elapsed_seconds": elapsed,
+        "scenarios": {},
+        "upstreams": health
+    }
+    for scenario in sorted({result.scenario for result in results}):
+        rows = [result for result in results if result.scenario == scenario]
+        ok = sorted(result.latency for result in rows if result.status is not None and result.status < 400)
+        first = sorted(result.first_byte for result in rows if result.first_byte is not None and result.status and result.status < 400)
+        statuses = {}
+        for result in rows:
+            key = str(result.status) if result.status is not None else result.error
+            statuses[key] = statuses.get(key, 0) + 1
+        report["scenarios"][scenario] = {
+            "requests": len(rows),
+            "ok": len(ok),
+            "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+            "latency_ms": {name: percentile(ok, share) * 1000 if ok else None for name, share in [("p50", 0.5), ("p95", 0.95), ("p99", 0.99)]},
+            "first_byte_ms": {name: percentile(first, share) * 1000 if first else None for name, share in [("p50", 0.5), ("p95", 0.95), ("p99", 0.99)]},
+            "statuses": statuses
+        }
+    if sampler:
+        report["rss_mb"] = {
+            f"{name}[{pid}]": {"peak": sampler.peak[(name, pid)] / 2 ** 20, "last": sampler.last.get((name, pid), 0) / 2 ** 20}
+            for name, pid in sorted(sampler.peak)
+        }
+    return report
+
+def print_report(report):
+    def ms(value):
+        return f"{value:.0f}" if value is not None else "-"
+
+    print(f"sent {report['sent']} requests in {report['send_seconds']:.1f}s, "
+          f"{report['dropped']} dropped at the in-flight limit, all done after {report['elapsed_seconds']:.1f}s")
+    print(f"{'scenario':>14} {'ok/total':>10} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttfb p50':>9}  statuses")
+    for scenario, row in report["scenarios"].items():
+        latency = row["latency_ms"]
+        print(f"{scenario:>14} {row['ok']:>4}/{row['requests']:<5} {row['throughput_rps']:>7.2f} "
+              f"{ms(latency['p50']):>8} {ms(latency['p95']):>8} {ms(latency['p99']):>8} "
+              f"{ms(row['first_byte_ms']['p50']):>9}  {row['statuses']}")
+    for name, upstreams in report["upstreams"].items():
+        for upstream, breaker in (upstreams or {}).items():
+            print(f"{name} -> {upstream}: circuit {breaker['state']}, opened {breaker['times_opened']} times, "
+                  f"{breaker['rejected']} calls rejected")
+    for name, rss in report.get("rss_mb", {}).items():
+        print(f"RSS {name}: peak {rss['peak']:.1f} MB, last {rss['last']:.1f} MB")
+
+class Services:
+    """The mocks and both APIs started as local uvicorn processes"""
+
+    def __init__(self, args):
+        self.args = args
+        self.data_dir = tempfile.mkdtemp(prefix="load-test-")
+        self.processes = {}
+        self.logs = []
+
+    def _start(self, name, directory, port, env, workers=1):
+        log = open(os.path.join(self.data_dir, f"{name}.log"), "wb")
+        self.logs.append(log)
+        command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+        if workers > 1:
+            command += ["--workers", str(workers)]
+        self.processes[name] = subprocess.Popen(
+            command,
+            cwd=os.path.join(ROOT, directory),
+            env=dict(os.environ, PYTHONPATH=ROOT, **env),
+            stdout=log,
+            stderr=subprocess.STDOUT
+        )
+        return f"http://127.0.0.1:{port}"
+
+    def start(self):
+        args = self.args
+        deepseek = self._start("deepseek-mock", "deepseek_mock", free_port(), {"MOCK_SEED": str(args.seed)})
+        ollama_urls = []
+        for i in range(args.ollama_backends):
+            ollama = self._start(f"ollama-mock-{i}", "ollama_mock", free_port(), {
+                "MOCK_SEED": str(args.seed + i),
+                "OLLAMA_NUM_PARALLEL": str(args.ollama_parallel)
+            })
+            ollama_urls.append(ollama + "/api/chat" + (f"?{args.ollama_profile}" if args.ollama_profile else ""))
+        deepseek_url = deepseek + "/v1/chat/completions" + (f"?{args.deepseek_profile}" if args.deepseek_profile else "")
+
+        # Every request comes from this one client, so per-client rate limits are off unless asked for
+        admission = {"RATE_LIMIT_RPS": str(args.rate_limit)}
+        if args.admission_concurrency:
+            admission["ADMISSION_MAX_CONCURRENCY"] = str(args.admission_concurrency)
+        if args.admission_wait is not None:
+            admission["ADMISSION_MAX_WAIT"] = str(args.admission_wait)
+
+        args.traffic_url = self._start("traffic-fine-api", "traffic_fine_analyzer", free_port(), {
+            "DEEPSEEK_API_URL": deepseek_url,
+            "DEEPSEEK_API_KEY": "mock-api-key",
+            "DRIVER_DB": os.path.join(self.data_dir, "drivers.db"),
+            **admission
+        }, args.workers)
+        args.road_url = self._start("road-hazard-api", "road_hazard_reporter", free_port(), {
+            "OLLAMA_BACKENDS": " ".join(ollama_urls),
+            "JOB_DB": os.path.join(self.data_dir, "jobs.db"),
+            "JOB_DIR": os.path.join(self.data_dir, "job_images"),
+            "REPORT_DB": os.path.join(self.data_dir, "reports.db"),
+            **admission
+        }, args.workers)
+        self._wait_ready([deepseek] + [url.split("/api/chat")[0] for url in ollama_urls] + [args.traffic_url, args.road_url])
+
+    def _wait_ready(self, urls, timeout=30):
+        deadline = time.monotonic() + timeout
+        for url in urls:
+            while True:
+                try:
+                    if httpx.get(url + "/", timeout=1).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise SystemExit(f"{url} did not start; logs are in {self.data_dir}")
+                time.sleep(0.2)
+
+    def pids(self):
+        return {name: process.pid for name, process in self.processes.items() if name.endswith("-api")}
+
+    def stop(self):
+        for process in self.processes.values():
+            process.send_signal(signal.SIGINT)
+        for process in self.processes.values():
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for log in self.logs:
+            log.close()
+        if not self.args.keep_logs:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+def scenario_weight(value):
+    name, _, weight = value.partition("=")
+    if name not in SCENARIOS:
+        raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+    return name, float(weight or 1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", action="append", type=scenario_weight,
+                        help=f"scenario[=weight], repeatable; one of {', '.join(SCENARIOS)} (default fines)")
+    parser.add_argument("--rps", type=float, default=10, help="target request rate")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to send requests for")
+    parser.add_argument("--arrivals", choices=["uniform", "poisson"], default="poisson")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="requests beyond this are dropped, not queued")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=float, default=0.0, help="share of requests reusing an earlier payload")
+    parser.add_argument("--fines", type=int, default=20, help="fines per history")
+    parser.add_argument("--fleet-size", type=int, default=20, help="drivers per fleet request")
+    parser.add_argument("--image-pool", type=int, default=64, help="distinct images to send")
+    parser.add_argument("--image-size", default="1280x960", help="image width x height")
+    parser.add_argument("--spawn", action="store_true", help="start mocks and APIs locally for the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per spawned API")
+    parser.add_argument("--deepseek-profile", default="", help="DeepSeek mock fault profile query string")
+    parser.add_argument("--ollama-profile", default="", help="Ollama mock fault profile query string")
+    parser.add_argument("--ollama-backends", type=int, default=1, help="Ollama mocks to spawn behind the router")
+    parser.add_argument("--ollama-parallel", type=int, default=0,
+                        help="requests each spawned Ollama mock generates at once (0 = no limit)")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="per-client requests per second for spawned APIs (0 = no limit)")
+    parser.add_argument("--admission-concurrency", type=int, default=0,
+                        help="analyses each spawned API runs at once (0 = service default)")
+    parser.add_argument("--admission-wait", type=float, help="seconds a spawned API queues a request before shedding it")
+    parser.add_argument("--traffic-url", default="http://localhost:8002/api/traffic-fine")
+    parser.add_argument("--road-url", default="http://localhost:8001/api/road-hazard")
+    parser.add_argument("--pid", action="append", default=[], metavar="NAME=PID",
+                        help="server process to sample RSS from when not spawning, repeatable")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--keep-logs", action="store_true", help="keep spawned service logs and databases")
+    args = parser.parse_args()
+    args.scenario = args.scenario or [("fines", 1.0)]
+    args.image_size = tuple(int(side) for side in args.image_size.lower().split("x"))
+    return args
+
+def main():
+    args = parse_args()
+    uses_images = any(name.startswith("hazard") for name, _ in args.scenario)
+    payloads = Payloads(
+        args.seed, args.fines, args.fleet_size, args.image_pool if uses_images else 0, args.image_size, args.repeat
+    )
+
+    services = Services(args) if args.spawn else None
+    if services:
+        services.start()
+        pids = services.pids()
+    else:
+        pids = {name: int(pid) for name, _, pid in (value.partition("=") for value in args.pid)}
+    sampler = MemorySampler(pids) if pids and os.path.isdir("/proc") else None
+
+    try:
+        results, dropped, sent_for, elapsed, health = asyncio.run(run_load(args, payloads, sampler))
+    finally:
+        if services:
+            services.stop()
+
+    report = summarize(results, dropped, sent_for, elapsed, health, sampler)
+    report["arguments"] = {key: value for key, value in vars(args).items() if key not in ("pid",)}
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
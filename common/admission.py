@@ -0,0 +1,366 @@
+import os
+import re
+import math
+import time
+import asyncio
+import ipaddress
+from collections import OrderedDict, deque
+
+from starlette.responses import JSONResponse
+
+from common.metrics import counter, gauge, histogram
+
+# Admission settings, per process
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get("ADMISSION_MAX_CONCURRENCY", "32"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", "10"))
+ADMISSION_BATCH_SHARE = float(os.environ.get("ADMISSION_BATCH_SHARE", "0.5"))  # Of the slots batch work may hold
+# Per-client token buckets; a rate of 0 disables rate limiting
+RATE_LIMIT_RPS = float(os.environ.get("RATE_LIMIT_RPS", "5"))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Addresses or networks of reverse proxies whose X-Real-IP header is believed, comma separated
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.environ.get("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+]
+
+# Highest priority first
+PRIORITIES = ("interactive", "batch")
+
+ADMISSION_REJECTED = counter(
+    "admission_rejected_total",
+    "Requests turned away before running, by reason (rate_limited, queue_full, shed, queue_timeout)",
+    ("priority", "reason")
+)
+ADMISSION_ACTIVE = gauge("admission_active", "Admitted requests running", ("priority",))
+ADMISSION_QUEUED = gauge("admission_queued", "Requests waiting for a slot", ("priority",))
+ADMISSION_WAIT = histogram("admission_wait_seconds", "Time admitted requests waited for a slot", ("priority",))
+
+class Rejected(Exception):
+    """Raised when a request is not admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, status_code, reason, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `burst`"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """Spend a token; return 0 if one was available, else seconds until there is one"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """
+    One token bucket per client, keeping the max_clients most recently seen.
+
+    A client evicted while idle comes back with a full bucket, which is what
+    it would have refilled to anyway unless it was evicted within
+    burst / rate seconds of its last request.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, client):
+        """Return 0 if client may make a request now, else seconds to wait"""
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        wait = bucket.take(now)
+        if wait:
+            self.limited += 1
+        return wait
+
+    def stats(self):
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "limited": self.limited
+        }
+
+class AdmissionController:
+    """
+    Bounds the requests running at once, with a short priority queue in front.
+
+    Up to max_concurrency requests run; batch requests may hold at most
+    batch_share of those slots, so interactive requests always find room
+    soon. Others wait in FIFO order per priority, higher priorities first,
+    for at most max_wait seconds. When max_queue requests are already
+    waiting, a new request displaces the newest waiter of a lower priority,
+    or is rejected if there is none. Rejections are immediate 503s with a
+    Retry-After estimated from recent service times, so the requests that
+    are admitted keep a bounded wait however far demand exceeds capacity.
+    """
+
+    def __init__(self, max_concurrency=ADMISSION_MAX_CONCURRENCY, max_queue=ADMISSION_MAX_QUEUE,
+                 max_wait=ADMISSION_MAX_WAIT, batch_share=ADMISSION_BATCH_SHARE):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.limits = {
+            "interactive": max_concurrency,
+            "batch": max(1, int(max_concurrency * batch_share))
+        }
+
+        self.active = {priority: 0 for priority in PRIORITIES}
+        self._waiters = {priority: deque() for priority in PRIORITIES}
+        self.admitted = 0
+        self.rejected = {}
+        self.service_seconds = 1.0  # Moving average of how long admitted requests run
+
+    @property
+    def running(self):
+        return sum(self.active.values())
+
+    @property
+    def waiting(self):
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _can_start(self, priority):
+        return self.running < self.max_concurrency and self.active[priority] < self.limits[priority]
+
+    def _start(self, priority):
+        self.active[priority] += 1
+        self.admitted += 1
+        ADMISSION_ACTIVE.labels(priority).inc()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to be free, rounded up"""
+        backlog = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(backlog * self.service_seconds))
+
+    def _reject(self, priority, reason, detail, status_code=503):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTED.labels(priority, reason).inc()
+        return Rejected(status_code, reason, detail, self.retry_after())
+
+    async def acquire(self, priority):
+        """Wait for a slot for a request of this priority; raises Rejected"""
+        if self._can_start(priority) and not any(self._waiters[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1]):
+            self._start(priority)
+            ADMISSION_WAIT.labels(priority).observe(0.0)
+            return
+
+        if self.waiting >= self.max_queue:
+            if not self._shed_below(priority):
+                raise self._reject(priority, "queue_full", "Server is busy, please retry later")
+
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters[priority]
+        waiters.append(future)
+        ADMISSION_QUEUED.labels(priority).inc()
+        started = time.monotonic()
+        try:
+            await asyncio.wait({future}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(priority, future)
+            raise
+        if not future.done():
+            self._abandon(priority, future)
+            raise self._reject(priority, "queue_timeout", "Timed out waiting for a free slot")
+        # Raises Rejected if the request was shed to make room for a higher priority
+        future.result()
+        ADMISSION_WAIT.labels(priority).observe(time.monotonic() - started)
+
+    def _abandon(self, priority, future):
+        """Clean up after a waiter that gave up; hand its slot on if it had just been given one"""
+        if future.done() and not future.cancelled() and future.exception() is None:
+            self.release(priority, 0.0)
+            return
+        try:
+            self._waiters[priority].remove(future)
+            ADMISSION_QUEUED.labels(priority).dec()
+        except ValueError:
+            pass
+        future.cancel()
+
+    def _shed_below(self, priority):
+        """Reject the newest waiter of a lower priority than this one; return True if there was one"""
+        for lower in reversed(PRIORITIES[PRIORITIES.index(priority) + 1:]):
+            waiters = self._waiters[lower]
+            if waiters:
+                future = waiters.pop()
+                ADMISSION_QUEUED.labels(lower).dec()
+                future.set_exception(self._reject(lower, "shed", "Shed to make room for higher priority requests"))
+                return True
+        return False
+
+    def release(self, priority, elapsed):
+        """Free a slot held for elapsed seconds and start the next waiters that fit"""
+        self.active[priority] -= 1
+        ADMISSION_ACTIVE.labels(priority).dec()
+        if elapsed:
+            self.service_seconds += 0.1 * (elapsed - self.service_seconds)
+        self._dispatch()
+
+    def _dispatch(self):
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self._can_start(priority):
+                future = waiters.popleft()
+                ADMISSION_QUEUED.labels(priority).dec()
+                if future.done():
+                    continue
+                self._start(priority)
+                future.set_result(None)
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "limits": self.limits,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait,
+            "active": dict(self.active),
+            "waiting": {priority: len(waiters) for priority, waiters in self._waiters.items()},
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "service_seconds": round(self.service_seconds, 3)
+        }
+
+def _compile_route(path):
+    """Regex for a route path, with {param} matching one path segment"""
+    pattern = re.sub(r"\\\{[^}]*\\\}", "[^/]+", re.escape(path))
+    return re.compile(pattern + "$")
+
+def _is_trusted_proxy(host, trusted_proxies):
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+def client_key(scope, trusted_proxies=TRUSTED_PROXIES):
+    """
+    The client a request counts against: the peer address, or the X-Real-IP
+    header when the peer is one of trusted_proxies. Headers from anyone else
+    are ignored, since a client could pick a new value for every request.
+    """
+    client = scope.get("client")
+    if not client:
+        return "unknown"
+    host = client[0]
+    if trusted_proxies and _is_trusted_proxy(host, trusted_proxies):
+        for name, value in scope.get("headers", []):
+            if name == b"x-real-ip":
+                real_ip = value.decode("latin-1").strip()
+                try:
+                    # Normalized, so one address cannot appear under several spellings
+                    return str(ipaddress.ip_address(real_ip))
+                except ValueError:
+                    break
+    return host
+
+def request_priority(scope, default):
+    """
+    The route's default priority, or a lower one named by an X-Priority
+    header. Clients may defer their own work but not jump the queue.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"x-priority":
+            priority = value.decode("latin-1").strip().lower()
+            if priority in PRIORITIES and PRIORITIES.index(priority) > PRIORITIES.index(default):
+                return priority
+            return default
+    return default
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying rate limits and admission control to expensive routes.
+
+    routes maps POST paths (with {param} placeholders) to their default
+    priority; every other request passes straight through. A client over its
+    rate limit gets 429, a request that cannot be admitted gets 503, both
+    with Retry-After and before the request body is read.
+    """
+
+    def __init__(self, app, routes, controller, rate_limiter):
+        self.app = app
+        self.routes = [(_compile_route(path), priority) for path, priority in routes.items()]
+        self.controller = controller
+        self.rate_limiter = rate_limiter
+
+    def _route_priority(self, scope):
+        if scope["method"] != "POST":
+            return None
+        for pattern, priority in self.routes:
+            if pattern.match(scope["path"]):
+                return priority
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = self._route_priority(scope)
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        priority = request_priority(scope, priority)
+
+        if self.rate_limiter.enabled:
+            wait = self.rate_limiter.check(client_key(scope))
+            if wait:
+                ADMISSION_REJECTED.labels(priority, "rate_limited").inc()
+                await self._refuse(scope, receive, send, 429, "Rate limit exceeded", math.ceil(wait))
+                return
+
+        try:
+            await self.controller.acquire(priority)
+        except Rejected as e:
+            await self._refuse(scope, receive, send, e.status_code, e.detail, e.retry_after)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(priority, time.monotonic() - started)
+
+    async def _refuse(self, scope, receive, send, status_code, detail, retry_after):
+        response = JSONResponse(
+            status_code=status_code,
+            content={"detail": detail},
+            headers={"Retry-After": str(retry_after)}
+        )
+        await response(scope, receive, send)
+
+def admission_stats(controller, rate_limiter):
+    """Stats of both admission layers, for the services' /admission endpoints"""
+    return {
+        "admission": controller.stats(),
+        "rate_limit": rate_limiter.stats() if rate_limiter.enabled else None
+    }
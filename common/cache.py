@@ -0,0 +1,146 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from starlette.concurrency import run_in_threadpool
+
+TABLE_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+
+class MemoryCache:
+    """LRU cache with a per-entry TTL, bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+class DiskCache:
+    """SQLite-backed cache tier that survives restarts, stored in its own table"""
+
+    def __init__(self, path, ttl, table):
+        if not TABLE_NAME.match(table):
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"DELETE FROM {table} WHERE expires_at < ?", (time.time(),))
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return row[0]
+
+    def set(self, key, serialized):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, serialized, time.time() + self.ttl)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class TieredCache:
+    """
+    Two-tier cache of JSON-serializable values: in-memory LRU in front of an
+    optional SQLite store (db_path empty disables it). Entries are sized by
+    their serialized length, and disk hits are promoted to memory.
+
+    Both tiers hold the serialized form and every get() decodes a fresh
+    copy, so callers may change what they get without touching the cache.
+    Disk reads and writes run in the thread pool.
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl, db_path, table):
+        self.memory = MemoryCache(max_entries, max_bytes, ttl)
+        self.disk = DiskCache(db_path, ttl, table) if db_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key):
+        serialized = self.memory.get(key)
+        if serialized is not None:
+            self.memory_hits += 1
+            return json.loads(serialized)
+
+        if self.disk is not None:
+            serialized = await run_in_threadpool(self.disk.get, key)
+            if serialized is not None:
+                self.disk_hits += 1
+                self.memory.set(key, serialized, len(serialized))
+                return json.loads(serialized)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key, value):
+        serialized = json.dumps(value)
+        self.memory.set(key, serialized, len(serialized))
+        if self.disk is not None:
+            await run_in_threadpool(self.disk.set, key, serialized)
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.total_bytes,
+            "disk_enabled": self.disk is not None
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
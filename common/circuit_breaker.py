@@ -0,0 +1,142 @@
+import os
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitBreaker:
+    """
+    Circuit breaker for calls to one upstream service.
+
+    Outcomes of the last `window` calls are kept. Once at least `min_calls`
+    have been seen, the circuit opens when the share of failures reaches
+    `failure_rate` or the share of calls slower than `slow_call_seconds`
+    reaches `slow_rate`. While open, allow() returns False so callers can
+    degrade immediately instead of waiting on a sick dependency. After
+    `open_seconds` the circuit goes half-open and lets `half_open_calls`
+    probe calls through: a fast success closes it, a failure or slow call
+    opens it again.
+
+    Callers check allow() before the call and then report exactly one of
+    success(elapsed), failure() or release() (call abandoned, no verdict).
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5, slow_call_seconds=30.0,
+                 slow_rate=0.8, open_seconds=30.0, half_open_calls=1):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls, name, prefix, **defaults):
+        """Build a breaker whose settings can be overridden by {prefix}_BREAKER_* variables"""
+        settings = dict(defaults)
+        for option, cast in [
+            ("window", int), ("min_calls", int), ("failure_rate", float), ("slow_call_seconds", float),
+            ("slow_rate", float), ("open_seconds", float), ("half_open_calls", int)
+        ]:
+            value = os.environ.get(f"{prefix}_BREAKER_{option.upper()}")
+            if value is not None:
+                settings[option] = cast(value)
+        return cls(name, **settings)
+
+    @property
+    def state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return self._state
+
+    @property
+    def is_open(self):
+        """True while calls are being rejected outright"""
+        return self.state == OPEN
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a probe through"""
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)) if self.is_open else 0.0
+
+    def allow(self):
+        """Return True if a call may go ahead now"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._state = HALF_OPEN
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def success(self, elapsed):
+        slow = elapsed >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if slow:
+                self._open()
+            else:
+                self._close()
+            return
+        self._record(False, slow)
+
+    def failure(self):
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            self._open()
+            return
+        self._record(True, False)
+
+    def release(self):
+        """Give back a half-open probe slot for a call that ended without a verdict"""
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def _record(self, failed, slow):
+        if self._state != CLOSED:
+            # Late result of a call started before the circuit opened
+            return
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow_calls = sum(1 for _, slow in self._outcomes if slow)
+        if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_rate:
+            self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes = 0
+        self.times_opened += 1
+
+    def _close(self):
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._probes = 0
+
+    def snapshot(self):
+        """Breaker state for health endpoints"""
+        calls = len(self._outcomes)
+        state = self.state
+        snapshot = {
+            "state": state,
+            "window_calls": calls,
+            "failure_rate": sum(1 for failed, _ in self._outcomes if failed) / calls if calls else 0.0,
+            "slow_rate": sum(1 for _, slow in self._outcomes if slow) / calls if calls else 0.0,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened
+        }
+        if state == OPEN:
+            snapshot["retry_after_seconds"] = round(self.retry_after(), 1)
+        return snapshot
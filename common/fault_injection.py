@@ -0,0 +1,171 @@
+import os
+import math
+import random
+import asyncio
+
+from starlette.responses import JSONResponse
+
+FILLER = (
+    "Drivers should keep a safe distance, watch for changing conditions and "
+    "report road hazards early so they can be repaired before they cause harm."
+)
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution into a function of a Random returning seconds.
+
+    Specs, in milliseconds:
+    - "0" or "fixed:2000"
+    - "uniform:3000,30000" (min, max)
+    - "normal:8000,2000" (mean, standard deviation; clipped at 0)
+    - "lognormal:5000,0.6" (median, sigma)
+    - "exponential:4000" (mean)
+    """
+    name, _, args = spec.partition(":")
+    if not args:
+        name, args = "fixed", name
+    try:
+        values = [float(value) for value in args.split(",")]
+    except ValueError:
+        raise ValueError(f"Invalid latency spec {spec!r}")
+
+    if name == "fixed" and len(values) == 1:
+        fixed = max(0.0, values[0]) / 1000
+        return lambda rng: fixed
+    if name == "uniform" and len(values) == 2:
+        low, high = sorted(values)
+        return lambda rng: max(0.0, rng.uniform(low, high)) / 1000
+    if name == "normal" and len(values) == 2:
+        mean, std = values
+        return lambda rng: max(0.0, rng.gauss(mean, std)) / 1000
+    if name == "lognormal" and len(values) == 2 and values[0] > 0:
+        mu, sigma = math.log(values[0]), values[1]
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+    if name == "exponential" and len(values) == 1 and values[0] > 0:
+        rate = 1 / values[0]
+        return lambda rng: rng.expovariate(rate) / 1000
+    raise ValueError(f"Invalid latency spec {spec!r}")
+
+class FaultProfile:
+    """
+    How a mock upstream misbehaves: latency, pacing, failures and reply size.
+
+    - latency: distribution of the time to the first token (see parse_latency)
+    - tokens_per_second: generation speed; streams send one word-sized
+      piece per token and non-streaming replies wait for the whole text.
+      None keeps each mock's default pacing.
+    - error_rate / error_status: share of requests answered with an HTTP
+      error, whose status is picked from error_status
+    - hang_rate / hang_seconds: share of requests that get no answer for
+      hang_seconds, as with an upstream that stopped responding
+    - abort_rate: share of streams cut off partway through
+    - response_tokens: pad replies with filler to at least this many words
+
+    Profiles come from {prefix}_* environment variables and can be
+    overridden per request with the same names as query parameters, so a
+    service under test can pick a profile through its upstream URL.
+    """
+
+    OPTIONS = [
+        ("latency", str), ("tokens_per_second", float), ("error_rate", float), ("error_status", str),
+        ("hang_rate", float), ("hang_seconds", float), ("abort_rate", float), ("response_tokens", int)
+    ]
+
+    def __init__(self, latency="0", tokens_per_second=None, error_rate=0.0, error_status="500",
+                 hang_rate=0.0, hang_seconds=600.0, abort_rate=0.0, response_tokens=None, rng=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.abort_rate = abort_rate
+        self.response_tokens = response_tokens
+        self.rng = rng or random.Random()
+
+        self._latency = parse_latency(latency)
+        try:
+            self._statuses = [int(status) for status in str(error_status).split(",")]
+        except ValueError:
+            raise ValueError(f"Invalid error status list {error_status!r}")
+        if tokens_per_second is not None and tokens_per_second <= 0:
+            raise ValueError("tokens_per_second must be positive")
+
+    @classmethod
+    def from_env(cls, prefix="MOCK"):
+        """Build a profile from {prefix}_LATENCY, {prefix}_ERROR_RATE, ...; {prefix}_SEED fixes the random sequence"""
+        settings = {}
+        for option, cast in cls.OPTIONS:
+            value = os.environ.get(f"{prefix}_{option.upper()}")
+            if value is not None:
+                settings[option] = cast(value)
+        seed = os.environ.get(f"{prefix}_SEED")
+        return cls(rng=random.Random(int(seed)) if seed is not None else None, **settings)
+
+    def with_overrides(self, params):
+        """Return a profile with options replaced by matching query parameters (raises ValueError)"""
+        settings = {option: getattr(self, option) for option, _ in self.OPTIONS}
+        changed = False
+        for option, cast in self.OPTIONS:
+            if option in params:
+                try:
+                    settings[option] = cast(params[option])
+                except ValueError:
+                    raise ValueError(f"Invalid value for {option}: {params[option]!r}")
+                changed = True
+        if not changed:
+            return self
+        return FaultProfile(rng=self.rng, **settings)
+
+    def first_token_delay(self):
+        return self._latency(self.rng)
+
+    def token_delay(self, default=0.0):
+        """Seconds between streamed tokens"""
+        return 1 / self.tokens_per_second if self.tokens_per_second else default
+
+    def generation_time(self, text):
+        """Seconds a non-streaming reply of text takes to generate (0 unless tokens_per_second is set)"""
+        return len(text.split()) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def pad(self, text):
+        """Pad text with filler sentences up to response_tokens words"""
+        if not self.response_tokens:
+            return text
+        missing = self.response_tokens - len(text.split())
+        if missing <= 0:
+            return text
+        words = FILLER.split()
+        filler = [words[i % len(words)] for i in range(missing)]
+        return text.rstrip() + "\n" + " ".join(filler) + "\n"
+
+    def abort_after(self, pieces):
+        """Number of pieces to send before cutting a stream off, or None to send them all"""
+        if pieces and self.abort_rate and self.rng.random() < self.abort_rate:
+            return self.rng.randrange(pieces)
+        return None
+
+    async def inject(self):
+        """
+        Apply the failure modes that come before any output.
+
+        Hangs or waits out the first-token latency, then returns an error
+        response to send instead of the reply, or None to go ahead.
+        """
+        if self.hang_rate and self.rng.random() < self.hang_rate:
+            await asyncio.sleep(self.hang_seconds)
+        delay = self.first_token_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            status = self.rng.choice(self._statuses)
+            headers = {"Retry-After": "1"} if status in (429, 503) else None
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": "Injected failure", "type": "mock_error"}},
+                headers=headers
+            )
+        return None
+
+class StreamAborted(Exception):
+    """Raised inside a streaming response to drop the connection mid-stream"""
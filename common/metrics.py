@@ -0,0 +1,366 @@
+import os
+import time
+import random
+import contextvars
+from bisect import bisect_left
+from collections import deque
+
+from starlette.responses import Response
+
+# Sampled tracing settings
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+TRACE_KEEP = int(os.environ.get("TRACE_KEEP", "100"))
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))  # 256 B .. 64 MiB
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children = {}
+        if not self.label_names:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        """Return the child for one combination of label values (created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+class Counter(_Metric):
+    """A count that only goes up, optionally split by labels"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.value += amount
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}"]
+
+class Gauge(Counter):
+    """A value that goes up and down, such as requests in flight"""
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self._default.value -= amount
+
+    def set(self, value):
+        self._default.value = value
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(_Metric):
+    """
+    Observations counted into fixed buckets, optionally split by labels.
+
+    Each observation is one bisect over the bucket bounds and three
+    additions; the cumulative counts Prometheus expects are only built when
+    the metrics are rendered.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(float(bound))
+            labels = _format_labels(self.label_names, values, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric, or return the one already registered under its name"""
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+
+# Metrics shared by every service
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests handled", ("method", "handler", "status"))
+HTTP_LATENCY = histogram("http_request_duration_seconds", "Time to send the full HTTP response", ("method", "handler"))
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests being handled")
+STAGE_LATENCY = histogram("stage_duration_seconds", "Time spent in each processing stage", ("stage",))
+UPSTREAM_REQUESTS = counter(
+    "upstream_requests_total",
+    "Calls to upstream services by outcome (HTTP status, timeout, error or rejected)",
+    ("upstream", "status")
+)
+UPSTREAM_IN_FLIGHT = gauge("upstream_requests_in_flight", "Calls to upstream services in progress", ("upstream",))
+PAYLOAD_SIZE = histogram("payload_size_bytes", "Size of request, upstream and response payloads", ("kind",), SIZE_BUCKETS)
+
+class Trace:
+    """Spans recorded for one sampled request"""
+
+    __slots__ = ("trace_id", "name", "started", "wall_started", "spans")
+
+    def __init__(self, trace_id, name):
+        self.trace_id = trace_id
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans = []
+
+    def to_dict(self, duration):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.wall_started,
+            "duration_ms": round(duration * 1000, 3),
+            "spans": [
+                {"name": name, "offset_ms": round(offset * 1000, 3), "duration_ms": round(elapsed * 1000, 3)}
+                for name, offset, elapsed in self.spans
+            ]
+        }
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+recent_traces = deque(maxlen=TRACE_KEEP)
+
+class stage:
+    """
+    Context manager that times a processing stage.
+
+    The duration goes into stage_duration_seconds and, when the current
+    request is sampled for tracing, into its trace as a span.
+
+        with stage("deepseek"):
+            ...
+    """
+
+    __slots__ = ("name", "started", "labels")
+
+    def __init__(self, name):
+        self.name = name
+        self.labels = STAGE_LATENCY.labels(name)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        ended = time.perf_counter()
+        elapsed = ended - self.started
+        self.labels.observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((self.name, self.started - trace.started, elapsed))
+        return False
+
+def observe_stage(name, elapsed):
+    """Record a stage whose time was added up over several steps"""
+    STAGE_LATENCY.labels(name).observe(elapsed)
+
+def _incoming_trace_id(headers):
+    """Trace id from a W3C traceparent header whose sampled flag is set, or None"""
+    for name, value in headers:
+        if name == b"traceparent":
+            parts = value.decode("latin-1").split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and parts[3][-1:] in "13579bdf":
+                return parts[1]
+            return None
+    return None
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts and times every HTTP request.
+
+    Requests are labelled by the name of the endpoint function that handled
+    them, which keeps label values bounded whatever the path parameters.
+    A TRACE_SAMPLE_RATE share of requests, plus those arriving with a
+    sampled traceparent header, record their stages as a trace; the last
+    TRACE_KEEP traces with at least one stage are served by traces_endpoint.
+    """
+
+    def __init__(self, app, sample_rate=TRACE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        trace = None
+        trace_id = _incoming_trace_id(scope.get("headers", []))
+        if trace_id is None and self.sample_rate > 0 and random.random() < self.sample_rate:
+            trace_id = "%032x" % random.getrandbits(128)
+        if trace_id is not None:
+            trace = Trace(trace_id, f"{scope['method']} {scope['path']}")
+            token = _current_trace.set(trace)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - started
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "none")
+            HTTP_REQUESTS.labels(scope["method"], handler, str(status)).inc()
+            HTTP_LATENCY.labels(scope["method"], handler).observe(elapsed)
+            if trace is not None:
+                _current_trace.reset(token)
+                if trace.spans:
+                    recent_traces.append(trace.to_dict(elapsed))
+
+class upstream_call:
+    """
+    Context manager around one call to an upstream service.
+
+    Tracks the calls in flight and times the call as a stage named after the
+    upstream. The outcome is counted once: the status given to set_status(),
+    unless the block raises after a successful status (a stream that broke
+    off, say), in which case the kind of exception is counted instead.
+    """
+
+    __slots__ = ("upstream", "status", "stage", "in_flight")
+
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.status = None
+        self.stage = stage(upstream)
+        self.in_flight = UPSTREAM_IN_FLIGHT.labels(upstream)
+
+    def set_status(self, status):
+        self.status = str(status)
+
+    def __enter__(self):
+        self.in_flight.inc()
+        self.stage.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stage.__exit__(exc_type, exc, tb)
+        self.in_flight.dec()
+        status = self.status
+        if exc_type is not None and (status is None or status.startswith("2")):
+            name = exc_type.__name__
+            if "Timeout" in name:
+                status = "timeout"
+            elif name in ("CancelledError", "GeneratorExit"):
+                status = "cancelled"
+            else:
+                status = "error"
+        UPSTREAM_REQUESTS.labels(self.upstream, status or "ok").inc()
+        return False
+
+def upstream_rejected(upstream):
+    """Count a call that was not made, because of an open circuit or a full queue"""
+    UPSTREAM_REQUESTS.labels(upstream, "rejected").inc()
+
+def observe_size(kind, size):
+    PAYLOAD_SIZE.labels(kind).observe(size)
+
+async def metrics_endpoint():
+    """Current metrics in the Prometheus text exposition format"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+async def traces_endpoint():
+    """The most recent sampled traces, newest first"""
+    return list(reversed(recent_traces))
@@ -0,0 +1,54 @@
+import asyncio
+
+from starlette.exceptions import HTTPException
+
+from common.responses import dumps_text
+
+async def stream_shared_results(items, label, prepare, concurrency, count_name, present=None):
+    """
+    Work through many items with bounded concurrency and yield one NDJSON line
+    per item as each finishes, followed by a summary line.
+
+    label(item) gives the fields identifying an item's line. prepare(item) is
+    awaited and returns (key, factory), where factory() returns a coroutine
+    computing the result; items with the same key share the call of the first
+    one, and at most concurrency calls run at once. present(item, result), if
+    given, turns a shared result into the item's own. An HTTPException from
+    prepare or the call becomes an error line with its status, anything else
+    a 500. The summary counts the items (as count_name), distinct calls and
+    errors. Closing the generator cancels whatever is still running.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    shared = {}
+
+    async def call_limited(factory):
+        async with semaphore:
+            return await factory()
+
+    async def run(item):
+        line = label(item)
+        try:
+            key, factory = await prepare(item)
+            task = shared.get(key)
+            if task is None:
+                task = shared[key] = asyncio.ensure_future(call_limited(factory))
+            result = await task
+            line.update(status="ok", result=present(item, result) if present is not None else result)
+        except HTTPException as e:
+            line.update(status="error", status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            line.update(status="error", status_code=500, detail=f"Internal server error: {str(e)}")
+        return line
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    errors = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            if line["status"] != "ok":
+                errors += 1
+            yield dumps_text(line) + "\n"
+        yield dumps_text({"summary": {count_name: len(items), "unique": len(shared), "errors": errors}}) + "\n"
+    finally:
+        for task in tasks + list(shared.values()):
+            task.cancel()
@@ -0,0 +1,131 @@
+import os
+import json
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from common.metrics import observe_size
+
+try:
+    import orjson
+except ImportError:  # Optional: responses fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip is offered without it
+    brotli = None
+
+# Response compression settings
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "5"))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "4"))
+# Default of the ?lean= query parameter, which leaves full_analysis out of analysis results
+LEAN_RESPONSES = os.environ.get("LEAN_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+def dumps(content):
+    """Encode content as compact UTF-8 JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_text(content):
+    """dumps() as a str, for NDJSON lines and server-sent events"""
+    return dumps(content).decode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with dumps()"""
+
+    def render(self, content):
+        return dumps(content)
+
+def lean_result(result):
+    """An analysis result without full_analysis, which repeats the text of the parsed sections"""
+    if "full_analysis" not in result:
+        return result
+    return {key: value for key, value in result.items() if key != "full_analysis"}
+
+def negotiate_encoding(accept_encoding):
+    """Pick "br" or "gzip" from an Accept-Encoding header value, or None for identity"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+def compress(body, encoding, best=False):
+    """Compress body; best trades CPU for size, for content compressed once and served many times"""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, 9 if best else COMPRESS_GZIP_LEVEL, mtime=0)
+
+def is_compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses whole response bodies with brotli or gzip.
+
+    Only responses with a Content-Length, sent in one body message, are
+    compressed, so streamed responses (server-sent events, NDJSON) pass
+    through untouched and keep flushing as they are produced. Bodies under
+    minimum_size, already encoded or of a binary type are sent as they are.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                length = headers.get("content-length")
+                if (
+                    length is not None and int(length) >= self.minimum_size
+                    and "content-encoding" not in headers
+                    and is_compressible(headers.get("content-type", ""))
+                ):
+                    # Hold the headers until the body shows whether it comes in one piece
+                    start = message
+                    return
+            elif start is not None:
+                held, start = start, None
+                headers = MutableHeaders(raw=held["headers"])
+                if not message.get("more_body", False):
+                    headers.add_vary_header("Accept-Encoding")
+                    if encoding is not None:
+                        body = compress(message.get("body", b""), encoding)
+                        if len(body) < int(headers["content-length"]):
+                            headers["Content-Encoding"] = encoding
+                            headers["Content-Length"] = str(len(body))
+                            message = dict(message, body=body)
+                            observe_size("response_" + encoding, len(body))
+                await send(held)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
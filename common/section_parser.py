@@ -0,0 +1,155 @@
+from bisect import bisect_left
+
+class _Finder:
+    """
+    str.find over one text with each pattern's searched range remembered.
+
+    For each pattern the first occurrence at or after the lowest index
+    searched so far is kept. A later query from a lower index only scans
+    the gap below that range, so no part of the text is scanned twice for
+    the same pattern while queries move forward, and nothing is sliced.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._searched = {}  # pattern -> (lowest index searched, first occurrence from there or -1)
+
+    def find(self, pattern, index=0):
+        entry = self._searched.get(pattern)
+        if entry is None:
+            position = self.text.find(pattern, index)
+            self._searched[pattern] = (index, position)
+            return position
+
+        low, position = entry
+        if index >= low:
+            if position == -1 or index <= position:
+                return position
+            return self.text.find(pattern, index)
+
+        # Only occurrences starting in [index, low) are unknown
+        found = self.text.find(pattern, index, low + len(pattern) - 1)
+        if found == -1:
+            found = position
+        self._searched[pattern] = (index, found)
+        return found
+
+class SectionParser:
+    """
+    Parser for model output split into named sections.
+
+    sections is a list of (key, marker, next_marker) in the order the prompt
+    asks for them; next_marker is None for the last section. All sections
+    are cut from one text with position-based searches: each heading form of
+    each marker ("## Name", "**Name**" and plain "Name", which also matches
+    numbered headings like "1. Name") is located at most once per region,
+    and the text is never sliced or copied until the content is returned.
+
+    headings() follows the heading rules of the analyzers' original
+    extract_section and fields() the inline rules of the original
+    extract_info, so both return exactly what those functions returned.
+    """
+
+    def __init__(self, sections):
+        self.sections = list(sections)
+
+    def headings(self, text):
+        """
+        Return {key: content or None} for sections introduced by heading lines.
+
+        A section starts on the line after its heading, preferring the
+        "## " form, then **bold**, then plain text, and runs up to the next
+        section's heading in the same order of preference.
+        """
+        finder = _Finder(text)
+        result = {}
+        for key, start_marker, end_marker in self.sections:
+            start_idx = -1
+            for pattern in (f"## {start_marker}", f"**{start_marker}**", start_marker):
+                start_idx = finder.find(pattern)
+                if start_idx != -1:
+                    break
+            if start_idx == -1:
+                result[key] = None
+                continue
+
+            # Move past the heading
+            start_idx = text.find("\n", start_idx)
+            if start_idx == -1:
+                result[key] = None
+                continue
+            start_idx += 1
+
+            end_idx = -1
+            if end_marker:
+                for pattern in (f"## {end_marker}", f"**{end_marker}**", end_marker):
+                    end_idx = finder.find(pattern, start_idx)
+                    if end_idx != -1:
+                        break
+            result[key] = (text[start_idx:end_idx] if end_idx != -1 else text[start_idx:]).strip()
+        return result
+
+    def fields(self, text):
+        """
+        Return {key: content or None} for fields introduced by inline markers.
+
+        A field's content runs from the end of its marker's first occurrence
+        up to the next field's marker.
+        """
+        finder = _Finder(text)
+        result = {}
+        for key, start_marker, end_marker in self.sections:
+            start_idx = finder.find(start_marker)
+            if start_idx == -1:
+                result[key] = None
+                continue
+            start_idx += len(start_marker)
+
+            end_idx = finder.find(end_marker, start_idx) if end_marker else -1
+            result[key] = (text[start_idx:end_idx] if end_idx != -1 else text[start_idx:]).strip()
+        return result
+
+class StreamScanner:
+    """
+    Forward-only pattern search over text that arrives in pieces.
+
+    Every occurrence of a fixed set of patterns is recorded as the text
+    arrives. Each delta is scanned once, together with the few characters
+    before it that a pattern could straddle, so find() is a binary search
+    over the recorded positions rather than a rescan of everything received.
+    The pieces are only joined when text is read.
+    """
+
+    def __init__(self, patterns):
+        self._patterns = list(dict.fromkeys(patterns))
+        self._overlap = max(len(pattern) for pattern in self._patterns) - 1
+        self._hits = {pattern: [] for pattern in self._patterns}  # pattern -> positions, ascending
+        self._parts = []
+        self._tail = ""
+        self.length = 0
+
+    def feed(self, delta):
+        region = self._tail + delta
+        offset = self.length - len(self._tail)
+        for pattern in self._patterns:
+            hits = self._hits[pattern]
+            # Occurrences lying wholly in the tail were recorded with an earlier delta
+            position = region.find(pattern, max(0, len(self._tail) - len(pattern) + 1))
+            while position != -1:
+                hits.append(offset + position)
+                position = region.find(pattern, position + 1)
+        self._parts.append(delta)
+        self.length += len(delta)
+        self._tail = region[-self._overlap:] if self._overlap else ""
+
+    def find(self, pattern, index=0):
+        """Position of the first occurrence of pattern at or after index, or -1, as str.find"""
+        hits = self._hits[pattern]
+        i = bisect_left(hits, index)
+        return hits[i] if i < len(hits) else -1
+
+    @property
+    def text(self):
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
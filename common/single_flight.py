@@ -0,0 +1,68 @@
+import asyncio
+from collections import Counter
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running wait on the same task and get its result or exception.
+    Nothing is kept once the task finishes, so this complements a result
+    cache rather than replacing it. If every waiter goes away (for example
+    all clients disconnected) the shared task is cancelled.
+    """
+
+    def __init__(self):
+        self._flights = {}  # key -> [task, current waiters, total waiters]
+        self.flights = 0
+        self.coalesced = 0
+        self.waiters_per_flight = Counter()  # total waiters -> number of finished flights
+
+    def __contains__(self, key):
+        """Whether a call for key is in flight, so run() would join it rather than call factory"""
+        return key in self._flights
+
+    async def run(self, key, factory, cleanup=None):
+        """
+        Return the result of factory() for key, sharing one in-flight call per key.
+
+        cleanup, if given, is called once a call started here has ended, however
+        it ended (even cancelled before it ran), to release what it was handed.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(factory())
+            flight = self._flights[key] = [task, 0, 0]
+            self.flights += 1
+            task.add_done_callback(lambda _: self._finish(key, flight))
+            if cleanup is not None:
+                task.add_done_callback(lambda _: cleanup())
+        else:
+            self.coalesced += 1
+
+        flight[1] += 1
+        flight[2] += 1
+        try:
+            return await asyncio.shield(flight[0])
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not flight[0].done():
+                # Forget the flight now: a request arriving before the task has
+                # wound down must start a new call, not join a cancelled one
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight[0].cancel()
+
+    def _finish(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        self.waiters_per_flight[flight[2]] += 1
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "in_flight_waiters": {key[:16]: flight[1] for key, flight in self._flights.items() if flight[1] > 1},
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "waiters_per_flight": dict(sorted(self.waiters_per_flight.items()))
+        }
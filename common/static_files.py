@@ -0,0 +1,107 @@
+import os
+import re
+import hashlib
+import mimetypes
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import PlainTextResponse, RedirectResponse, Response
+
+from common.responses import brotli, compress, is_compressible, negotiate_encoding
+
+# Names like app.3f2a9c1b.js change whenever their content does, so they can be cached forever
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{8,}\.[^./]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+class StaticAsset:
+    """One static file held in memory with its precompressed variants"""
+
+    __slots__ = ("media_type", "version", "variants", "cache_control")
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            body = f.read()
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.cache_control = IMMUTABLE if FINGERPRINTED.search(path) else REVALIDATE
+
+        # encoding -> (body, ETag); each encoding is a representation with its own tag
+        self.variants = {None: (body, f'"{self.version}"')}
+        if is_compressible(self.media_type):
+            for encoding in ("br", "gzip"):
+                if encoding == "br" and brotli is None:
+                    continue
+                compressed = compress(body, encoding, best=True)
+                if len(compressed) < len(body):
+                    self.variants[encoding] = (compressed, f'"{self.version}-{encoding}"')
+
+    def etags(self):
+        return {etag for _, etag in self.variants.values()}
+
+class PrecompressedStaticFiles:
+    """
+    ASGI app serving a directory of static files from memory.
+
+    Every file is read, hashed and compressed with brotli and gzip once, at
+    startup, so requests cost a dictionary lookup. Responses carry an ETag
+    and answer If-None-Match with 304. Fingerprinted names, or any file
+    requested with ?v= set to its version, are cached as immutable; other
+    files must be revalidated, which is cheap with the ETag. With html=True,
+    directories serve their index.html as StaticFiles does.
+    """
+
+    def __init__(self, directory, html=True):
+        self.html = html
+        self.assets = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                url = "/" + os.path.relpath(path, directory).replace(os.sep, "/")
+                self.assets[url] = StaticAsset(path)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        response = self.response_for(scope)
+        await response(scope, receive, send)
+
+    def response_for(self, scope):
+        path = scope["path"] or "/"
+        asset = self.assets.get(path)
+        if asset is None and self.html:
+            if path.endswith("/"):
+                asset = self.assets.get(path + "index.html")
+            elif path + "/index.html" in self.assets:
+                return RedirectResponse(path + "/")
+        if asset is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        if encoding not in asset.variants:
+            encoding = None
+        body, etag = asset.variants[encoding]
+
+        version = QueryParams(scope["query_string"]).get("v")
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE if version == asset.version else asset.cache_control
+        }
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or tags & asset.etags():
+                return Response(status_code=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        # The server leaves the body out for HEAD but keeps its Content-Length
+        return Response(body, headers=headers, media_type=asset.media_type)
@@ -1,10 +1,24 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import uvicorn
+import os
+import re
 import json
+import time
 import random
+import asyncio
+
+from common.metrics import MetricsMiddleware, metrics_endpoint, traces_endpoint, stage, observe_size
+from common.fault_injection import FaultProfile, StreamAborted
+
+# Delay between streamed chunks, to mimic token generation speed
+MOCK_STREAM_CHUNK_DELAY = float(os.environ.get("MOCK_STREAM_CHUNK_DELAY", "0.02"))
+
+# Latency, pacing, failures and reply size (MOCK_* variables or query parameters)
+fault_profile = FaultProfile.from_env("MOCK")
 
 app = FastAPI(title="DeepSeek V3 Mock API")
 
@@ -17,6 +31,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count and time every request
+app.add_middleware(MetricsMiddleware)
+
+# Prometheus metrics and recently sampled traces
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+app.add_api_route("/traces", traces_endpoint, methods=["GET"])
+
 class Message(BaseModel):
     role: str
     content: str
@@ -26,6 +47,7 @@ class ChatRequest(BaseModel):
     messages: List[Message]
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 1000
+    stream: Optional[bool] = False
 
 class ChatChoice(BaseModel):
     index: int
@@ -45,15 +67,39 @@ async def root():
     return {"message": "DeepSeek V3 Mock API is running"}
 
 @app.post("/v1/chat/completions")
-async def chat_completions(request: ChatRequest):
+async def chat_completions(request: ChatRequest, http_request: Request):
     """
     Mock endpoint for DeepSeek V3 chat completions API
+    
+    Query parameters named after the FaultProfile options (latency,
+    tokens_per_second, error_rate, ...) override the MOCK_* settings for
+    this request.
     """
+    try:
+        profile = fault_profile.with_overrides(http_request.query_params)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": {"message": str(e), "type": "invalid_request"}})
+    
     # Extract the last user message
     last_message = request.messages[-1].content if request.messages else ""
     
     # Generate a response based on the content
-    response_content = generate_mock_response(last_message)
+    with stage("generate"):
+        response_content = profile.pad(generate_mock_response(last_message))
+    observe_size("prompt", len(last_message.encode("utf-8")))
+    observe_size("completion", len(response_content.encode("utf-8")))
+    
+    error = await profile.inject()
+    if error is not None:
+        return error
+    
+    if request.stream:
+        return StreamingResponse(
+            stream_chunks(request.model, response_content, profile),
+            media_type="text/event-stream"
+        )
+    
+    await asyncio.sleep(profile.generation_time(response_content))
     
     # Create a mock response
     response = ChatResponse(
@@ -80,6 +126,40 @@ async def chat_completions(request: ChatRequest):
     
     return response
 
+async def stream_chunks(model: str, content: str, profile: FaultProfile):
+    """
+    Yield the response as OpenAI-style chat.completion.chunk server-sent events
+    
+    Pieces are paced at the profile's tokens per second (MOCK_STREAM_CHUNK_DELAY
+    apart by default), and the stream may be cut off partway as the profile's
+    abort_rate asks.
+    """
+    completion_id = f"mock-{random.randint(1000, 9999)}"
+    created = int(time.time())
+    
+    def chunk(delta, finish_reason=None):
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(data)}\n\n"
+    
+    yield chunk({"role": "assistant", "content": ""})
+    # Split into word-sized pieces, keeping whitespace and newlines with each piece
+    pieces = re.findall(r"\s*\S+|\s+$", content)
+    abort_after = profile.abort_after(len(pieces))
+    delay = profile.token_delay(MOCK_STREAM_CHUNK_DELAY)
+    for i, piece in enumerate(pieces):
+        if i == abort_after:
+            raise StreamAborted("Injected stream abort")
+        await asyncio.sleep(delay)
+        yield chunk({"content": piece})
+    yield chunk({}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
 def generate_mock_response(prompt: str) -> str:
     """
     Generate a mock response based on the prompt content
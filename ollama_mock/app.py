@@ -0,0 +1,151 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+import uvicorn
+import os
+import json
+import random
+import asyncio
+import datetime
+
+from common.metrics import MetricsMiddleware, metrics_endpoint, traces_endpoint, stage, observe_size
+from common.fault_injection import FaultProfile, StreamAborted
+
+# Generation speed of the mocked vision model unless MOCK_TOKENS_PER_SECOND or the query sets one
+DEFAULT_TOKENS_PER_SECOND = 20
+
+# Requests generated at once, like Ollama's own setting; the rest wait their turn (0 = no limit)
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "0"))
+
+# Latency, pacing, failures and reply size (MOCK_* variables or query parameters)
+fault_profile = FaultProfile.from_env("MOCK")
+
+_slots = asyncio.Semaphore(OLLAMA_NUM_PARALLEL) if OLLAMA_NUM_PARALLEL > 0 else None
+
+app = FastAPI(title="Ollama Chat Mock API")
+
+# Count and time every request
+app.add_middleware(MetricsMiddleware)
+
+# Prometheus metrics and recently sampled traces
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+app.add_api_route("/traces", traces_endpoint, methods=["GET"])
+
+DAMAGE = [
+    ("Pothole", "High", "Vehicles may swerve into adjacent lanes or suffer tyre and suspension damage", "Fill and resurface the pothole within 48 hours and place warning cones until then"),
+    ("Longitudinal crack", "Medium", "Water can seep in and widen the crack into a pothole over time", "Seal the crack during the next scheduled maintenance"),
+    ("Broken sign", "Low", "Drivers may miss the speed limit or turn restriction", "Replace the sign and check nearby signage"),
+    ("Faded lane markings", "Medium", "Lane discipline suffers at night and in rain", "Repaint the markings with reflective paint")
+]
+
+@app.get("/")
+async def root():
+    return {"message": "Ollama Chat Mock API is running"}
+
+@app.get("/api/tags")
+async def tags():
+    """Installed models, as Ollama lists them"""
+    return {"models": [{"name": os.environ.get("OLLAMA_MODEL", "llama3.2-vision"), "size": 0}]}
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    """
+    Mock of Ollama's /api/chat for vision requests.
+    
+    Answers with a damage analysis in the format the road hazard prompt asks
+    for, as one JSON object or, with "stream": true (Ollama's default), one
+    JSON object per line. Query parameters named after the FaultProfile
+    options override the MOCK_* settings for this request. At most
+    OLLAMA_NUM_PARALLEL requests are generated at a time.
+    """
+    try:
+        profile = fault_profile.with_overrides(request.query_params)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    
+    body = await request.body()
+    observe_size("request", len(body))
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "invalid JSON body"})
+    model = payload.get("model", "llama3.2-vision")
+    messages = payload.get("messages") or [{}]
+    images = messages[-1].get("images") or []
+    
+    with stage("generate"):
+        content = profile.pad(generate_mock_analysis(messages[-1].get("content", ""), images))
+    observe_size("completion", len(content.encode("utf-8")))
+    
+    if _slots is not None:
+        await _slots.acquire()
+    released = False
+    try:
+        error = await profile.inject()
+        if error is not None:
+            return error
+        
+        tokens_per_second = profile.tokens_per_second or DEFAULT_TOKENS_PER_SECOND
+        if payload.get("stream", True):
+            # The stream gives the slot back once it has been sent
+            released = True
+            return StreamingResponse(
+                stream_lines(model, content, 1 / tokens_per_second, profile),
+                media_type="application/x-ndjson"
+            )
+        
+        await asyncio.sleep(len(content.split()) / tokens_per_second)
+        return dict(chat_message(model, content, done=True), **final_stats(content))
+    finally:
+        if _slots is not None and not released:
+            _slots.release()
+
+def chat_message(model, content, done):
+    return {
+        "model": model,
+        "created_at": datetime.datetime.utcnow().isoformat() + "Z",
+        "message": {"role": "assistant", "content": content},
+        "done": done
+    }
+
+def final_stats(content):
+    """The timing fields Ollama adds to its last message"""
+    return {
+        "done_reason": "stop",
+        "total_duration": 0,
+        "eval_count": len(content.split())
+    }
+
+async def stream_lines(model, content, delay, profile):
+    """Yield the reply as Ollama's newline-delimited JSON chunks, one word-sized piece each"""
+    pieces = content.split(" ")
+    pieces = [piece if i == len(pieces) - 1 else piece + " " for i, piece in enumerate(pieces)]
+    abort_after = profile.abort_after(len(pieces))
+    try:
+        for i, piece in enumerate(pieces):
+            if i == abort_after:
+                raise StreamAborted("Injected stream abort")
+            await asyncio.sleep(delay)
+            yield json.dumps(chat_message(model, piece, done=False)) + "\n"
+        yield json.dumps(dict(chat_message(model, "", done=True), **final_stats(content))) + "\n"
+    finally:
+        if _slots is not None:
+            _slots.release()
+
+def generate_mock_analysis(prompt, images):
+    """
+    Generate a mock damage analysis, picked from the image data so the same
+    image always gets the same answer
+    """
+    if images:
+        damage_type, severity, impact, action = DAMAGE[len(images[0]) % len(DAMAGE)]
+    else:
+        damage_type, severity, impact, action = random.choice(DAMAGE)
+    
+    return f"""1. Type of damage: {damage_type}
+2. Severity level: {severity}
+3. Potential safety impact: {impact}
+4. Recommended action: {action}
+"""
+
+if __name__ == "__main__":
+    uvicorn.run("app:app", host="0.0.0.0", port=8080, reload=True)
@@ -1,15 +1,34 @@
 import os
 import json
-import requests
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+import time
+import asyncio
+import datetime
+import httpx
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import base64
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from PIL import Image
-from io import BytesIO
+from typing import List
 import uvicorn
 
-app = FastAPI(title="Road Hazard Reporter API")
+import ollama_client
+from ollama_router import OllamaRouter, NoBackendAvailable
+from result_cache import ResultCache, make_key
+from common.single_flight import SingleFlight
+from common.admission import AdmissionController, AdmissionMiddleware, RateLimiter, admission_stats
+from common.responses import FastJSONResponse, CompressionMiddleware, dumps_text, lean_result, LEAN_RESPONSES
+from common.metrics import MetricsMiddleware, metrics_endpoint, traces_endpoint, stage, upstream_call, upstream_rejected, observe_size
+from phash_index import PerceptualHashIndex, dhash, PHASH_RADIUS, PHASH_MATCH_LOCATION, PHASH_MAX_ENTRIES
+import image_prep
+from ingest import RequestBodyLimit, ingest_upload, spool_copy, stream_payload, MAX_UPLOAD_BYTES, FORM_OVERHEAD_BYTES
+import batch
+from jobs import JobQueue
+from report_store import ReportStore, new_report_id, normalize_severity
+from fields import FIELDS, FieldStream, extract_fields
+from geo import GridIndex, exif_coordinates, parse_coordinates, valid_coordinates
+
+app = FastAPI(title="Road Hazard Reporter API", default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -20,19 +39,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON bodies for clients that accept brotli or gzip
+app.add_middleware(CompressionMiddleware)
+
+# Reject oversized uploads while they stream in instead of after buffering them
+app.add_middleware(
+    RequestBodyLimit,
+    max_bytes=MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+    path_limits={"/analyze-batch": batch.BATCH_MAX_BYTES}
+)
+
+# Rate limit and bound the analyses running at once, shedding batch work first
+admission = AdmissionController()
+rate_limiter = RateLimiter()
+app.add_middleware(
+    AdmissionMiddleware,
+    routes={"/analyze": "interactive", "/analyze-batch": "batch"},
+    controller=admission,
+    rate_limiter=rate_limiter
+)
+
+# Count and time every request, including those rejected above
+app.add_middleware(MetricsMiddleware)
+
 # Ollama API endpoint
 OLLAMA_API_URL = os.environ.get("OLLAMA_API_URL", "http://ollama:11434/api/chat")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2-vision")
 
+# Ollama hosts to spread analyses over (OLLAMA_BACKENDS, or just OLLAMA_API_URL)
+ollama_router = OllamaRouter.from_env(OLLAMA_API_URL)
+
+# Bump whenever the analysis prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+
+# Cache of analysis results keyed on image content and request parameters
+result_cache = ResultCache()
+
+# Analyses in progress, so concurrent identical requests share one Ollama call
+in_flight = SingleFlight()
+
+# Perceptual hashes of analyzed images, pointing at their result cache keys; sized
+# like the cache so it does not fill up with pointers to evicted results
+phash_index = PerceptualHashIndex(PHASH_MAX_ENTRIES or result_cache.memory.max_entries)
+near_duplicate_hits = 0
+
+# Persistent queue for job-mode analyses, created on startup
+job_queue = None
+
+# Persistent store of generated reports
+report_store = ReportStore()
+
+# Spatial index of stored reports with coordinates, loaded on startup
+geo_index = GridIndex()
+
+@app.on_event("startup")
+async def startup():
+    global job_queue
+    await ollama_client.start_client()
+    ollama_router.start(ollama_client.get_client())
+    job_queue = JobQueue()
+    # Queued jobs wait out an open Ollama circuit instead of failing fast
+    job_queue.start_workers(
+        process_job,
+        ollama_client.get_client(),
+        ready=lambda: not ollama_client.breaker.is_open
+    )
+    for report_id, latitude, longitude, severity in report_store.iter_coordinates():
+        geo_index.add(report_id, latitude, longitude, severity)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.stop_workers()
+    await ollama_router.stop()
+    await ollama_client.close_client()
+    await report_store.close()
+    result_cache.close()
+
 @app.get("/")
 async def root():
     return {"message": "Road Hazard Reporter API is running"}
 
+@app.get("/health")
+async def health_check():
+    """Service health with the Ollama circuit breaker state and backends in rotation"""
+    upstream = ollama_client.breaker.snapshot()
+    upstream["backends_healthy"] = ollama_router.healthy_count
+    upstream["backends_total"] = len(ollama_router.backends)
+    degraded = upstream["state"] != "closed" or upstream["backends_healthy"] < upstream["backends_total"]
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "upstreams": {"ollama": upstream}
+    }
+
+@app.get("/backends")
+async def backend_stats():
+    """Per-backend load, health and latency of the Ollama router"""
+    return ollama_router.stats()
+
+# Prometheus metrics and recently sampled traces
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+app.add_api_route("/traces", traces_endpoint, methods=["GET"])
+
+@app.get("/admission")
+async def admission_status():
+    """Running and queued analyses, rejections and rate limiter state"""
+    return admission_stats(admission, rate_limiter)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = result_cache.stats()
+    stats["phash_entries"] = len(phash_index)
+    stats["near_duplicate_hits"] = near_duplicate_hits
+    stats["single_flight"] = in_flight.stats()
+    return stats
+
+@app.get("/preprocess/stats")
+async def preprocess_stats():
+    return image_prep.stats
+
 @app.post("/analyze")
 async def analyze_road_damage(
     file: UploadFile = File(...),
     location: str = Form(None),
-    description: str = Form(None)
+    description: str = Form(None),
+    callback_url: str = Form(None),
+    mode: str = Query("sync"),
+    lean: bool = Query(LEAN_RESPONSES)
 ):
     """
     Analyze road damage from an uploaded image using Ollama Vision model.
@@ -41,105 +173,384 @@ async def analyze_road_damage(
     - file: The image file to analyze
     - location: Optional location information
     - description: Optional description of the damage
+    - callback_url: Optional URL that receives the finished job (implies job mode)
+    - mode: "sync" to wait for the analysis, "job" to queue it and return immediately,
+      "stream" to receive the model output as server-sent events
+    - lean: Leave out full_analysis, the raw model output the fields were parsed from
     
     Returns:
-    - JSON response with analysis results
+    - JSON response with analysis results, a job id (HTTP 202) in job mode, or
+      in stream mode token, field (each completed field), error and done events
     """
     try:
-        # Read and validate the image
-        contents = await file.read()
-        try:
-            img = Image.open(BytesIO(contents))
-            img_format = img.format.lower()
-            if img_format not in ["jpeg", "jpg", "png"]:
-                raise HTTPException(status_code=400, detail="Only JPEG and PNG images are supported")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+        # Validate the upload in chunks (size limit, format sniffing, hashing)
+        with stage("read"):
+            upload = await ingest_upload(file)
+        observe_size("upload", upload.size)
         
-        # Convert image to base64
-        base64_image = base64.b64encode(contents).decode("utf-8")
-        
-        # Prepare prompt for the model
-        prompt = "Analyze this road damage image and provide the following information:\n"
-        prompt += "1. Type of damage (pothole, crack, broken sign, etc.)\n"
-        prompt += "2. Severity level (low, medium, high)\n"
-        prompt += "3. Potential safety impact\n"
-        prompt += "4. Recommended action\n"
-        
-        if description:
-            prompt += f"\nUser description: {description}\n"
-        
-        if location:
-            prompt += f"\nLocation information: {location}\n"
-        
-        # Prepare request to Ollama API
-        payload = {
-            "model": OLLAMA_MODEL,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt,
-                    "images": [base64_image]
-                }
-            ]
-        }
-        
-        # Call Ollama API
-        response = requests.post(OLLAMA_API_URL, json=payload)
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error from Ollama API: {response.text}"
+        # In job mode, queue the analysis and let the caller poll or get a callback
+        if mode == "job" or callback_url:
+            if job_queue is None:
+                raise HTTPException(status_code=503, detail="Job queue is not running")
+            job_id = await job_queue.enqueue(upload.upload, location, description, callback_url)
+            return FastJSONResponse(
+                status_code=202,
+                content={"job_id": job_id, "status": "queued", "status_url": f"jobs/{job_id}"}
             )
         
-        # Process the response
-        result = response.json()
-        analysis_text = result.get("message", {}).get("content", "")
-        
-        # Extract structured information from the analysis text
-        # This is a simple extraction, could be improved with regex or more sophisticated parsing
-        damage_type = extract_info(analysis_text, "Type of damage", "Severity level")
-        severity = extract_info(analysis_text, "Severity level", "Potential safety impact")
-        safety_impact = extract_info(analysis_text, "Potential safety impact", "Recommended action")
-        recommended_action = extract_info(analysis_text, "Recommended action", None)
+        if mode == "stream":
+            return StreamingResponse(
+                stream_events(upload, location, description, lean),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
-        # Prepare the response
-        result = {
-            "damage_type": damage_type.strip() if damage_type else "Unknown",
-            "severity": severity.strip() if severity else "Unknown",
-            "safety_impact": safety_impact.strip() if safety_impact else "Unknown",
-            "recommended_action": recommended_action.strip() if recommended_action else "Unknown",
-            "full_analysis": analysis_text,
-            "location": location,
-            "description": description
-        }
+        result = await analyze_image(upload, location, description)
         
-        return JSONResponse(content=result)
+        response = FastJSONResponse(content=lean_result(result) if lean else result)
+        observe_size("response", len(response.body))
+        return response
     
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-def extract_info(text, start_marker, end_marker):
-    """Extract information between markers from text"""
+def sse_event(event, data):
+    """Encode one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {dumps_text(data)}\n\n"
+
+async def stream_events(upload, location, description, lean=False):
+    """
+    Run the analysis and yield its progress as server-sent events.
+    
+    Each text delta from Ollama is sent as a token event, and each field
+    (damage_type, severity, ...) as a field event once its value is final.
+    Cache hits skip straight to the field events. The last event is done
+    with the same result the sync mode returns, or error.
+    """
+    deltas = asyncio.Queue()
+    task = asyncio.ensure_future(analyze_image(upload, location, description, on_delta=deltas.put_nowait))
+    task.add_done_callback(lambda _: deltas.put_nowait(None))
+    fields = FieldStream()
     try:
-        start_idx = text.find(start_marker)
-        if start_idx == -1:
-            return None
+        while True:
+            delta = await deltas.get()
+            if delta is None:
+                break
+            yield sse_event("token", {"text": delta})
+            for name, value in fields.feed(delta):
+                yield sse_event("field", {"name": name, "value": value})
         
-        start_idx += len(start_marker)
+        try:
+            result = task.result()
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            yield sse_event("error", {"status_code": 500, "detail": f"Internal server error: {str(e)}"})
+            return
         
-        if end_marker:
-            end_idx = text.find(end_marker, start_idx)
-            if end_idx == -1:
-                return text[start_idx:].strip()
-            return text[start_idx:end_idx].strip()
-        else:
-            return text[start_idx:].strip()
-    except:
-        return None
+        remaining = fields.close() if fields.text else [(key, result[key]) for key, _, _ in FIELDS]
+        for name, value in remaining:
+            yield sse_event("field", {"name": name, "value": value})
+        yield sse_event("done", lean_result(result) if lean else result)
+    finally:
+        task.cancel()
+
+@app.get("/jobs/stats")
+async def job_stats():
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is not running")
+    return await run_in_threadpool(job_queue.stats)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get the status of a queued analysis job.
+    
+    Parameters:
+    - job_id: The id returned by /analyze in job mode
+    
+    Returns:
+    - JSON with the job status, timings and, once finished, its result or error
+    """
+    job = await run_in_threadpool(job_queue.get, job_id) if job_queue is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def process_job(job, image_path):
+    """Analyze the stored image of a queued job"""
+    with open(image_path, "rb") as image_file:
+        upload = await ingest_upload(UploadFile(file=image_file, filename=job["id"]))
+        return await analyze_image(upload, job["location"], job["description"])
+
+@app.post("/analyze-batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(None),
+    archive: UploadFile = File(None),
+    metadata: str = Form(None),
+    lean: bool = Query(LEAN_RESPONSES)
+):
+    """
+    Analyze many road damage images in one request.
+    
+    Parameters:
+    - files: The image files to analyze
+    - archive: Optional zip archive of images, which may contain a metadata.json
+    - metadata: Optional JSON with per-item location/description, either a list
+      in upload order or an object keyed by filename
+    - lean: Leave full_analysis out of each item's result
+    
+    Returns:
+    - NDJSON stream with one line per image in completion order, followed by a summary line
+    """
+    items, temp_uploads = await batch.collect_items(files, archive, metadata)
+    
+    async def analyze(upload, location, description):
+        result = await analyze_image(upload, location, description)
+        return lean_result(result) if lean else result
+    
+    return StreamingResponse(
+        batch.stream_results(items, analyze, temp_uploads),
+        media_type="application/x-ndjson"
+    )
+
+async def analyze_image(upload, location, description, on_delta=None):
+    """
+    Run the analysis pipeline for one ingested image and return the result.
+    
+    Exact and near-duplicate cache hits are returned without calling Ollama,
+    and concurrent identical requests share one call. When on_delta is
+    given, Ollama's output is streamed and each text delta is passed to it
+    as it arrives (only the caller that started the call sees the deltas).
+    """
+    # Open the image (PIL only parses the header here)
+    try:
+        img = Image.open(upload.file)
+        img_format = img.format.lower()
+        if img_format not in ["jpeg", "jpg", "png"]:
+            raise HTTPException(status_code=400, detail="Only JPEG and PNG images are supported")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+    
+    # Structured coordinates from the image's GPS tags, else from the location text
+    coordinates = exif_coordinates(img) or parse_coordinates(location)
+    latitude, longitude = coordinates if coordinates else (None, None)
+    
+    # Return a cached analysis if this exact request was seen before
+    cache_key = make_key(upload.sha256, OLLAMA_MODEL, PROMPT_VERSION, location, description)
+    cached = await result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Identical requests arriving while this one is analyzed wait for its result
+    if cache_key in in_flight:
+        return await in_flight.run(cache_key, None)
+    
+    # The shared call outlives this request if it is cancelled while others wait,
+    # so it owns a spooled copy of the image rather than this request's file
+    with stage("spool"):
+        image = await spool_copy(upload)
+    return await in_flight.run(
+        cache_key,
+        lambda: analyze_uncached(image, cache_key, location, description, latitude, longitude, on_delta),
+        cleanup=image.file.close
+    )
+
+async def analyze_uncached(upload, cache_key, location, description, latitude, longitude, on_delta):
+    """Analyze an image with no exact cache entry, then cache the result"""
+    global near_duplicate_hits
+    
+    img = Image.open(upload.file)
+    
+    # Apply EXIF orientation and downscale off the event loop
+    with stage("decode"):
+        prepared, original_pixels, changed = await run_in_threadpool(image_prep.normalize_image, img)
+    
+    # Reuse the analysis of a near-identical image (same spot, re-encoded, etc.)
+    image_hash = None
+    if PHASH_RADIUS >= 0:
+        with stage("phash"):
+            image_hash = await run_in_threadpool(dhash, prepared)
+        match = phash_index.find(image_hash, PHASH_RADIUS, location if PHASH_MATCH_LOCATION else None)
+        if match is not None:
+            entry_id, matched_key, _ = match
+            previous = await result_cache.get(matched_key)
+            if previous is not None:
+                near_duplicate_hits += 1
+                phash_index.touch(entry_id)
+                return dict(
+                    previous,
+                    location=location,
+                    description=description,
+                    latitude=latitude,
+                    longitude=longitude
+                )
+            # The earlier result was evicted from the cache
+            phash_index.remove(entry_id)
+    
+    # Re-encode the prepared image unless the upload can be sent as-is
+    if changed:
+        with stage("encode"):
+            image_source = await run_in_threadpool(image_prep.encode_jpeg, prepared)
+        sent_bytes = len(image_source)
+    else:
+        image_source = upload.upload
+        sent_bytes = upload.size
+    image_prep.record(upload.size, sent_bytes, original_pixels, prepared.width * prepared.height)
+    
+    # Prepare prompt for the model
+    prompt = "Analyze this road damage image and provide the following information:\n"
+    prompt += "1. Type of damage (pothole, crack, broken sign, etc.)\n"
+    prompt += "2. Severity level (low, medium, high)\n"
+    prompt += "3. Potential safety impact\n"
+    prompt += "4. Recommended action\n"
+    
+    if description:
+        prompt += f"\nUser description: {description}\n"
+    
+    if location:
+        prompt += f"\nLocation information: {location}\n"
+    
+    # Prepare request to Ollama API
+    payload = {
+        "model": OLLAMA_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "stream": on_delta is not None
+    }
+    
+    # Fail fast while Ollama is known to be failing or too slow
+    breaker = ollama_client.breaker
+    if not breaker.allow():
+        upstream_rejected("ollama")
+        retry_after = max(1, round(breaker.retry_after()))
+        raise HTTPException(
+            status_code=503,
+            detail="Ollama API is temporarily unavailable, try again later",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    # Call Ollama API, base64-encoding the image straight into the request body
+    started = None
+    
+    async def send(url):
+        nonlocal started
+        # Time the call itself, not the wait for a free backend
+        started = time.monotonic()
+        if on_delta is None:
+            return await request_analysis(url, payload, image_source)
+        return await stream_analysis(url, payload, image_source, on_delta)
+    
+    try:
+        analysis_text = await ollama_router.call(send)
+    except NoBackendAvailable as e:
+        # Local saturation says nothing about Ollama's health
+        breaker.release()
+        upstream_rejected("ollama")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Ollama API is busy, try again later: {str(e)}",
+            headers={"Retry-After": "1"}
+        )
+    except httpx.TimeoutException:
+        breaker.failure()
+        raise HTTPException(status_code=504, detail="Timed out waiting for Ollama API")
+    except httpx.HTTPError as e:
+        breaker.failure()
+        raise HTTPException(status_code=502, detail=f"Could not reach Ollama API: {str(e)}")
+    except HTTPException:
+        breaker.failure()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.success(time.monotonic() - started)
+    
+    observe_size("ollama_response", len(analysis_text.encode("utf-8")))
+    
+    # Extract structured information from the analysis text
+    # This is a simple extraction, could be improved with regex or more sophisticated parsing
+    with stage("parse"):
+        result = extract_fields(analysis_text)
+    
+    # Prepare the response
+    result.update(
+        full_analysis=analysis_text,
+        location=location,
+        description=description,
+        latitude=latitude,
+        longitude=longitude
+    )
+    
+    await result_cache.set(cache_key, result)
+    if image_hash is not None:
+        phash_index.add(image_hash, location, cache_key)
+    
+    return result
+
+async def request_analysis(url, payload, image_source):
+    """POST a non-streaming chat request to an Ollama backend and return the message content"""
+    with upstream_call("ollama") as call:
+        response = await ollama_client.get_client().post(
+            url,
+            content=stream_payload(payload, image_source),
+            headers={"Content-Type": "application/json"}
+        )
+        call.set_status(response.status_code)
+    
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Error from Ollama API: {response.text}"
+        )
+    
+    return response.json().get("message", {}).get("content", "")
+
+async def stream_analysis(url, payload, image_source, on_delta):
+    """
+    POST a streaming chat request to an Ollama backend and return the message content.
+    
+    Ollama answers with one JSON object per line; each content delta is
+    passed to on_delta as it arrives.
+    """
+    parts = []
+    with upstream_call("ollama") as call:
+        async with ollama_client.get_client().stream(
+            "POST",
+            url,
+            content=stream_payload(payload, image_source),
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            call.set_status(response.status_code)
+            if response.status_code != 200:
+                await response.aread()
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Error from Ollama API: {response.text}"
+                )
+            
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    call.set_status("error")
+                    raise HTTPException(status_code=500, detail=f"Error from Ollama API: {chunk['error']}")
+                delta = chunk.get("message", {}).get("content", "")
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+                if chunk.get("done"):
+                    break
+    
+    return "".join(parts)
 
 @app.post("/generate-report")
 async def generate_report(data: dict):
@@ -162,9 +573,8 @@ async def generate_report(data: dict):
         description = data.get("description", "")
         full_analysis = data.get("full_analysis", "")
         
-        # Generate report ID (in a real app, this would be stored in a database)
-        import uuid
-        report_id = str(uuid.uuid4())[:8].upper()
+        # Generate a time-sortable, collision-free report ID
+        report_id = new_report_id()
         
         # Create report
         report = {
@@ -179,14 +589,161 @@ async def generate_report(data: dict):
             },
             "description": description,
             "ai_analysis": full_analysis,
+            "coordinates": report_coordinates(data),
             "status": "pending_submission"
         }
         
-        return JSONResponse(content={"report": report, "message": "Report generated successfully"})
+        # Store the report; an identical earlier submission is returned instead
+        report, created = await report_store.add(report)
+        if created and report["coordinates"]:
+            geo_index.add(
+                report_id,
+                report["coordinates"]["latitude"],
+                report["coordinates"]["longitude"],
+                normalize_severity(severity)
+            )
+        message = "Report generated successfully" if created else "Report already exists"
+        
+        return FastJSONResponse(content={"report": report, "message": message})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
+def report_coordinates(data):
+    """Coordinates from the analysis result, else parsed from the location text"""
+    try:
+        latitude, longitude = float(data["latitude"]), float(data["longitude"])
+        if valid_coordinates(latitude, longitude):
+            return {"latitude": latitude, "longitude": longitude}
+    except (KeyError, TypeError, ValueError):
+        pass
+    parsed = parse_coordinates(data.get("location"))
+    return {"latitude": parsed[0], "longitude": parsed[1]} if parsed else None
+
+def parse_timestamp_ms(value, name):
+    """Parse an ISO 8601 query parameter into epoch milliseconds"""
+    try:
+        return int(datetime.datetime.fromisoformat(value).timestamp() * 1000)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} timestamp: {value}")
+
+@app.get("/reports")
+async def list_reports(
+    severity: str = None,
+    damage_type: str = None,
+    location: str = None,
+    since: str = None,
+    until: str = None,
+    cursor: str = None,
+    limit: int = Query(50, ge=1, le=200)
+):
+    """
+    List stored reports, newest first, with cursor pagination
+    
+    Parameters:
+    - severity: Optional severity filter (high, medium, low, unknown)
+    - damage_type: Optional damage type filter (e.g. pothole)
+    - location: Optional exact location filter
+    - since / until: Optional ISO 8601 time bounds
+    - cursor: next_cursor from the previous page
+    - limit: Page size (1-200)
+    
+    Returns:
+    - JSON response with the reports and the cursor of the next page (null on the last page)
+    """
+    reports, next_cursor = report_store.query(
+        severity=severity,
+        damage_type=damage_type,
+        location=location,
+        since_ms=parse_timestamp_ms(since, "since") if since else None,
+        until_ms=parse_timestamp_ms(until, "until") if until else None,
+        cursor=cursor,
+        limit=limit
+    )
+    return {"reports": reports, "next_cursor": next_cursor}
+
+@app.get("/reports/near")
+async def reports_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(2000, gt=0, le=100000),
+    severity: str = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    List stored reports within a radius of a point, nearest first
+    
+    Parameters:
+    - lat / lon: Center point
+    - radius_m: Search radius in meters
+    - severity: Optional severity filter (high, medium, low, unknown)
+    - limit: Maximum number of reports
+    
+    Returns:
+    - JSON response with the reports, each with its distance_m from the center
+    """
+    matches = geo_index.radius(lat, lon, radius_m, severity.lower() if severity else None)[:limit]
+    return {"reports": with_distances(matches)}
+
+@app.get("/reports/nearest")
+async def reports_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100),
+    severity: str = None
+):
+    """
+    List the k stored reports nearest to a point
+    
+    Parameters:
+    - lat / lon: Query point
+    - k: Number of reports
+    - severity: Optional severity filter (high, medium, low, unknown)
+    
+    Returns:
+    - JSON response with the reports, each with its distance_m from the point
+    """
+    matches = geo_index.nearest(lat, lon, k, severity.lower() if severity else None)
+    return {"reports": with_distances(matches)}
+
+@app.get("/reports/bbox")
+async def reports_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    severity: str = None,
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """
+    List stored reports inside a bounding box (e.g. a map tile)
+    
+    Parameters:
+    - min_lat / min_lon / max_lat / max_lon: Box corners; a min_lon greater
+      than max_lon is a box crossing the antimeridian
+    - severity: Optional severity filter (high, medium, low, unknown)
+    - limit: Maximum number of reports
+    
+    Returns:
+    - JSON response with the reports
+    """
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+    report_ids = geo_index.bbox(min_lat, min_lon, max_lat, max_lon, severity.lower() if severity else None, limit)
+    return {"reports": report_store.get_many(report_ids)}
+
+def with_distances(matches):
+    """Load reports for (distance_m, report_id) pairs and attach the distances"""
+    reports = report_store.get_many([report_id for _, report_id in matches])
+    distances = {report_id: distance for distance, report_id in matches}
+    return [dict(report, distance_m=round(distances[report["report_id"]], 1)) for report in reports]
+
+@app.get("/reports/{report_id}")
+async def get_report(report_id: str):
+    report = report_store.get(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {"report": report}
+
 if __name__ == "__main__":
-    import datetime
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
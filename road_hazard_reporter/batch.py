@@ -0,0 +1,214 @@
+import os
+import json
+import zlib
+import zipfile
+import tempfile
+from contextlib import aclosing
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from common.ndjson import stream_shared_results
+from ingest import ingest_upload, MAX_UPLOAD_BYTES, INGEST_CHUNK_SIZE, SPOOL_MAX_MEMORY
+
+# Batch analysis settings
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(512 * 1024 * 1024)))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+# Total uncompressed size of the images extracted from one archive, and the size of its metadata.json
+BATCH_MAX_EXTRACTED_BYTES = int(os.environ.get("BATCH_MAX_EXTRACTED_BYTES", str(1024 * 1024 * 1024)))
+BATCH_MAX_METADATA_BYTES = int(os.environ.get("BATCH_MAX_METADATA_BYTES", str(1024 * 1024)))
+
+class BatchItem:
+    """One image of a batch with its per-item metadata"""
+
+    def __init__(self, index, filename, upload, location=None, description=None, error=None):
+        self.index = index
+        self.filename = filename
+        self.upload = upload
+        self.location = location
+        self.description = description
+        self.error = error
+
+def parse_metadata(raw):
+    """Parse per-item metadata: a list in upload order or an object keyed by filename"""
+    if not raw:
+        return None
+    try:
+        metadata = json.loads(raw)
+    except (json.JSONDecodeError, RecursionError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid metadata JSON: {str(e)}")
+    if not isinstance(metadata, (list, dict)):
+        raise HTTPException(status_code=400, detail="Metadata must be a JSON list or object")
+    return metadata
+
+def _item_metadata(metadata, index, filename):
+    """Return (location, description) for one item"""
+    if isinstance(metadata, list):
+        entry = metadata[index] if index < len(metadata) else None
+    elif isinstance(metadata, dict):
+        entry = metadata.get(filename)
+    else:
+        entry = None
+
+    if isinstance(entry, str):
+        return entry, None
+    if isinstance(entry, dict):
+        return entry.get("location"), entry.get("description")
+    return None, None
+
+# Errors raised by corrupt, encrypted or unsupported members while reading them
+ARCHIVE_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError)
+
+def _read_metadata(archive, info):
+    """Read and decode metadata.json from an archive, capped at BATCH_MAX_METADATA_BYTES"""
+    too_large = HTTPException(status_code=400, detail=f"metadata.json exceeds {BATCH_MAX_METADATA_BYTES} bytes")
+    if info.file_size > BATCH_MAX_METADATA_BYTES:
+        raise too_large
+    with archive.open(info) as source:
+        # file_size comes from the archive and may understate what decompresses
+        raw = source.read(BATCH_MAX_METADATA_BYTES + 1)
+    if len(raw) > BATCH_MAX_METADATA_BYTES:
+        raise too_large
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"metadata.json is not valid UTF-8: {str(e)}")
+
+def _extract_archive(archive_file, max_member_bytes, max_items):
+    """
+    Extract image members of a zip archive into spooled temporary files.
+
+    Returns (members, metadata_text) where members is a list of
+    (filename, UploadFile or None, error). Members larger than
+    max_member_bytes are reported as errors without being extracted.
+    The member count and total uncompressed size are checked against
+    max_items and BATCH_MAX_EXTRACTED_BYTES before anything is extracted;
+    on any error the files extracted so far are closed.
+    """
+    try:
+        archive = zipfile.ZipFile(archive_file)
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {str(e)}")
+
+    with archive:
+        metadata_info = None
+        images = []
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if os.path.basename(info.filename) == "metadata.json":
+                metadata_info = info
+            else:
+                images.append(info)
+
+        if len(images) > max_items:
+            raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_ITEMS} images")
+        extracted_size = sum(info.file_size for info in images if info.file_size <= max_member_bytes)
+        if extracted_size > BATCH_MAX_EXTRACTED_BYTES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Archive images exceed {BATCH_MAX_EXTRACTED_BYTES} bytes uncompressed"
+            )
+
+        members = []
+        try:
+            metadata_text = _read_metadata(archive, metadata_info) if metadata_info is not None else None
+            extracted = 0
+            for info in images:
+                name = info.filename
+                if info.file_size > max_member_bytes:
+                    members.append((name, None, f"Image exceeds {max_member_bytes} bytes"))
+                    continue
+
+                spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+                members.append((name, UploadFile(file=spooled, filename=name), None))
+                copied = 0
+                with archive.open(info) as source:
+                    # Stop one chunk past the limit so ingest_upload reports it
+                    while copied <= max_member_bytes:
+                        chunk = source.read(INGEST_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        spooled.write(chunk)
+                        copied += len(chunk)
+                # Headers can understate sizes, so the budget is also kept on what was written
+                extracted += copied
+                if extracted > BATCH_MAX_EXTRACTED_BYTES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Archive images exceed {BATCH_MAX_EXTRACTED_BYTES} bytes uncompressed"
+                    )
+                spooled.seek(0)
+        except ARCHIVE_ERRORS as e:
+            _close_uploads(upload for _, upload, _ in members)
+            raise HTTPException(status_code=400, detail=f"Invalid zip archive: {str(e)}")
+        except BaseException:
+            _close_uploads(upload for _, upload, _ in members)
+            raise
+
+    return members, metadata_text
+
+def _close_uploads(uploads):
+    for upload in uploads:
+        if upload is not None:
+            upload.file.close()
+
+async def collect_items(files, archive, metadata_raw):
+    """
+    Build the list of BatchItems from uploaded files and/or a zip archive.
+
+    Returns (items, temp_uploads); the caller must close temp_uploads, the
+    archive's extracted files, once the items are done with. Raises a 400
+    HTTPException, with nothing left open, for an empty or oversized batch
+    or invalid metadata.
+    """
+    uploads = [(f.filename, f, None) for f in files or []]
+    if len(uploads) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_ITEMS} images")
+    temp_uploads = []
+    if archive is not None:
+        members, archive_metadata = await run_in_threadpool(
+            _extract_archive, archive.file, MAX_UPLOAD_BYTES, BATCH_MAX_ITEMS - len(uploads)
+        )
+        uploads.extend(members)
+        temp_uploads = [upload for _, upload, _ in members if upload is not None]
+        if metadata_raw is None:
+            metadata_raw = archive_metadata
+
+    try:
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No images provided")
+        metadata = parse_metadata(metadata_raw)
+    except HTTPException:
+        _close_uploads(temp_uploads)
+        raise
+    items = []
+    for index, (filename, upload, error) in enumerate(uploads):
+        location, description = _item_metadata(metadata, index, filename)
+        items.append(BatchItem(index, filename, upload, location, description, error))
+    return items, temp_uploads
+
+async def stream_results(items, analyze, temp_uploads=()):
+    """
+    Analyze batch items with bounded concurrency and yield NDJSON lines as each finishes.
+
+    Items with identical image content, location and description share one
+    analysis. A final summary line reports item, unique and error counts.
+    The archive's extracted files are closed once the stream ends.
+    """
+    def label(item):
+        return {"index": item.index, "filename": item.filename}
+
+    async def prepare(item):
+        if item.error:
+            raise HTTPException(status_code=413, detail=item.error)
+        upload = await ingest_upload(item.upload)
+        key = (upload.sha256, item.location, item.description)
+        return key, lambda: analyze(upload, item.location, item.description)
+
+    try:
+        async with aclosing(stream_shared_results(items, label, prepare, BATCH_CONCURRENCY, "items")) as lines:
+            async for line in lines:
+                yield line
+    finally:
+        _close_uploads(temp_uploads)
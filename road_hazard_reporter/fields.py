@@ -0,0 +1,63 @@
+from common.section_parser import SectionParser, StreamScanner
+
+# Fields extracted from the model output, in the order the prompt asks for them:
+# (result key, marker, marker of the next field)
+FIELDS = [
+    ("damage_type", "Type of damage", "Severity level"),
+    ("severity", "Severity level", "Potential safety impact"),
+    ("safety_impact", "Potential safety impact", "Recommended action"),
+    ("recommended_action", "Recommended action", None)
+]
+
+parser = SectionParser(FIELDS)
+
+def field_value(value):
+    return value.strip() if value else "Unknown"
+
+def extract_fields(text):
+    """Extract every field from a complete analysis text, keyed by result key"""
+    return {key: field_value(value) for key, value in parser.fields(text).items()}
+
+class FieldStream:
+    """
+    Incremental field extractor for a streamed analysis.
+
+    feed() takes each text delta and returns the fields whose value is final,
+    which is once the next field's marker has arrived after the field's own
+    marker. close() returns the rest at the end of the stream. Values come
+    from the same parser as extract_fields, so they match what the complete
+    text would give. Markers are tracked with a StreamScanner, so each delta
+    is scanned once and the text is only parsed when a field completes.
+    """
+
+    def __init__(self):
+        self._scanner = StreamScanner([start for _, start, _ in FIELDS])
+        self._pending = list(FIELDS)
+
+    @property
+    def text(self):
+        return self._scanner.text
+
+    def feed(self, delta):
+        scanner = self._scanner
+        scanner.feed(delta)
+        completed = []
+        for field in list(self._pending):
+            key, start, end = field
+            if end is None:
+                continue
+            start_idx = scanner.find(start)
+            if start_idx == -1 or scanner.find(end, start_idx + len(start)) == -1:
+                continue
+            self._pending.remove(field)
+            completed.append(key)
+        if not completed:
+            return []
+        values = extract_fields(scanner.text)
+        return [(key, values[key]) for key in completed]
+
+    def close(self):
+        values = extract_fields(self.text)
+        remaining = [(key, values[key]) for key, _, _ in self._pending]
+        self._pending = []
+        return remaining
@@ -0,0 +1,210 @@
+import os
+import re
+import math
+import heapq
+
+# Spatial index settings
+GEO_CELL_DEG = float(os.environ.get("GEO_CELL_DEG", "0.01"))  # About 1.1 km of latitude
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG_LAT = math.pi * EARTH_RADIUS_M / 180
+
+# Two decimal numbers, neither part of a longer number or word, so house numbers,
+# years and street names ("House 12, 34th Street", "Road 2024 10") are not read as a position
+COORDINATE_PATTERN = re.compile(
+    r"(?<![\w.-])(-?\d{1,2}\.\d+)\s*[,;\s]\s*(-?\d{1,3}\.\d+)(?!\w|\.\d)"
+)
+
+GPS_IFD = 0x8825
+GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE = 1, 2, 3, 4
+
+def valid_coordinates(lat, lon):
+    return -90 <= lat <= 90 and -180 <= lon <= 180
+
+def parse_coordinates(text):
+    """Extract (lat, lon) from free text such as "25.2048, 55.2708", or None"""
+    if not text:
+        return None
+    match = COORDINATE_PATTERN.search(text)
+    if match is None:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    return (lat, lon) if valid_coordinates(lat, lon) else None
+
+def _dms_to_degrees(dms, ref):
+    degrees = float(dms[0]) + float(dms[1]) / 60 + float(dms[2]) / 3600
+    return -degrees if ref in ("S", "W") else degrees
+
+def exif_coordinates(img):
+    """Read (lat, lon) from a PIL image's EXIF GPS tags, or None"""
+    try:
+        gps = img.getexif().get_ifd(GPS_IFD)
+        if GPS_LATITUDE not in gps or GPS_LONGITUDE not in gps:
+            return None
+        lat = _dms_to_degrees(gps[GPS_LATITUDE], gps.get(GPS_LATITUDE_REF, "N"))
+        lon = _dms_to_degrees(gps[GPS_LONGITUDE], gps.get(GPS_LONGITUDE_REF, "E"))
+    except Exception:
+        return None
+    return (lat, lon) if valid_coordinates(lat, lon) else None
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+class GridIndex:
+    """
+    In-memory spatial index of points bucketed into fixed-size lat/lon cells.
+
+    Radius and bounding-box queries only visit the cells overlapping the query
+    area, and nearest-neighbour search expands ring by ring from the query
+    cell, so query cost depends on local density rather than total size.
+    Longitude cells wrap around at the antimeridian, so queries near ±180
+    find points on both sides of it.
+    """
+
+    def __init__(self, cell_deg=GEO_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._columns = max(1, math.ceil(360 / cell_deg))
+        self._cells = {}  # (x, y) -> {id: (lat, lon, severity)}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _column(self, lon):
+        """Unwrapped longitude cell; reduce it modulo self._columns to get the stored one"""
+        return int(math.floor((lon + 180) / self.cell_deg))
+
+    def _cell(self, lat, lon):
+        return (self._column(lon) % self._columns, int(math.floor(lat / self.cell_deg)))
+
+    def add(self, item_id, lat, lon, severity=None):
+        cell = self._cells.setdefault(self._cell(lat, lon), {})
+        if item_id not in cell:
+            self._count += 1
+        cell[item_id] = (lat, lon, severity)
+
+    def _cells_in_range(self, x0, y0, x1, y1):
+        """
+        Yield occupied cells in the inclusive cell range, where x0..x1 are
+        unwrapped longitude cells and may run past either end
+        """
+        if x1 - x0 + 1 >= self._columns:
+            columns = range(self._columns)
+        else:
+            columns = [x % self._columns for x in range(x0, x1 + 1)]
+        if len(columns) * (y1 - y0 + 1) > len(self._cells):
+            columns = set(columns)
+            for (x, y), cell in self._cells.items():
+                if x in columns and y0 <= y <= y1:
+                    yield cell
+            return
+        for x in columns:
+            for y in range(y0, y1 + 1):
+                cell = self._cells.get((x, y))
+                if cell:
+                    yield cell
+
+    def bbox(self, min_lat, min_lon, max_lat, max_lon, severity=None, limit=None):
+        """
+        Return ids of points inside the box. A min_lon greater than max_lon
+        is a box crossing the antimeridian, from min_lon east to max_lon.
+        """
+        crosses = min_lon > max_lon
+        x0, x1 = self._column(min_lon), self._column(max_lon + 360 if crosses else max_lon)
+        y0, y1 = int(math.floor(min_lat / self.cell_deg)), int(math.floor(max_lat / self.cell_deg))
+        found = []
+        for cell in self._cells_in_range(x0, y0, x1, y1):
+            for item_id, (lat, lon, item_severity) in cell.items():
+                if severity and item_severity != severity:
+                    continue
+                if crosses:
+                    inside_lon = lon >= min_lon or lon <= max_lon
+                else:
+                    inside_lon = min_lon <= lon <= max_lon
+                if min_lat <= lat <= max_lat and inside_lon:
+                    found.append(item_id)
+                    if limit and len(found) >= limit:
+                        return found
+        return found
+
+    def radius(self, lat, lon, radius_m, severity=None):
+        """Return [(distance_m, id)] of points within radius_m, nearest first"""
+        dlat = radius_m / METERS_PER_DEG_LAT
+        dlon = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        x0, x1 = self._column(lon - dlon), self._column(lon + dlon)
+        y0, y1 = int(math.floor((lat - dlat) / self.cell_deg)), int(math.floor((lat + dlat) / self.cell_deg))
+        found = []
+        for cell in self._cells_in_range(x0, y0, x1, y1):
+            for item_id, (item_lat, item_lon, item_severity) in cell.items():
+                if severity and item_severity != severity:
+                    continue
+                distance = haversine_m(lat, lon, item_lat, item_lon)
+                if distance <= radius_m:
+                    found.append((distance, item_id))
+        found.sort()
+        return found
+
+    def nearest(self, lat, lon, k, severity=None):
+        """Return [(distance_m, id)] of the k nearest points, nearest first"""
+        cx, cy = self._cell(lat, lon)
+        # Lower bound on the distance covered by each ring of cells
+        ring_m = self.cell_deg * METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6)
+        best = []  # max-heap of (-distance, id)
+
+        ring = 0
+        while True:
+            if (2 * ring + 1) ** 2 > len(self._cells):
+                # The rings now cover more cells than exist: finish with one scan
+                cells = self._cells.items()
+                final = True
+            else:
+                cells = self._ring(cx, cy, ring)
+                final = False
+
+            for (x, y), cell in cells:
+                if final and max(self._column_distance(x, cx), abs(y - cy)) < ring:
+                    continue
+                for item_id, (item_lat, item_lon, item_severity) in cell.items():
+                    if severity and item_severity != severity:
+                        continue
+                    distance = haversine_m(lat, lon, item_lat, item_lon)
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, item_id))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, item_id))
+
+            if final or (len(best) == k and -best[0][0] <= ring * ring_m):
+                break
+            ring += 1
+
+        return sorted((-distance, item_id) for distance, item_id in best)
+
+    def _column_distance(self, x1, x2):
+        """Cells between two longitude columns, going the shorter way round"""
+        distance = abs(x1 - x2) % self._columns
+        return min(distance, self._columns - distance)
+
+    def _ring(self, cx, cy, ring):
+        """Yield occupied ((x, y), cell) pairs at Chebyshev distance ring from (cx, cy)"""
+        if ring == 0:
+            positions = [(cx, cy)]
+        else:
+            positions = [(cx + dx, cy - ring) for dx in range(-ring, ring + 1)]
+            positions += [(cx + dx, cy + ring) for dx in range(-ring, ring + 1)]
+            positions += [(cx - ring, cy + dy) for dy in range(-ring + 1, ring)]
+            positions += [(cx + ring, cy + dy) for dy in range(-ring + 1, ring)]
+        # Once a ring is wider than the globe its columns repeat
+        seen = set()
+        for x, y in positions:
+            position = (x % self._columns, y)
+            if position in seen:
+                continue
+            seen.add(position)
+            cell = self._cells.get(position)
+            if cell:
+                yield position, cell
@@ -0,0 +1,67 @@
+import os
+import logging
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Preprocessing settings for images sent to the vision model
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", "1120"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+
+logger = logging.getLogger(__name__)
+
+# Running totals of the reduction achieved by preprocessing
+stats = {
+    "images": 0,
+    "original_bytes": 0,
+    "sent_bytes": 0,
+    "original_pixels": 0,
+    "sent_pixels": 0
+}
+
+def normalize_image(img, max_edge=IMAGE_MAX_EDGE):
+    """
+    Apply EXIF orientation and shrink the image so its longest edge is at most max_edge.
+
+    Returns (image, original_pixels, changed), where changed is False when the
+    upload is already a small, upright RGB JPEG that can be sent as-is. JPEGs
+    are decoded at a reduced scale when possible, which is much cheaper than a
+    full decode followed by a resize.
+    """
+    original_size = img.size
+    original_mode = img.mode
+    orientation = img.getexif().get(0x0112, 1)
+    if img.format == "JPEG":
+        img.draft("RGB", (max_edge, max_edge))
+
+    # exif_transpose always returns a new image, so it is safe to modify below
+    normalized = ImageOps.exif_transpose(img)
+    if max(normalized.size) > max_edge:
+        normalized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    if normalized.mode != "RGB":
+        normalized = normalized.convert("RGB")
+
+    changed = (
+        img.format != "JPEG"
+        or original_mode != "RGB"
+        or orientation != 1
+        or normalized.size != original_size
+    )
+    return normalized, original_size[0] * original_size[1], changed
+
+def encode_jpeg(img, quality=IMAGE_JPEG_QUALITY):
+    """Encode an RGB image as JPEG bytes"""
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def record(original_bytes, sent_bytes, original_pixels, sent_pixels):
+    """Log and accumulate the byte and pixel reduction for one request"""
+    stats["images"] += 1
+    stats["original_bytes"] += original_bytes
+    stats["sent_bytes"] += sent_bytes
+    stats["original_pixels"] += original_pixels
+    stats["sent_pixels"] += sent_pixels
+    logger.info(
+        "Image preprocessed: %d -> %d bytes, %d -> %d pixels",
+        original_bytes, sent_bytes, original_pixels, sent_pixels
+    )
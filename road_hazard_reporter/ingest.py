@@ -0,0 +1,183 @@
+import os
+import json
+import uuid
+import base64
+import shutil
+import hashlib
+import tempfile
+import time
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from common.metrics import observe_stage, observe_size
+
+# Upload limits and streaming settings
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+FORM_OVERHEAD_BYTES = int(os.environ.get("FORM_OVERHEAD_BYTES", str(64 * 1024)))
+# Kept a multiple of 3 so each chunk base64-encodes without padding
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", str(48 * 1024))) // 3 * 3
+# Server-side copies of images stay in memory up to this size, then move to disk
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png")
+]
+
+class RequestBodyLimit:
+    """
+    ASGI middleware that rejects request bodies larger than max_bytes.
+
+    The Content-Length header is checked up front, and the running total is
+    checked while the body streams in, so an oversized upload is cut off
+    before it is fully read or spooled. path_limits overrides max_bytes for
+    specific request paths.
+    """
+
+    def __init__(self, app, max_bytes, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope["path"], self.max_bytes)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > max_bytes:
+                response = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+class IngestedUpload:
+    """An uploaded image that has been size-checked, sniffed and hashed"""
+
+    def __init__(self, upload, size, sha256, image_format):
+        self.upload = upload
+        self.size = size
+        self.sha256 = sha256
+        self.format = image_format
+
+    @property
+    def file(self):
+        return self.upload.file
+
+def sniff_format(head):
+    """Return the image format from the leading bytes of a file, or None"""
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+async def ingest_upload(upload, max_bytes=MAX_UPLOAD_BYTES, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Validate an UploadFile chunk by chunk without loading it into memory.
+
+    The format is sniffed from the first chunk, the size limit is enforced as
+    chunks are read and the SHA-256 is computed incrementally. Starlette has
+    already spooled large uploads to disk, so only one chunk is held at a time.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    image_format = None
+
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        if image_format is None:
+            image_format = sniff_format(chunk)
+            if image_format is None:
+                raise HTTPException(status_code=400, detail="Only JPEG and PNG images are supported")
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {max_bytes} bytes")
+        digest.update(chunk)
+
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+
+    await upload.seek(0)
+    return IngestedUpload(upload, size, digest.hexdigest(), image_format)
+
+def _spool(source, chunk_size):
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    source.seek(0)
+    shutil.copyfileobj(source, spooled, chunk_size)
+    spooled.seek(0)
+    return spooled
+
+async def spool_copy(upload, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Copy an ingested upload into a spooled temporary file of its own, chunk by
+    chunk off the event loop, for work that may outlive the request's file.
+    The caller owns the copy and must close copy.file.
+    """
+    spooled = await run_in_threadpool(_spool, upload.file, chunk_size)
+    return IngestedUpload(UploadFile(file=spooled, filename=upload.upload.filename), upload.size, upload.sha256, upload.format)
+
+async def _base64_chunks(source, chunk_size):
+    """Yield base64 text for bytes or an UploadFile, one chunk at a time"""
+    if isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield base64.b64encode(view[start:start + chunk_size])
+        return
+
+    await source.seek(0)
+    while True:
+        chunk = await source.read(chunk_size)
+        if not chunk:
+            break
+        yield base64.b64encode(chunk)
+
+async def stream_payload(payload, image_source, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Yield the JSON encoding of an Ollama chat payload with the image streamed in.
+
+    The image is base64-encoded chunk by chunk directly into the request body
+    in place of the first message's "images" entry, so the encoded image is
+    never materialized as one string. The time spent reading and encoding
+    the image is recorded as the "base64" stage, apart from the time spent
+    sending it.
+    """
+    placeholder = uuid.uuid4().hex
+    messages = [dict(payload["messages"][0], images=[placeholder])] + payload["messages"][1:]
+    head, tail = json.dumps(dict(payload, messages=messages)).split(f'"{placeholder}"', 1)
+    head = (head + '"').encode("utf-8")
+    tail = ('"' + tail).encode("utf-8")
+
+    yield head
+    sent = len(head) + len(tail)
+    encoding = 0.0
+    chunks = _base64_chunks(image_source, chunk_size)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            break
+        encoding += time.perf_counter() - started
+        sent += len(chunk)
+        yield chunk
+    observe_stage("base64", encoding)
+    observe_size("ollama_request", sent)
+    yield tail
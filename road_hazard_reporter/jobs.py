@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import sqlite3
+import ipaddress
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+# Job queue settings
+JOB_DB = os.environ.get("JOB_DB", "jobs.db")
+JOB_DIR = os.environ.get("JOB_DIR", "job_images")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+JOB_CALLBACK_TIMEOUT = float(os.environ.get("JOB_CALLBACK_TIMEOUT", "10"))
+# A running job whose lease is not renewed within this many seconds is taken over by another worker
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "300"))
+# A job whose lease has lapsed this many times is failed instead of being run again
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs are deleted this many seconds after they finish
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+JOB_PRUNE_INTERVAL = float(os.environ.get("JOB_PRUNE_INTERVAL", "3600"))
+# Hosts callbacks may go to (a name also allows its subdomains), comma separated; when
+# empty any host is allowed except loopback, private and other non-public addresses
+JOB_CALLBACK_ALLOWED_HOSTS = [
+    host.strip().lower().rstrip(".")
+    for host in os.environ.get("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()
+]
+
+logger = logging.getLogger(__name__)
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def _public_address(address):
+    address = ipaddress.ip_address(address)
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global
+
+def validate_callback_url(url, allowed_hosts=JOB_CALLBACK_ALLOWED_HOSTS):
+    """
+    Check a callback URL before a job is queued for it; raises a 400 HTTPException.
+
+    Only http(s) URLs are accepted. With allowed_hosts, the host must be one
+    of them or a subdomain of one; otherwise it may not be localhost or an
+    address literal outside the public internet. Names are resolved and
+    checked again when the callback is sent.
+    """
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+        parts.port  # Raises ValueError for a port that is not a number in range
+    except ValueError:
+        parts = host = None
+    if parts is None or parts.scheme not in ("http", "https") or not host:
+        raise HTTPException(status_code=400, detail="callback_url must be an http or https URL")
+    host = host.rstrip(".")
+
+    if allowed_hosts:
+        if not any(host == allowed or host.endswith("." + allowed) for allowed in allowed_hosts):
+            raise HTTPException(status_code=400, detail="callback_url host is not allowed")
+        return
+    if host == "localhost" or host.endswith(".localhost"):
+        raise HTTPException(status_code=400, detail="callback_url must not point at this server")
+    try:
+        public = _public_address(host)
+    except ValueError:
+        return  # A name, checked once it resolves
+    if not public:
+        raise HTTPException(status_code=400, detail="callback_url must be a public address")
+
+async def _resolves_to_public(url):
+    """Whether every address the callback URL's host resolves to is public"""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port)
+    except OSError:
+        return False
+    return bool(infos) and all(_public_address(info[4][0].split("%", 1)[0]) for info in infos)
+
+class JobQueue:
+    """
+    Persistent SQLite-backed queue of analysis jobs.
+
+    Uploaded images are kept in image_dir until their job finishes. A worker
+    claiming a job takes a lease on it, renewed while the job runs; when a
+    worker dies, in this process or another one sharing the database, its
+    job is claimed again once the lease expires, up to max_attempts leases
+    in all, after which it is failed so a job that keeps killing its worker
+    cannot loop forever. Finished jobs are deleted after retention seconds.
+
+    The async methods run their SQLite work in the thread pool; the others
+    block and are meant to be called from it.
+    """
+
+    def __init__(self, db_path=JOB_DB, image_dir=JOB_DIR, lease=JOB_LEASE_SECONDS, retention=JOB_RETENTION_SECONDS,
+                 max_attempts=JOB_MAX_ATTEMPTS):
+        self.image_dir = image_dir
+        self.lease = lease
+        self.retention = retention
+        self.max_attempts = max_attempts
+        os.makedirs(image_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "location TEXT, description TEXT, callback_url TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "result TEXT, error TEXT, status_code INTEGER, lease_id TEXT, lease_expires REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("lease_id", "TEXT"), ("lease_expires", "REAL"), ("attempts", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        if "lease_expires" not in columns:
+            # Jobs running from before leases existed get one lease from when they started
+            self._conn.execute("UPDATE jobs SET lease_expires = started_at + ? WHERE status = 'running'", (lease,))
+        if "attempts" not in columns:
+            # A job running when attempts were added has used its first one
+            self._conn.execute("UPDATE jobs SET attempts = 1 WHERE status = 'running'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+        self._conn.commit()
+        self._pruned_at = 0.0
+
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        self.wait_times = deque(maxlen=1000)
+        self.run_times = deque(maxlen=1000)
+        self.completed = 0
+        self.failed = 0
+
+    def image_path(self, job_id):
+        return os.path.join(self.image_dir, job_id)
+
+    async def enqueue(self, upload, location, description, callback_url):
+        """Persist the upload and queue a job for it; returns the job id"""
+        if callback_url:
+            validate_callback_url(callback_url)
+        job_id = uuid.uuid4().hex
+        await upload.seek(0)
+        await run_in_threadpool(self._insert, job_id, upload.file, location, description, callback_url)
+        self._wakeup.set()
+        return job_id
+
+    def _insert(self, job_id, source, location, description, callback_url):
+        with open(self.image_path(job_id), "wb") as target:
+            shutil.copyfileobj(source, target)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, location, description, callback_url, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, location, description, callback_url, time.time())
+            )
+            self._conn.commit()
+
+    def claim(self):
+        """
+        Lease the oldest queued job, or a running one whose lease expired, and
+        return it, or None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, lease_id = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ("
+                "SELECT id FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND lease_expires < ? AND attempts < ?) "
+                "ORDER BY created_at LIMIT 1"
+                ") RETURNING *",
+                (now, uuid.uuid4().hex, now + self.lease, now, self.max_attempts)
+            ).fetchone()
+            self._conn.commit()
+        if row is not None:
+            self.wait_times.append(row["started_at"] - row["created_at"])
+        return dict(row) if row is not None else None
+
+    def fail_abandoned(self):
+        """
+        Fail running jobs whose last allowed lease expired and return them.
+
+        Their workers died max_attempts times in a row, most likely because
+        of the job itself, so it is not run again.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, status_code = 500, error = ?, "
+                "lease_id = NULL, lease_expires = NULL "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= ? RETURNING *",
+                (now, f"Job abandoned after {self.max_attempts} attempts", now, self.max_attempts)
+            ).fetchall()
+            self._conn.commit()
+            self.failed += len(rows)
+        for row in rows:
+            logger.warning("Job %s failed after %d attempts", row["id"], row["attempts"])
+            self._remove_image(row["id"])
+        return [dict(row) for row in rows]
+
+    def renew(self, job):
+        """Extend the lease on a running job; returns False if another worker has taken it over"""
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_id = ? AND status = 'running'",
+                (time.time() + self.lease, job["id"], job["lease_id"])
+            ).rowcount
+            self._conn.commit()
+        return updated == 1
+
+    def finish(self, job, result=None, status_code=None, error=None):
+        """
+        Store the outcome of a job and drop its image; returns False, storing
+        nothing, if the job's lease was lost to another worker
+        """
+        finished_at = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, status_code = ?, error = ?, "
+                "lease_id = NULL, lease_expires = NULL "
+                "WHERE id = ? AND lease_id = ? AND status = 'running'",
+                (
+                    "failed" if error else "completed",
+                    finished_at,
+                    json.dumps(result) if result is not None else None,
+                    status_code,
+                    error,
+                    job["id"],
+                    job["lease_id"]
+                )
+            ).rowcount
+            self._conn.commit()
+            if updated == 1:
+                self.run_times.append(finished_at - job["started_at"])
+                if error:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+        if updated != 1:
+            logger.warning("Job %s was taken over by another worker, dropping its outcome", job["id"])
+            return False
+        self._remove_image(job["id"])
+        return True
+
+    def _remove_image(self, job_id):
+        try:
+            os.remove(self.image_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def prune(self):
+        """Delete jobs finished more than retention seconds ago; returns how many"""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?",
+                (time.time() - self.retention,)
+            ).rowcount
+            self._conn.commit()
+        self._pruned_at = time.monotonic()
+        return deleted
+
+    def get(self, job_id):
+        """Return the public view of a job, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "attempts": row["attempts"]
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = {"status_code": row["status_code"], "detail": row["error"]}
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "queue_depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "completed": self.completed,
+            "failed": self.failed,
+            "workers": len(self._workers),
+            "wait_seconds_p50": _percentile(self.wait_times, 0.5),
+            "wait_seconds_p95": _percentile(self.wait_times, 0.95),
+            "run_seconds_p50": _percentile(self.run_times, 0.5),
+            "run_seconds_p95": _percentile(self.run_times, 0.95)
+        }
+
+    def start_workers(self, process, http_client, count=JOB_WORKERS, ready=None):
+        """
+        Start count worker tasks draining the queue.
+
+        process(job, image_path) must return the analysis result or raise
+        HTTPException. When a job has a callback_url, its final state is
+        POSTed there with http_client, unless its host resolves to a
+        non-public address and no JOB_CALLBACK_ALLOWED_HOSTS are set. While
+        ready() returns False, workers leave jobs queued instead of claiming
+        them.
+        """
+        for _ in range(count):
+            self._workers.append(asyncio.ensure_future(self._worker(process, http_client, ready)))
+
+    async def stop_workers(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        with self._lock:
+            self._conn.close()
+
+    async def _keep_lease(self, job):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if not await run_in_threadpool(self.renew, job):
+                return
+
+    async def _worker(self, process, http_client, ready):
+        while True:
+            if time.monotonic() - self._pruned_at >= JOB_PRUNE_INTERVAL:
+                await run_in_threadpool(self.prune)
+            if ready is not None and not ready():
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                continue
+            for abandoned in await run_in_threadpool(self.fail_abandoned):
+                if abandoned["callback_url"]:
+                    await self._send_callback(
+                        http_client, abandoned["callback_url"], await run_in_threadpool(self.get, abandoned["id"])
+                    )
+            job = await run_in_threadpool(self.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            lease = asyncio.ensure_future(self._keep_lease(job))
+            try:
+                result = await process(job, self.image_path(job["id"]))
+                finished = await run_in_threadpool(self.finish, job, result=result)
+            except HTTPException as e:
+                finished = await run_in_threadpool(self.finish, job, status_code=e.status_code, error=str(e.detail))
+            except Exception as e:
+                logger.exception("Job %s failed", job["id"])
+                finished = await run_in_threadpool(
+                    self.finish, job, status_code=500, error=f"Internal server error: {str(e)}"
+                )
+            finally:
+                lease.cancel()
+
+            if finished and job["callback_url"]:
+                await self._send_callback(http_client, job["callback_url"], await run_in_threadpool(self.get, job["id"]))
+
+    async def _send_callback(self, http_client, url, payload):
+        if not JOB_CALLBACK_ALLOWED_HOSTS and not await _resolves_to_public(url):
+            logger.warning("Callback to %s for job %s skipped: host is not a public address", url, payload["job_id"])
+            return
+        try:
+            response = await http_client.post(url, json=payload, timeout=JOB_CALLBACK_TIMEOUT)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning("Callback to %s for job %s failed: %s", url, payload["job_id"], e)
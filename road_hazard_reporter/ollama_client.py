@@ -0,0 +1,50 @@
+import os
+import httpx
+
+from common.circuit_breaker import CircuitBreaker
+
+# Connection pool and timeout settings for the Ollama API
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "120"))
+OLLAMA_POOL_TIMEOUT = float(os.environ.get("OLLAMA_POOL_TIMEOUT", "30"))
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "64"))
+OLLAMA_MAX_KEEPALIVE = int(os.environ.get("OLLAMA_MAX_KEEPALIVE", "16"))
+
+_client = None
+
+# Opens after repeated failures or slow answers; settings via OLLAMA_BREAKER_*
+breaker = CircuitBreaker.from_env("ollama", "OLLAMA", slow_call_seconds=OLLAMA_READ_TIMEOUT / 2)
+
+def _build_client():
+    """Create an AsyncClient with a bounded connection pool"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            OLLAMA_READ_TIMEOUT,
+            connect=OLLAMA_CONNECT_TIMEOUT,
+            pool=OLLAMA_POOL_TIMEOUT
+        ),
+        limits=httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE
+        )
+    )
+
+async def start_client():
+    """Open the shared client (called on app startup)"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+async def close_client():
+    """Close the shared client and its pooled connections (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_client():
+    """Return the shared client, creating it if startup hooks did not run"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
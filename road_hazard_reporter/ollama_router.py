@@ -0,0 +1,303 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from urllib.parse import urlsplit
+import httpx
+
+from common.metrics import counter, gauge, histogram
+
+# Backend pool settings
+OLLAMA_BACKENDS = os.environ.get("OLLAMA_BACKENDS", "")  # "url|weight=2|max_concurrency=4 url ..."
+OLLAMA_BACKEND_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_BACKEND_MAX_CONCURRENCY", "64"))
+OLLAMA_QUEUE_TIMEOUT = float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", "30"))
+OLLAMA_CONNECT_RETRIES = int(os.environ.get("OLLAMA_CONNECT_RETRIES", "2"))
+OLLAMA_HEALTH_PATH = os.environ.get("OLLAMA_HEALTH_PATH", "/api/tags")
+OLLAMA_HEALTH_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_INTERVAL", "10"))
+OLLAMA_HEALTH_TIMEOUT = float(os.environ.get("OLLAMA_HEALTH_TIMEOUT", "3"))
+OLLAMA_EJECT_AFTER = int(os.environ.get("OLLAMA_EJECT_AFTER", "3"))
+OLLAMA_READMIT_AFTER = int(os.environ.get("OLLAMA_READMIT_AFTER", "2"))
+
+# Failures that happen before the request reaches the backend, so it is safe to send it elsewhere
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+logger = logging.getLogger(__name__)
+
+BACKEND_REQUESTS = counter("ollama_backend_requests_total", "Requests sent to each Ollama backend by outcome", ("backend", "outcome"))
+BACKEND_IN_FLIGHT = gauge("ollama_backend_in_flight", "Requests outstanding at each Ollama backend", ("backend",))
+BACKEND_HEALTHY = gauge("ollama_backend_healthy", "1 while an Ollama backend is in rotation", ("backend",))
+BACKEND_LATENCY = histogram("ollama_backend_duration_seconds", "Time for each Ollama backend to answer", ("backend",))
+ROUTER_QUEUED = gauge("ollama_router_queued", "Requests waiting for a free Ollama backend slot")
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class NoBackendAvailable(Exception):
+    """Raised when no Ollama backend has a free slot in time"""
+
+class Backend:
+    """One Ollama host, its limits and what the router knows about it"""
+
+    def __init__(self, url, weight=1.0, max_concurrency=OLLAMA_BACKEND_MAX_CONCURRENCY):
+        if weight <= 0 or max_concurrency < 1:
+            raise ValueError(f"Invalid weight or max_concurrency for Ollama backend {url}")
+        self.url = url
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        parts = urlsplit(url)
+        self.health_url = f"{parts.scheme}://{parts.netloc}{OLLAMA_HEALTH_PATH}"
+
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.latencies = deque(maxlen=1000)
+
+        self.name = parts.netloc
+        self._in_flight = BACKEND_IN_FLIGHT.labels(self.name)
+        self._healthy = BACKEND_HEALTHY.labels(self.name)
+        self._healthy.set(1)
+
+    @classmethod
+    def parse(cls, spec):
+        """Build a backend from "url|weight=2|max_concurrency=4" (options optional)"""
+        url, *options = spec.split("|")
+        settings = {}
+        for option in options:
+            name, _, value = option.partition("=")
+            if name == "weight":
+                settings["weight"] = float(value)
+            elif name in ("max_concurrency", "max"):
+                settings["max_concurrency"] = int(value)
+            else:
+                raise ValueError(f"Unknown Ollama backend option {name!r} in {spec!r}")
+        return cls(url, **settings)
+
+    @property
+    def has_capacity(self):
+        return self.outstanding < self.max_concurrency
+
+    @property
+    def load(self):
+        """Outstanding requests per unit of weight, counting the one about to be sent"""
+        return (self.outstanding + 1) / self.weight
+
+    def record(self, ok, eject_after, readmit_after):
+        """
+        Count a probe or connection outcome; return True if the backend
+        left or rejoined the rotation.
+        """
+        if ok:
+            self.consecutive_failures = 0
+            self.consecutive_successes += 1
+            if not self.healthy and self.consecutive_successes >= readmit_after:
+                self.healthy = True
+                self._healthy.set(1)
+                logger.warning("Ollama backend %s is back in rotation", self.url)
+                return True
+            return False
+
+        self.consecutive_successes = 0
+        self.consecutive_failures += 1
+        if self.healthy and self.consecutive_failures >= eject_after:
+            self.healthy = False
+            self.ejections += 1
+            self._healthy.set(0)
+            logger.warning("Ollama backend %s taken out of rotation", self.url)
+            return True
+        return False
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "max_concurrency": self.max_concurrency,
+            "outstanding": self.outstanding,
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "latency_seconds_p50": _percentile(self.latencies, 0.5),
+            "latency_seconds_p95": _percentile(self.latencies, 0.95)
+        }
+
+class OllamaRouter:
+    """
+    Spreads Ollama requests over several backends.
+
+    Each request goes to the healthy backend with the fewest outstanding
+    requests per unit of weight, among those below their max_concurrency.
+    When every backend is full the request waits up to queue_timeout for a
+    slot. A background task probes each backend's health URL; a backend is
+    taken out of rotation after eject_after consecutive failed probes or
+    connection attempts and put back after readmit_after successes. If no
+    backend is healthy, all of them are tried rather than none. Requests
+    that fail to connect are retried on other backends, up to
+    connect_retries times.
+    """
+
+    def __init__(self, backends, queue_timeout=OLLAMA_QUEUE_TIMEOUT, connect_retries=OLLAMA_CONNECT_RETRIES,
+                 eject_after=OLLAMA_EJECT_AFTER, readmit_after=OLLAMA_READMIT_AFTER,
+                 health_interval=OLLAMA_HEALTH_INTERVAL):
+        if not backends:
+            raise ValueError("At least one Ollama backend is required")
+        self.backends = list(backends)
+        self.queue_timeout = queue_timeout
+        self.connect_retries = connect_retries
+        self.eject_after = eject_after
+        self.readmit_after = readmit_after
+        self.health_interval = health_interval
+
+        self.queued = 0
+        self.queue_timeouts = 0
+        self.retries = 0
+        self._slot_freed = asyncio.Event()
+        self._prober = None
+
+    @classmethod
+    def from_env(cls, default_url):
+        """Build the router from OLLAMA_BACKENDS, or a single backend at default_url"""
+        specs = OLLAMA_BACKENDS.split() or [default_url]
+        return cls([Backend.parse(spec) for spec in specs])
+
+    def _pick(self, exclude):
+        """Return (backend with a free slot or None, whether any backend could take the request later)"""
+        candidates = [backend for backend in self.backends if backend.healthy and backend not in exclude]
+        if not candidates and not any(backend.healthy for backend in self.backends):
+            # Nothing is known to work, so try everything rather than fail outright
+            candidates = [backend for backend in self.backends if backend not in exclude]
+        free = [backend for backend in candidates if backend.has_capacity]
+        if not free:
+            return None, bool(candidates)
+        lowest = min(backend.load for backend in free)
+        # Spread ties so equally loaded backends share the work
+        return random.choice([backend for backend in free if backend.load == lowest]), True
+
+    async def _acquire(self, exclude):
+        backend, possible = self._pick(exclude)
+        if backend is None:
+            if not possible:
+                raise NoBackendAvailable("No Ollama backend left to try")
+            self.queued += 1
+            ROUTER_QUEUED.inc()
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while backend is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not possible:
+                        self.queue_timeouts += 1
+                        raise NoBackendAvailable("Every Ollama backend is at its concurrency limit")
+                    self._slot_freed.clear()
+                    try:
+                        await asyncio.wait_for(self._slot_freed.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    backend, possible = self._pick(exclude)
+            finally:
+                self.queued -= 1
+                ROUTER_QUEUED.dec()
+        backend.outstanding += 1
+        backend.requests += 1
+        backend._in_flight.inc()
+        return backend
+
+    def _release(self, backend):
+        backend.outstanding -= 1
+        backend._in_flight.dec()
+        self._slot_freed.set()
+
+    def _record(self, backend, ok):
+        if backend.record(ok, self.eject_after, self.readmit_after):
+            # The set of candidates changed, so let waiting requests look again
+            self._slot_freed.set()
+
+    async def call(self, send):
+        """
+        Run send(url) against a backend and return its result.
+
+        send is called again with another backend's URL if it fails to
+        connect, so it must build a fresh request each time. Raises
+        NoBackendAvailable when no backend frees up within queue_timeout,
+        and the last connection error once retries run out.
+        """
+        tried = []
+        while True:
+            try:
+                backend = await self._acquire(tried)
+            except NoBackendAvailable:
+                if tried:
+                    raise last_error
+                raise
+
+            started = time.monotonic()
+            try:
+                result = await send(backend.url)
+            except CONNECT_ERRORS as e:
+                self._release(backend)
+                backend.failures += 1
+                BACKEND_REQUESTS.labels(backend.name, "connect_error").inc()
+                self._record(backend, False)
+                tried.append(backend)
+                last_error = e
+                if len(tried) > self.connect_retries:
+                    raise
+                self.retries += 1
+                continue
+            except BaseException:
+                self._release(backend)
+                backend.failures += 1
+                BACKEND_REQUESTS.labels(backend.name, "error").inc()
+                raise
+
+            elapsed = time.monotonic() - started
+            self._release(backend)
+            backend.latencies.append(elapsed)
+            BACKEND_LATENCY.labels(backend.name).observe(elapsed)
+            BACKEND_REQUESTS.labels(backend.name, "ok").inc()
+            self._record(backend, True)
+            return result
+
+    def start(self, client):
+        """Start probing backend health with client (called on app startup)"""
+        if self._prober is None:
+            self._prober = asyncio.ensure_future(self._probe_loop(client))
+
+    async def stop(self):
+        if self._prober is not None:
+            self._prober.cancel()
+            await asyncio.gather(self._prober, return_exceptions=True)
+            self._prober = None
+
+    async def _probe_loop(self, client):
+        while True:
+            await asyncio.gather(*(self._probe(client, backend) for backend in self.backends))
+            await asyncio.sleep(self.health_interval)
+
+    async def _probe(self, client, backend):
+        try:
+            response = await client.get(backend.health_url, timeout=OLLAMA_HEALTH_TIMEOUT)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        self._record(backend, ok)
+
+    @property
+    def healthy_count(self):
+        return sum(1 for backend in self.backends if backend.healthy)
+
+    def stats(self):
+        return {
+            "backends": [backend.stats() for backend in self.backends],
+            "healthy": self.healthy_count,
+            "queued": self.queued,
+            "queue_timeouts": self.queue_timeouts,
+            "connect_retries": self.retries
+        }
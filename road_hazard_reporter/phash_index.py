@@ -0,0 +1,108 @@
+import os
+from itertools import combinations
+from collections import OrderedDict
+from PIL import Image
+
+# Near-duplicate detection settings
+PHASH_RADIUS = int(os.environ.get("PHASH_RADIUS", "6"))  # Negative disables near-duplicate reuse
+PHASH_MATCH_LOCATION = os.environ.get("PHASH_MATCH_LOCATION", "true").lower() == "true"
+# Entries point at result cache keys, so by default (0) the index keeps as many as the
+# cache's memory tier; raise it when a disk tier keeps results longer
+PHASH_MAX_ENTRIES = int(os.environ.get("PHASH_MAX_ENTRIES", "0"))
+
+HASH_BITS = 64
+CHUNK_BITS = 16
+CHUNKS = HASH_BITS // CHUNK_BITS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+def dhash(img, hash_size=8):
+    """Compute a 64-bit difference hash of a PIL image"""
+    gray = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def _flip_masks(max_flips):
+    """All CHUNK_BITS-wide masks with at most max_flips bits set"""
+    masks = [0]
+    for flips in range(1, max_flips + 1):
+        for bits in combinations(range(CHUNK_BITS), flips):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return masks
+
+class PerceptualHashIndex:
+    """
+    Multi-index hash table for Hamming-distance lookup of 64-bit hashes.
+
+    Each hash is split into four 16-bit chunks with one bucket table per chunk.
+    By the pigeonhole principle a hash within distance r of the query matches at
+    least one chunk within distance r // 4, so only those buckets are probed.
+    Least recently added or matched entries are evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # entry id -> (hash, location, value)
+        self._tables = [{} for _ in range(CHUNKS)]  # chunk value -> {entry id: hash}
+        self._masks = {}
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, hash_value, location, value):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (hash_value, location, value)
+        for i, table in enumerate(self._tables):
+            chunk = (hash_value >> (i * CHUNK_BITS)) & CHUNK_MASK
+            table.setdefault(chunk, {})[entry_id] = hash_value
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+
+    def find(self, hash_value, radius, location=None):
+        """
+        Return (entry_id, value, distance) of the closest entry within radius, or None.
+        When location is given only entries stored with the same location match.
+        """
+        masks = self._masks.get(radius // CHUNKS)
+        if masks is None:
+            masks = self._masks[radius // CHUNKS] = _flip_masks(radius // CHUNKS)
+
+        best = None
+        entries = self._entries
+        for i, table in enumerate(self._tables):
+            chunk = (hash_value >> (i * CHUNK_BITS)) & CHUNK_MASK
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if not bucket:
+                    continue
+                for entry_id, candidate in bucket.items():
+                    distance = (candidate ^ hash_value).bit_count()
+                    if distance > radius or (best is not None and distance >= best[2]):
+                        continue
+                    _, entry_location, value = entries[entry_id]
+                    if location is not None and entry_location != location:
+                        continue
+                    best = (entry_id, value, distance)
+        return best
+
+    def touch(self, entry_id):
+        """Mark an entry as recently used, as a match does to its cache entry"""
+        self._entries.move_to_end(entry_id)
+
+    def remove(self, entry_id):
+        hash_value, _, _ = self._entries.pop(entry_id)
+        for i, table in enumerate(self._tables):
+            chunk = (hash_value >> (i * CHUNK_BITS)) & CHUNK_MASK
+            bucket = table[chunk]
+            del bucket[entry_id]
+            if not bucket:
+                del table[chunk]
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from fastapi.concurrency import run_in_threadpool
+
+# Report storage settings
+REPORT_DB = os.environ.get("REPORT_DB", "reports.db")
+REPORT_COMMIT_INTERVAL = float(os.environ.get("REPORT_COMMIT_INTERVAL", "0.02"))
+REPORT_COMMIT_BATCH = int(os.environ.get("REPORT_COMMIT_BATCH", "200"))
+
+CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+
+_id_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+def _encode_ulid(value):
+    chars = []
+    for _ in range(26):
+        chars.append(CROCKFORD_BASE32[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+def new_report_id():
+    """
+    Return a ULID: 48-bit millisecond timestamp plus 80 random bits, base32-encoded.
+
+    IDs sort by creation time. Within one millisecond the random part is
+    incremented, so IDs from this process are strictly increasing.
+    """
+    global _last_ms, _last_random
+    now_ms = int(time.time() * 1000)
+    with _id_lock:
+        if now_ms <= _last_ms:
+            now_ms = _last_ms
+            random_part = _last_random + 1
+            if random_part >> RANDOM_BITS:
+                now_ms += 1
+                random_part = int.from_bytes(os.urandom(10), "big")
+        else:
+            random_part = int.from_bytes(os.urandom(10), "big")
+        _last_ms, _last_random = now_ms, random_part
+    return _encode_ulid((now_ms << RANDOM_BITS) | random_part)
+
+def id_floor(timestamp_ms):
+    """Smallest ULID for the given millisecond timestamp"""
+    return _encode_ulid(timestamp_ms << RANDOM_BITS)
+
+def id_ceiling(timestamp_ms):
+    """Largest ULID for the given millisecond timestamp"""
+    return _encode_ulid((timestamp_ms << RANDOM_BITS) | ((1 << RANDOM_BITS) - 1))
+
+def normalize_severity(text):
+    """Bucket free-text model output into high, medium, low or unknown"""
+    lowered = (text or "").lower()
+    for level in ("high", "medium", "low"):
+        if level in lowered:
+            return level
+    return "unknown"
+
+def normalize_label(text):
+    """First line of a free-text field, trimmed and lowercased for indexing"""
+    first_line = (text or "").strip(" :*-\n\t").split("\n", 1)[0]
+    return first_line.strip(" :*-\t").lower()[:100] or "unknown"
+
+def dedupe_key(report):
+    """Hash of the fields that make two reports the same submission"""
+    core = [report["location"], report["damage_details"], report["description"], report["ai_analysis"]]
+    return hashlib.sha256(json.dumps(core, sort_keys=True).encode("utf-8")).hexdigest()
+
+class ReportStore:
+    """
+    SQLite (WAL) store for generated reports.
+
+    Writes are queued and committed in batches by a background task, so many
+    concurrent submissions share one transaction; add() returns once its batch
+    is durable. Reads use a separate connection and keyset pagination on the
+    time-sortable report ID.
+    """
+
+    def __init__(self, db_path=REPORT_DB):
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._write_conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA synchronous=NORMAL")
+        self._write_conn.executescript(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            " id TEXT PRIMARY KEY,"
+            " severity TEXT NOT NULL,"
+            " damage_type TEXT NOT NULL,"
+            " location TEXT,"
+            " dedupe_key TEXT NOT NULL UNIQUE,"
+            " data TEXT NOT NULL);"
+            # The ULID primary key doubles as the timestamp index
+            "CREATE INDEX IF NOT EXISTS reports_severity ON reports (severity, id);"
+            "CREATE INDEX IF NOT EXISTS reports_damage_type ON reports (damage_type, id);"
+            "CREATE INDEX IF NOT EXISTS reports_location ON reports (location, id);"
+        )
+        columns = {row[1] for row in self._write_conn.execute("PRAGMA table_info(reports)")}
+        if "latitude" not in columns:
+            self._write_conn.execute("ALTER TABLE reports ADD COLUMN latitude REAL")
+            self._write_conn.execute("ALTER TABLE reports ADD COLUMN longitude REAL")
+        self._write_conn.commit()
+        self._read_conn = sqlite3.connect(db_path, check_same_thread=False)
+
+        self._pending = []
+        self._pending_keys = {}
+        self._wakeup = asyncio.Event()
+        self._writer_task = None
+        self._closed = False
+
+    async def add(self, report):
+        """
+        Store a report, returning (report, created).
+
+        If an identical report was already stored or is waiting to be
+        committed, that report is returned with created False. That includes
+        one another process stored first: the row that won the insert is read
+        back after the commit.
+        """
+        key = dedupe_key(report)
+        pending = self._pending_keys.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), False
+        existing = await run_in_threadpool(self._get_by_dedupe_key, key)
+        if existing is not None:
+            return existing, False
+        # An identical report may have been queued while the lookup ran
+        pending = self._pending_keys.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), False
+
+        if self._writer_task is None:
+            self._writer_task = asyncio.ensure_future(self._writer())
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending_keys[key] = future
+        coordinates = report.get("coordinates") or {}
+        row = (
+            report["report_id"],
+            normalize_severity(report["damage_details"]["severity"]),
+            normalize_label(report["damage_details"]["type"]),
+            report["location"],
+            key,
+            json.dumps(report),
+            coordinates.get("latitude"),
+            coordinates.get("longitude")
+        )
+        self._pending.append((row, report, future))
+        self._wakeup.set()
+        stored = await asyncio.shield(future)
+        return stored, stored["report_id"] == report["report_id"]
+
+    async def _writer(self):
+        while True:
+            await self._wakeup.wait()
+            # Give concurrent submissions a moment to join this commit
+            if not self._closed and len(self._pending) < REPORT_COMMIT_BATCH:
+                await asyncio.sleep(REPORT_COMMIT_INTERVAL)
+            self._wakeup.clear()
+            await self._flush()
+            if self._closed and not self._pending:
+                return
+
+    async def _flush(self):
+        batch, self._pending = self._pending[:REPORT_COMMIT_BATCH], self._pending[REPORT_COMMIT_BATCH:]
+        if self._pending:
+            self._wakeup.set()
+        if not batch:
+            return
+        try:
+            winners = await run_in_threadpool(self._write, [row for row, _, _ in batch])
+        except Exception as e:
+            for row, _, future in batch:
+                self._pending_keys.pop(row[4], None)
+                future.set_exception(e)
+            return
+        for row, report, future in batch:
+            self._pending_keys.pop(row[4], None)
+            future.set_result(winners.get(row[4], report))
+
+    def _write(self, rows):
+        """
+        Insert rows, returning {dedupe_key: report} for rows that were ignored.
+
+        A row is ignored when a report with the same dedupe key was committed
+        by another writer; the stored report is returned in its place.
+        """
+        with self._write_lock:
+            with self._write_conn:
+                changes = self._write_conn.total_changes
+                self._write_conn.executemany(
+                    "INSERT OR IGNORE INTO reports "
+                    "(id, severity, damage_type, location, dedupe_key, data, latitude, longitude) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                if self._write_conn.total_changes - changes == len(rows):
+                    return {}
+                ids = {row[4]: row[0] for row in rows}
+                winners = {}
+                keys = list(ids)
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    for key, report_id, data in self._write_conn.execute(
+                        f"SELECT dedupe_key, id, data FROM reports WHERE dedupe_key IN ({placeholders})", chunk
+                    ):
+                        if report_id != ids[key]:
+                            winners[key] = json.loads(data)
+                return winners
+
+    def _get_by_dedupe_key(self, key):
+        with self._read_lock:
+            row = self._read_conn.execute("SELECT data FROM reports WHERE dedupe_key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, report_id):
+        with self._read_lock:
+            row = self._read_conn.execute("SELECT data FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, report_ids):
+        """Return reports for the given IDs, in the same order"""
+        found = {}
+        ids = list(report_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._read_lock:
+                rows = self._read_conn.execute(
+                    f"SELECT id, data FROM reports WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+            found.update((report_id, json.loads(data)) for report_id, data in rows)
+        return [found[report_id] for report_id in ids if report_id in found]
+
+    def iter_coordinates(self):
+        """Yield (id, latitude, longitude, severity) for every report with coordinates"""
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT id, latitude, longitude, severity FROM reports WHERE latitude IS NOT NULL"
+            ).fetchall()
+        yield from rows
+
+    def query(self, severity=None, damage_type=None, location=None,
+              since_ms=None, until_ms=None, cursor=None, limit=50):
+        """
+        Return (reports, next_cursor), newest first.
+
+        Filters use the (column, id) indexes and time bounds become ranges on
+        the ULID primary key, so each page costs one index range scan no
+        matter how many reports are stored.
+        """
+        clauses, params = [], []
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity.lower())
+        if damage_type:
+            clauses.append("damage_type = ?")
+            params.append(damage_type.lower())
+        if location:
+            clauses.append("location = ?")
+            params.append(location)
+        if since_ms is not None:
+            clauses.append("id >= ?")
+            params.append(id_floor(since_ms))
+        if until_ms is not None:
+            clauses.append("id <= ?")
+            params.append(id_ceiling(until_ms))
+        if cursor:
+            clauses.append("id < ?")
+            params.append(cursor)
+
+        sql = "SELECT id, data FROM reports"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, params).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [json.loads(data) for _, data in rows[:limit]], next_cursor
+
+    async def close(self):
+        """Commit queued writes and close the database"""
+        self._closed = True
+        if self._writer_task is not None:
+            self._wakeup.set()
+            await self._writer_task
+            self._writer_task = None
+        while self._pending:
+            await self._flush()
+        with self._write_lock:
+            self._write_conn.close()
+        with self._read_lock:
+            self._read_conn.close()
@@ -0,0 +1,23 @@
+import os
+import json
+import hashlib
+
+from common.cache import TieredCache
+
+# Result cache settings
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "1024"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "86400"))
+RESULT_CACHE_DB = os.environ.get("RESULT_CACHE_DB", "")  # Empty disables the disk tier
+
+def make_key(image_digest, model, prompt_version, location, description):
+    """Build a content-addressed cache key from an image SHA-256 and the request parameters"""
+    meta = json.dumps([model, prompt_version, location, description])
+    return hashlib.sha256(f"{image_digest}:{meta}".encode("utf-8")).hexdigest()
+
+class ResultCache(TieredCache):
+    """Two-tier analysis cache: in-memory LRU in front of an optional SQLite store"""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES,
+                 ttl=RESULT_CACHE_TTL, db_path=RESULT_CACHE_DB):
+        super().__init__(max_entries, max_bytes, ttl, db_path, "result_cache")
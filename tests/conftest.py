@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The services import their own modules by bare name and share common/ from the root
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+for path in (ROOT, os.path.join(ROOT, "traffic_fine_analyzer"), os.path.join(ROOT, "road_hazard_reporter")):
+    sys.path.insert(0, path)
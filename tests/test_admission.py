@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from common.admission import AdmissionController, RateLimiter, Rejected, TokenBucket
+
+def test_token_bucket_allows_bursts_then_the_rate():
+    bucket = TokenBucket(rate=2, burst=3, now=0.0)
+    assert [bucket.take(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    assert bucket.take(0.5) == 0.0
+
+def test_rate_limiter_keeps_a_bucket_per_client_up_to_max_clients():
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+    assert limiter.check("a") == 0
+    assert limiter.check("a") > 0
+    assert limiter.check("b") == 0
+    assert limiter.check("c") == 0
+    assert limiter.stats()["clients"] == 2
+    # "a" was evicted as the least recently seen, so it starts with a full bucket
+    assert limiter.check("a") == 0
+    assert limiter.stats()["limited"] == 1
+
+def test_waiters_are_admitted_in_priority_order():
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait=5, batch_share=1)
+        await controller.acquire("interactive")
+        order = []
+
+        async def request(priority, name):
+            await controller.acquire(priority)
+            order.append(name)
+            controller.release(priority, 0.01)
+
+        waiters = [
+            asyncio.ensure_future(request("batch", "batch")),
+            asyncio.ensure_future(request("interactive", "interactive"))
+        ]
+        await asyncio.sleep(0)
+        assert controller.waiting == 2
+        controller.release("interactive", 0.01)
+        await asyncio.gather(*waiters)
+        return order, controller.stats()
+
+    order, stats = asyncio.run(main())
+    assert order == ["interactive", "batch"]
+    assert stats["admitted"] == 3
+    assert stats["active"] == {"interactive": 0, "batch": 0}
+
+def test_full_queue_sheds_lower_priority_and_rejects_the_rest():
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait=5, batch_share=1)
+        await controller.acquire("interactive")
+        batch = asyncio.ensure_future(controller.acquire("batch"))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(controller.acquire("interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as shed:
+            await batch
+        with pytest.raises(Rejected) as full:
+            await controller.acquire("batch")
+        controller.release("interactive", 0.01)
+        await interactive
+        return shed.value, full.value, controller.stats()
+
+    shed, full, stats = asyncio.run(main())
+    assert (shed.status_code, shed.reason) == (503, "shed")
+    assert full.reason == "queue_full"
+    assert full.retry_after >= 1
+    assert stats["rejected"] == {"shed": 1, "queue_full": 1}
+
+def test_batch_requests_leave_room_for_interactive_ones():
+    async def main():
+        controller = AdmissionController(max_concurrency=2, max_queue=4, max_wait=0.05, batch_share=0.5)
+        await controller.acquire("batch")
+        with pytest.raises(Rejected) as timed_out:
+            await controller.acquire("batch")
+        await controller.acquire("interactive")
+        return timed_out.value, controller.stats()
+
+    timed_out, stats = asyncio.run(main())
+    assert timed_out.reason == "queue_timeout"
+    assert stats["active"] == {"interactive": 1, "batch": 1}
+    assert stats["waiting"] == {"interactive": 0, "batch": 0}
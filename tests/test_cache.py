@@ -0,0 +1,48 @@
+import asyncio
+
+from common.cache import MemoryCache, TieredCache
+
+def test_changing_a_hit_does_not_change_the_cache():
+    async def main():
+        cache = TieredCache(10, 1 << 20, 60, "", "test_cache")
+        value = {"analysis": {"severity": "high"}, "tags": ["pothole"]}
+        await cache.set("key", value)
+        value["tags"].append("set")
+        hit = await cache.get("key")
+        hit["analysis"]["severity"] = "low"
+        return await cache.get("key")
+
+    assert asyncio.run(main()) == {"analysis": {"severity": "high"}, "tags": ["pothole"]}
+
+def test_disk_tier_survives_a_new_cache_and_is_promoted(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def main():
+        first = TieredCache(10, 1 << 20, 60, path, "test_cache")
+        await first.set("key", {"value": 1})
+        first.close()
+        second = TieredCache(10, 1 << 20, 60, path, "test_cache")
+        hits = [await second.get("key"), await second.get("key"), await second.get("missing")]
+        second.close()
+        return hits, second.stats()
+
+    hits, stats = asyncio.run(main())
+    assert hits == [{"value": 1}, {"value": 1}, None]
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+def test_memory_cache_evicts_least_recently_used_within_its_bounds():
+    cache = MemoryCache(max_entries=2, max_bytes=10, ttl=60)
+    cache.set("a", "A", 4)
+    cache.set("b", "B", 4)
+    cache.get("a")
+    cache.set("c", "C", 4)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+    cache.set("big", "X", 11)
+    assert cache.get("big") is None
+    assert cache.total_bytes == 8
+
+def test_memory_cache_entries_expire():
+    cache = MemoryCache(max_entries=2, max_bytes=10, ttl=-1)
+    cache.set("a", "A", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
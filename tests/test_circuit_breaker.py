@@ -0,0 +1,55 @@
+import time
+
+from common.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+def make_breaker(**options):
+    settings = dict(window=4, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0, slow_rate=0.75, open_seconds=60)
+    settings.update(options)
+    return CircuitBreaker("test", **settings)
+
+def test_opens_once_the_failure_rate_is_reached_over_min_calls():
+    breaker = make_breaker()
+    breaker.failure()
+    breaker.failure()
+    breaker.success(0.1)
+    assert breaker.state == CLOSED
+    breaker.success(0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    snapshot = breaker.snapshot()
+    assert (snapshot["rejected"], snapshot["times_opened"]) == (1, 1)
+    assert 0 < snapshot["retry_after_seconds"] <= 60
+
+def test_opens_on_slow_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.success(2.0)
+    breaker.success(0.1)
+    assert breaker.is_open
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = make_breaker(open_seconds=0.01)
+    for _ in range(4):
+        breaker.failure()
+    time.sleep(0.02)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # One probe at a time
+    breaker.failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()  # Abandoned probe gives its slot back
+    assert breaker.allow()
+    breaker.success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_calls"] == 0
+
+def test_late_results_do_not_count_while_open():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.failure()
+    breaker.success(0.1)
+    assert breaker.snapshot()["window_calls"] == 4
+    assert breaker.is_open
@@ -0,0 +1,65 @@
+import random
+
+from driver_store import DriverStore, DRIVER_ADVICE_MAX_AGE
+from fine_stats import FineColumns, compute_statistics
+from test_fine_stats import make_fines
+
+SHARED_KEYS = [
+    "total_fines", "total_amount", "fine_types", "most_common_fine", "amount_by_type",
+    "monthly_histogram", "weekday_histogram", "top_locations"
+]
+
+def test_deltas_give_the_statistics_of_the_whole_history(tmp_path):
+    rng = random.Random(31)
+    store = DriverStore(str(tmp_path / "drivers.db"))
+    history = []
+    for _ in range(8):
+        delta = make_fines(rng, rng.randint(1, 15))
+        history += delta
+        state, _ = store.append("driver", delta, "v1")
+
+    statistics = store.get("driver").statistics()
+    expected = compute_statistics(FineColumns.from_fines(history))
+    assert {key: statistics[key] for key in SHARED_KEYS} == {key: expected[key] for key in SHARED_KEYS}
+    assert statistics["amount_range"]["min"] == expected["amount_percentiles"]["min"]
+    assert statistics["amount_range"]["max"] == expected["amount_percentiles"]["max"]
+    assert [list(fine) for fine in state.recent] == [list(fine) for fine in history[-len(state.recent):]]
+    assert state.first_recent_number == len(history) - len(state.recent) + 1
+    store.close()
+
+def test_advice_is_reused_until_the_profile_changes(tmp_path):
+    store = DriverStore(str(tmp_path / "drivers.db"))
+    speeding = make_fines(random.Random(32), 10)
+    speeding = [fine._replace(type="Speeding", amount=10.0) for fine in speeding]
+
+    state, reasons = store.append("driver", speeding[:8], "v1")
+    assert reasons == ["first analysis"]
+    store.record_analysis("driver", {"analysis": "advice"}, state.profile("v1"))
+
+    state, reasons = store.append("driver", speeding[8:9], "v1")
+    assert reasons == []
+    assert state.analysis == {"analysis": "advice"}
+
+    state, reasons = store.append("driver", [speeding[9]._replace(type="Red Light")], "v1")
+    assert [reason.split(":")[0] for reason in reasons] == ["new fine type", "fines grew"]
+    assert state.reanalysis_reasons("v2")[0] == "prompt changed"
+    if DRIVER_ADVICE_MAX_AGE > 0:
+        later = state.analyzed["at"] + DRIVER_ADVICE_MAX_AGE + 1
+        assert "advice expired" in state.reanalysis_reasons("v1", now=later)
+
+    stats = store.stats()
+    assert (stats["drivers"], stats["updates"], stats["reanalyzed"], stats["advice_reused"]) == (1, 3, 2, 1)
+    store.close()
+
+def test_deleted_driver_starts_over_and_ignores_late_advice(tmp_path):
+    store = DriverStore(str(tmp_path / "drivers.db"))
+    fines = make_fines(random.Random(33), 3)
+    state, _ = store.append("driver", fines, "v1")
+    assert store.delete("driver")
+    assert not store.delete("driver")
+    store.record_analysis("driver", {"analysis": "late"}, state.profile("v1"))
+    assert store.get("driver") is None
+    state, reasons = store.append("driver", fines[:1], "v1")
+    assert state.total_fines == 1
+    assert reasons == ["first analysis"]
+    store.close()
@@ -0,0 +1,107 @@
+import random
+import datetime
+from collections import Counter, defaultdict, namedtuple
+
+import numpy as np
+
+from fine_stats import WEEKDAYS, FineColumns, compute_statistics, compute_fleet_statistics
+
+Fine = namedtuple("Fine", "date type amount location description")
+
+FINE_TYPES = ["Speeding", "Red Light", "Illegal Parking", "Seatbelt"]
+LOCATIONS = ["Sheikh Zayed Rd", "Al Khail Rd", "Emirates Rd", None]
+
+def make_fines(rng, count):
+    return [
+        Fine(
+            f"20{rng.randint(20, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            rng.choice(FINE_TYPES),
+            float(rng.choice([150, 300, 400, 600, 1000])),
+            rng.choice(LOCATIONS),
+            ""
+        )
+        for _ in range(count)
+    ]
+
+def loop_statistics(fines):
+    """The statistics compute_statistics returns, written as plain loops"""
+    types = Counter(fine.type for fine in fines)
+    amount_by_type = defaultdict(float)
+    days_by_type = defaultdict(list)
+    months, weekdays, locations = Counter(), Counter(), Counter()
+    for fine in fines:
+        amount_by_type[fine.type] += fine.amount
+        day = datetime.date.fromisoformat(fine.date)
+        days_by_type[fine.type].append(day.toordinal())
+        months[fine.date[:7]] += 1
+        weekdays[WEEKDAYS[day.weekday()]] += 1
+        if fine.location:
+            locations[fine.location] += 1
+
+    intervals = {}
+    for fine_type, days in days_by_type.items():
+        days.sort()
+        gaps = [later - earlier for earlier, later in zip(days, days[1:])]
+        if gaps:
+            intervals[fine_type] = {
+                "repeats": len(gaps),
+                "mean_days": round(sum(gaps) / len(gaps), 1),
+                "min_days": min(gaps)
+            }
+
+    # most_common keeps first-seen order for equal counts
+    fine_types = dict(types.most_common())
+    amounts = [fine.amount for fine in fines]
+    return {
+        "total_fines": len(fines),
+        "total_amount": sum(amounts),
+        "fine_types": fine_types,
+        "most_common_fine": next(iter(fine_types)),
+        "amount_by_type": {name: round(amount_by_type[name], 2) for name in fine_types},
+        "amount_percentiles": {
+            "min": min(amounts),
+            "p25": round(float(np.percentile(amounts, 25)), 2),
+            "p50": round(float(np.percentile(amounts, 50)), 2),
+            "p75": round(float(np.percentile(amounts, 75)), 2),
+            "p90": round(float(np.percentile(amounts, 90)), 2),
+            "max": max(amounts),
+            "mean": round(sum(amounts) / len(amounts), 2)
+        },
+        "monthly_histogram": dict(sorted(months.items())),
+        "weekday_histogram": {name: weekdays[name] for name in WEEKDAYS},
+        "repeat_offense_intervals": intervals,
+        "top_locations": [{"location": name, "count": count} for name, count in locations.most_common(5)]
+    }
+
+def test_statistics_match_loop_reference():
+    rng = random.Random(21)
+    for count in (1, 2, 7, 200):
+        fines = make_fines(rng, count)
+        statistics = compute_statistics(FineColumns.from_fines(fines))
+        expected = loop_statistics(fines)
+        assert statistics.pop("repeat_offense_intervals") == expected.pop("repeat_offense_intervals")
+        assert statistics == expected
+
+def test_fleet_statistics_match_per_driver_statistics():
+    rng = random.Random(22)
+    histories = [make_fines(rng, rng.randint(0, 40)) for _ in range(30)]
+    fleet = compute_fleet_statistics(histories)
+    for fines, statistics in zip(histories, fleet):
+        if fines:
+            assert statistics == compute_statistics(FineColumns.from_fines(fines))
+        else:
+            assert statistics is None
+
+def test_unparseable_dates_are_left_out_of_date_histograms():
+    fines = [
+        Fine("2024-03-04", "Speeding", 100.0, "A", ""),
+        Fine("not a date", "Speeding", 200.0, "A", ""),
+        Fine("2024-03-11T08:00:00", "Speeding", 300.0, None, "")
+    ]
+    statistics = compute_statistics(FineColumns.from_fines(fines))
+    assert statistics["total_fines"] == 3
+    assert statistics["total_amount"] == 600.0
+    assert statistics["monthly_histogram"] == {"2024-03": 2}
+    assert statistics["weekday_histogram"]["Monday"] == 2
+    assert statistics["repeat_offense_intervals"] == {"Speeding": {"repeats": 1, "mean_days": 7.0, "min_days": 7}}
+    assert statistics["top_locations"] == [{"location": "A", "count": 2}]
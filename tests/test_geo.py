@@ -0,0 +1,54 @@
+import random
+
+from geo import GridIndex, haversine_m, parse_coordinates
+
+def random_points(rng, count):
+    """Points spread over the globe, a third of them within a few degrees of the antimeridian"""
+    points = []
+    for i in range(count):
+        if i % 3 == 0:
+            lon = rng.choice([-1, 1]) * rng.uniform(175, 180)
+        else:
+            lon = rng.uniform(-180, 180)
+        points.append((f"p{i}", rng.uniform(-80, 80), lon, rng.choice(["high", "low"])))
+    return points
+
+def make_index(points, cell_deg):
+    index = GridIndex(cell_deg)
+    for item_id, lat, lon, severity in points:
+        index.add(item_id, lat, lon, severity)
+    return index
+
+def test_radius_and_nearest_match_brute_force_across_the_antimeridian():
+    rng = random.Random(7)
+    points = random_points(rng, 600)
+    for cell_deg in (0.5, 2.0):
+        index = make_index(points, cell_deg)
+        for _ in range(50):
+            lat, lon = rng.uniform(-70, 70), rng.choice([-1, 1]) * rng.uniform(170, 180)
+            distances = sorted((haversine_m(lat, lon, p_lat, p_lon), item_id) for item_id, p_lat, p_lon, _ in points)
+            radius_m = rng.uniform(50000, 800000)
+            assert index.radius(lat, lon, radius_m) == [match for match in distances if match[0] <= radius_m]
+            assert index.nearest(lat, lon, 5) == distances[:5]
+
+def test_severity_filter_applies_to_radius_and_nearest():
+    index = make_index([("a", 0, 179.9, "high"), ("b", 0, -179.9, "low")], 0.1)
+    assert [item_id for _, item_id in index.radius(0, 180, 50000, "low")] == ["b"]
+    assert [item_id for _, item_id in index.nearest(0, 179.95, 1, "low")] == ["b"]
+
+def test_bbox_crossing_the_antimeridian():
+    rng = random.Random(8)
+    points = random_points(rng, 600)
+    index = make_index(points, 1.0)
+    for min_lon, max_lon in ((170, -170), (179.5, -179.5), (-10, 10), (-180, 180)):
+        expected = {
+            item_id for item_id, lat, lon, _ in points
+            if -20 <= lat <= 20 and (min_lon <= lon <= max_lon if min_lon <= max_lon else lon >= min_lon or lon <= max_lon)
+        }
+        assert set(index.bbox(-20, min_lon, 20, max_lon)) == expected
+    assert len(index.bbox(-90, 170, 90, -170, limit=3)) == 3
+
+def test_parse_coordinates_ignores_numbers_that_are_not_positions():
+    assert parse_coordinates("Near 25.2048, 55.2708 by the bridge") == (25.2048, 55.2708)
+    assert parse_coordinates("House 12, 34th Street") is None
+    assert parse_coordinates("95.5, 10.5") is None
@@ -0,0 +1,54 @@
+import io
+import asyncio
+
+from fastapi import UploadFile
+
+from jobs import JobQueue
+
+def make_queue(tmp_path, **options):
+    return JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "images"), **options)
+
+def enqueue(queue, data=b"image"):
+    return asyncio.run(queue.enqueue(UploadFile(file=io.BytesIO(data), filename="image.jpg"), "Main St", "", None))
+
+def test_job_is_failed_after_its_last_lease_lapses(tmp_path):
+    queue = make_queue(tmp_path, lease=-1, max_attempts=2)
+    job_id = enqueue(queue)
+    # Each worker dies holding the job, so its lease lapses at once
+    assert queue.claim()["attempts"] == 1
+    assert queue.claim()["attempts"] == 2
+    assert queue.claim() is None
+    abandoned = queue.fail_abandoned()
+    assert [job["id"] for job in abandoned] == [job_id]
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["error"]["status_code"] == 500
+    assert not (tmp_path / "images" / job_id).exists()
+    assert queue.fail_abandoned() == []
+
+def test_worker_that_lost_its_lease_cannot_finish_the_job(tmp_path):
+    queue = make_queue(tmp_path, lease=-1)
+    job_id = enqueue(queue)
+    stale = queue.claim()
+    current = queue.claim()
+    assert current["id"] == stale["id"] == job_id
+    assert not queue.renew(stale)
+    assert not queue.finish(stale, result={"stale": True})
+    assert queue.get(job_id)["status"] == "running"
+    assert queue.finish(current, result={"fresh": True})
+    job = queue.get(job_id)
+    assert (job["status"], job["result"]) == ("completed", {"fresh": True})
+    assert queue.claim() is None
+
+def test_live_lease_keeps_the_job_and_finished_jobs_are_pruned(tmp_path):
+    queue = make_queue(tmp_path, lease=60, retention=-1)
+    job_id = enqueue(queue)
+    job = queue.claim()
+    assert queue.claim() is None
+    assert queue.renew(job)
+    assert queue.finish(job, status_code=400, error="Invalid image")
+    assert queue.get(job_id)["error"] == {"status_code": 400, "detail": "Invalid image"}
+    assert queue.stats()["failed"] == 1
+    assert queue.prune() == 1
+    assert queue.get(job_id) is None
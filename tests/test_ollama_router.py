@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+
+from ollama_router import Backend, NoBackendAvailable, OllamaRouter
+
+def make_router(specs, **options):
+    return OllamaRouter([Backend.parse(spec) for spec in specs], **options)
+
+def test_parse_reads_weight_and_max_concurrency():
+    backend = Backend.parse("http://gpu1:11434/api/chat|weight=2|max_concurrency=4")
+    assert (backend.url, backend.weight, backend.max_concurrency) == ("http://gpu1:11434/api/chat", 2.0, 4)
+    assert backend.health_url == "http://gpu1:11434/api/tags"
+    with pytest.raises(ValueError):
+        Backend.parse("http://gpu1:11434/api/chat|speed=2")
+
+def test_requests_go_to_the_least_loaded_backend_by_weight():
+    async def main():
+        router = make_router(["http://heavy/api/chat|weight=4", "http://light/api/chat"])
+        release = asyncio.Event()
+        sent = []
+
+        async def send(url):
+            sent.append(url)
+            await release.wait()
+
+        # Equal loads are broken at random, but the totals come out the same either way
+        calls = [asyncio.ensure_future(router.call(send)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*calls)
+        return sent
+
+    sent = asyncio.run(main())
+    assert sent.count("http://heavy/api/chat") == 4
+    assert sent.count("http://light/api/chat") == 1
+
+def test_connect_errors_retry_elsewhere_and_eject_the_backend():
+    async def main():
+        # The dead backend's weight makes it the first choice while it is in rotation
+        router = make_router(["http://down/api/chat|weight=2", "http://up/api/chat"], eject_after=1, connect_retries=1)
+
+        async def send(url):
+            if "down" in url:
+                raise httpx.ConnectError("refused")
+            return url
+
+        results = [await router.call(send) for _ in range(3)]
+        return results, router
+
+    results, router = asyncio.run(main())
+    assert results == ["http://up/api/chat"] * 3
+    down, up = router.backends
+    assert not down.healthy and down.ejections == 1
+    assert (down.requests, up.requests, router.retries) == (1, 3, 1)
+    assert router.healthy_count == 1
+
+def test_full_backends_queue_until_timeout():
+    async def main():
+        router = make_router(["http://only/api/chat|max_concurrency=1"], queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def send(url):
+            await release.wait()
+            return url
+
+        first = asyncio.ensure_future(router.call(send))
+        await asyncio.sleep(0)
+        with pytest.raises(NoBackendAvailable):
+            await router.call(send)
+        waiting = asyncio.ensure_future(router.call(send))
+        await asyncio.sleep(0)
+        release.set()
+        return await first, await waiting, router.queue_timeouts
+
+    first, waiting, timeouts = asyncio.run(main())
+    assert first == waiting == "http://only/api/chat"
+    assert timeouts == 1
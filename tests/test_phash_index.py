@@ -0,0 +1,65 @@
+import random
+
+from PIL import Image
+
+from phash_index import PerceptualHashIndex, dhash
+
+def flip_bits(rng, value, count):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+def brute_force(entries, hash_value, radius, location=None):
+    """Smallest distance within radius over (hash, location) pairs, or None"""
+    distances = [
+        (hash_value ^ candidate).bit_count()
+        for candidate, entry_location in entries
+        if location is None or entry_location == location
+    ]
+    distances = [distance for distance in distances if distance <= radius]
+    return min(distances) if distances else None
+
+def test_find_matches_brute_force_hamming_search():
+    rng = random.Random(11)
+    index = PerceptualHashIndex(10000)
+    entries = []
+    for i in range(2000):
+        hash_value = rng.getrandbits(64)
+        location = rng.choice(["A", "B"])
+        index.add(hash_value, location, f"key{i}")
+        entries.append((hash_value, location))
+
+    for _ in range(300):
+        base, _ = rng.choice(entries)
+        query = flip_bits(rng, base, rng.randint(0, 14))
+        radius = rng.randint(0, 12)
+        location = rng.choice([None, "A"])
+        match = index.find(query, radius, location)
+        expected = brute_force(entries, query, radius, location)
+        assert (match[2] if match else None) == expected
+        if match is not None:
+            _, value, distance = match
+            matched_hash, matched_location = entries[int(value[3:])]
+            assert (matched_hash ^ query).bit_count() == distance
+            assert location is None or matched_location == location
+
+def test_least_recently_used_entry_is_evicted():
+    index = PerceptualHashIndex(2)
+    index.add(0b1, "A", "first")
+    index.add(0b10 << 20, "A", "second")
+    entry_id, _, _ = index.find(0b1, 0)
+    index.touch(entry_id)
+    index.add(0b100 << 40, "A", "third")
+    assert len(index) == 2
+    assert index.find(0b1, 0)[1] == "first"
+    assert index.find(0b10 << 20, 0) is None
+    assert index.find(0b100 << 40, 0)[1] == "third"
+
+def test_dhash_survives_re_encoding_and_tells_images_apart():
+    rng = random.Random(12)
+    gradient = Image.new("L", (64, 48))
+    gradient.putdata([(x * 4 + y * 2 + rng.randint(0, 3)) % 256 for y in range(48) for x in range(64)])
+    resized = gradient.resize((128, 96))
+    flipped = gradient.transpose(Image.FLIP_LEFT_RIGHT)
+    assert (dhash(gradient) ^ dhash(resized)).bit_count() <= 6
+    assert (dhash(gradient) ^ dhash(flipped)).bit_count() > 20
@@ -0,0 +1,79 @@
+import asyncio
+
+from report_store import ReportStore, new_report_id
+
+def make_report(location="Main St", description="crack", report_id=None):
+    return {
+        "report_id": report_id or new_report_id(),
+        "location": location,
+        "damage_details": {"type": "Pothole", "severity": "High", "safety_impact": "", "recommended_action": ""},
+        "description": description,
+        "ai_analysis": "analysis",
+        "coordinates": None
+    }
+
+def test_identical_reports_are_stored_once(tmp_path):
+    async def main():
+        store = ReportStore(str(tmp_path / "reports.db"))
+        results = await asyncio.gather(*(store.add(make_report()) for _ in range(5)))
+        again = await store.add(make_report())
+        page, _ = store.query()
+        await store.close()
+        return results, again, page
+
+    results, again, page = asyncio.run(main())
+    assert [created for _, created in results].count(True) == 1
+    assert len({report["report_id"] for report, _ in results}) == 1
+    assert again == (results[0][0], False)
+    assert len(page) == 1
+
+def test_report_committed_by_another_store_wins(tmp_path):
+    async def main():
+        path = str(tmp_path / "reports.db")
+        first, second = ReportStore(path), ReportStore(path)
+        # Both stores miss each other's row in the lookup and race on the insert
+        results = await asyncio.gather(first.add(make_report()), second.add(make_report()))
+        await first.close()
+        await second.close()
+        return results
+
+    (one, one_created), (other, other_created) = asyncio.run(main())
+    assert one["report_id"] == other["report_id"]
+    assert [one_created, other_created].count(True) == 1
+
+def test_query_pages_newest_first_with_filters_and_time_bounds(tmp_path):
+    async def main():
+        store = ReportStore(str(tmp_path / "reports.db"))
+        reports = []
+        for i in range(25):
+            report = make_report(location=f"Street {i % 3}", description=f"report {i}")
+            report["damage_details"]["severity"] = "High risk" if i % 2 else "low"
+            reports.append((await store.add(report))[0])
+        await store.close()
+        return reports
+
+    reports = asyncio.run(main())
+    store = ReportStore(str(tmp_path / "reports.db"))
+    newest_first = [report["report_id"] for report in reversed(reports)]
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = store.query(limit=10, cursor=cursor)
+        pages.append([report["report_id"] for report in page])
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == newest_first
+
+    page, cursor = store.query(severity="HIGH", location="Street 1", limit=50)
+    assert cursor is None
+    assert [report["report_id"] for report in page] == [
+        report["report_id"] for report in reversed(reports)
+        if report["location"] == "Street 1" and report["damage_details"]["severity"] == "High risk"
+    ]
+    assert store.query(damage_type="pothole", limit=1)[0][0]["report_id"] == newest_first[0]
+
+    assert store.query(until_ms=0)[0] == []
+    assert len(store.query(since_ms=0, limit=100)[0]) == 25
+    assert store.get_many(newest_first[:3] + ["missing"]) == [store.get(report_id) for report_id in newest_first[:3]]
+    asyncio.run(store.close())
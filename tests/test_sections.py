@@ -0,0 +1,232 @@
+import random
+
+from sections import SECTIONS, SectionStream, extract_sections
+from fields import FIELDS, FieldStream, extract_fields
+from common.section_parser import StreamScanner
+
+FUZZ_CASES = 10000
+
+INLINE_MENTION = """## Pattern Analysis
+Most fines are for speeding. Read the Personalized Safety Tips
+below before your next trip.
+
+## Personalized Safety Tips
+1. Leave earlier.
+2. Use cruise control.
+
+## Educational Information
+Stopping distance grows with speed.
+
+## Potential Financial Savings
+About 1,800 a year.
+
+## Recommended Behavioral Changes
+Plan trips with slack.
+"""
+
+BOLD_HEADINGS = INLINE_MENTION
+for _, heading, _ in SECTIONS:
+    BOLD_HEADINGS = BOLD_HEADINGS.replace(f"## {heading}\n", f"**{heading}**\n")
+
+def stream(text, chunk_size):
+    """Feed text in chunks and return the (key, content) events, feed()'s then close()'s"""
+    parser = SectionStream()
+    events = []
+    for i in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[i:i + chunk_size]))
+    events.extend(parser.close())
+    return events
+
+def test_streamed_sections_match_complete_parse():
+    expected = extract_sections(INLINE_MENTION)
+    assert "Personalized Safety Tips\nbelow" in expected["pattern_analysis"]
+    for chunk_size in (1, 3, 16, len(INLINE_MENTION)):
+        events = stream(INLINE_MENTION, chunk_size)
+        assert [key for key, _ in events] == [key for key, _, _ in SECTIONS]
+        assert dict(events) == expected
+
+def test_sections_stream_before_close():
+    parser = SectionStream()
+    cut = INLINE_MENTION.index("1. Leave")
+    assert [key for key, _ in parser.feed(INLINE_MENTION[:cut])] == ["pattern_analysis"]
+
+def test_sections_stream_as_they_complete_at_any_chunk_size():
+    for chunk_size in range(1, 8):
+        parser = SectionStream()
+        streamed = []
+        for i in range(0, len(INLINE_MENTION), chunk_size):
+            streamed.extend(key for key, _ in parser.feed(INLINE_MENTION[i:i + chunk_size]))
+        # Every section but the last is final before the stream ends
+        assert streamed == [key for key, _, end in SECTIONS if end is not None]
+
+def test_fields_stream_as_they_complete_at_any_chunk_size():
+    text = "Type of damage: pothole\nSeverity level: high\nPotential safety impact: tyres\nRecommended action: fill"
+    for chunk_size in range(1, 8):
+        stream = FieldStream()
+        streamed = []
+        for i in range(0, len(text), chunk_size):
+            streamed.extend(key for key, _ in stream.feed(text[i:i + chunk_size]))
+        assert streamed == [key for key, _, end in FIELDS if end is not None]
+        assert dict(stream.close())["recommended_action"] == extract_fields(text)["recommended_action"]
+
+def test_stream_scanner_finds_what_str_find_finds():
+    rng = random.Random(5)
+    patterns = ["## Pattern", "\n", "aa", "abab"]
+    for _ in range(500):
+        text = "".join(rng.choice(["a", "b", "ab", "\n", "## ", "Pattern", " "]) for _ in range(rng.randint(0, 40)))
+        scanner = StreamScanner(patterns)
+        for chunk in random_chunks(rng, text):
+            scanner.feed(chunk)
+        assert scanner.text == text
+        for pattern in patterns:
+            for index in range(len(text) + 1):
+                assert scanner.find(pattern, index) == text.find(pattern, index), (text, pattern, index)
+
+def test_other_heading_forms_wait_for_close():
+    expected = extract_sections(BOLD_HEADINGS)
+    parser = SectionStream()
+    assert parser.feed(BOLD_HEADINGS) == []
+    assert dict(parser.close()) == expected
+
+def extract_section(text, start_marker, end_marker):
+    """The original traffic fine analyzer extractor"""
+    try:
+        # Try to find the section with heading format (## Section Name)
+        start_pattern = f"## {start_marker}"
+        if start_pattern not in text:
+            # Try alternative formats
+            start_pattern = f"**{start_marker}**"
+            if start_pattern not in text:
+                start_pattern = start_marker
+
+        start_idx = text.find(start_pattern)
+        if start_idx == -1:
+            return None
+
+        # Move past the heading
+        start_idx = text.find("\n", start_idx)
+        if start_idx == -1:
+            return None
+        start_idx += 1
+
+        if end_marker:
+            # Try to find the end marker with heading format
+            end_pattern = f"## {end_marker}"
+            if end_pattern not in text[start_idx:]:
+                # Try alternative formats
+                end_pattern = f"**{end_marker}**"
+                if end_pattern not in text[start_idx:]:
+                    end_pattern = end_marker
+
+            end_idx = text.find(end_pattern, start_idx)
+            if end_idx == -1:
+                return text[start_idx:].strip()
+            return text[start_idx:end_idx].strip()
+        else:
+            return text[start_idx:].strip()
+    except:
+        return None
+
+def extract_info(text, start_marker, end_marker):
+    """The original road hazard reporter extractor"""
+    try:
+        start_idx = text.find(start_marker)
+        if start_idx == -1:
+            return None
+
+        start_idx += len(start_marker)
+
+        if end_marker:
+            end_idx = text.find(end_marker, start_idx)
+            if end_idx == -1:
+                return text[start_idx:].strip()
+            return text[start_idx:end_idx].strip()
+        else:
+            return text[start_idx:].strip()
+    except:
+        return None
+
+def legacy_sections(text):
+    return {key: extract_section(text, start, end) for key, start, end in SECTIONS}
+
+def legacy_fields(text):
+    fields = {}
+    for key, start, end in FIELDS:
+        value = extract_info(text, start, end)
+        fields[key] = value.strip() if value else "Unknown"
+    return fields
+
+FILLER = ["word", " ", "\n", "\n\n", "#", "##", "**", "*", ":", "-", "1.", "2)", "  ", "\t"]
+
+def fuzz_text(rng, markers):
+    """Random output mixing markers in every heading form with filler and truncated markers"""
+    pieces = []
+    for _ in range(rng.randint(0, 30)):
+        roll = rng.random()
+        if roll < 0.4:
+            marker = rng.choice(markers)
+            form = rng.randrange(6)
+            if form == 0:
+                piece = f"## {marker}"
+            elif form == 1:
+                piece = f"**{marker}**"
+            elif form == 2:
+                piece = f"{rng.randint(1, 9)}. {marker}:"
+            elif form == 3:
+                piece = f"### {marker}"
+            elif form == 4:
+                piece = marker[:rng.randint(1, len(marker))]
+            else:
+                piece = marker
+            pieces.append(piece)
+        else:
+            pieces.append(rng.choice(FILLER))
+    return "".join(pieces)
+
+def random_chunks(rng, text):
+    chunks = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 12)
+        chunks.append(text[position:position + size])
+        position += size
+    return chunks
+
+def stream_with(parser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    return events
+
+def test_sections_agree_with_original_extractor():
+    rng = random.Random(1)
+    markers = [start for _, start, _ in SECTIONS]
+    for i in range(FUZZ_CASES):
+        text = fuzz_text(rng, markers)
+        assert extract_sections(text) == legacy_sections(text), f"case {i}: {text!r}"
+
+def test_fields_agree_with_original_extractor():
+    rng = random.Random(2)
+    markers = [start for _, start, _ in FIELDS]
+    for i in range(FUZZ_CASES):
+        text = fuzz_text(rng, markers)
+        assert extract_fields(text) == legacy_fields(text), f"case {i}: {text!r}"
+
+def test_streamed_sections_agree_with_complete_parse():
+    rng = random.Random(3)
+    markers = [start for _, start, _ in SECTIONS]
+    for i in range(FUZZ_CASES // 5):
+        text = fuzz_text(rng, markers)
+        events = stream_with(SectionStream(), random_chunks(rng, text))
+        assert [key for key, _ in events] == [key for key, _, _ in SECTIONS], f"case {i}: {text!r}"
+        assert dict(events) == extract_sections(text), f"case {i}: {text!r}"
+
+def test_streamed_fields_agree_with_complete_parse():
+    rng = random.Random(4)
+    markers = [start for _, start, _ in FIELDS]
+    for i in range(FUZZ_CASES // 5):
+        text = fuzz_text(rng, markers)
+        events = stream_with(FieldStream(), random_chunks(rng, text))
+        assert sorted(key for key, _ in events) == sorted(key for key, _, _ in FIELDS), f"case {i}: {text!r}"
+        assert dict(events) == extract_fields(text), f"case {i}: {text!r}"
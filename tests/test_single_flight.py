@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from common.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_result():
+    async def main():
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flights.run("key", work) for _ in range(5)))
+        return results, calls, flights.stats()
+
+    results, calls, stats = asyncio.run(main())
+    assert results == [1] * 5
+    assert calls == 1
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+def test_exception_reaches_every_waiter():
+    async def main():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        return await asyncio.gather(*(flights.run("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_one_waiter_leaving_does_not_cancel_the_others():
+    async def main():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flights.run("key", work))
+        second = asyncio.ensure_future(flights.run("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+def test_request_joining_after_last_waiter_left_starts_a_new_call():
+    async def main():
+        flights = SingleFlight()
+        started = []
+
+        async def work():
+            started.append(len(started))
+            await asyncio.sleep(0.01)
+            return len(started)
+
+        first = asyncio.ensure_future(flights.run("key", work))
+        await asyncio.sleep(0)
+        # The only waiter's client disconnects; its task is cancelled but has not wound down yet
+        first.cancel()
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        result = await flights.run("key", work)
+        return result, started
+
+    result, started = asyncio.run(main())
+    assert result == 2
+    assert started == [0, 1]
+
+def test_cleanup_runs_even_if_the_call_never_started():
+    async def main():
+        flights = SingleFlight()
+        cleaned = []
+
+        async def work():
+            await asyncio.sleep(1)
+
+        waiter = asyncio.ensure_future(flights.run("key", work, cleanup=lambda: cleaned.append(True)))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return cleaned
+
+    assert asyncio.run(main()) == [True]
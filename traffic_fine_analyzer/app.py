@@ -1,14 +1,27 @@
 import os
-import json
-import requests
-from fastapi import FastAPI, HTTPException, Form, Body
+import time
+from contextlib import aclosing
+from fastapi import FastAPI, HTTPException, Form, Body, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uvicorn
 
-app = FastAPI(title="Traffic Fine Analyzer API")
+import deepseek_client
+import fleet
+from common.single_flight import SingleFlight
+from common.admission import AdmissionController, AdmissionMiddleware, RateLimiter, admission_stats
+from common.responses import FastJSONResponse, CompressionMiddleware, dumps_text, lean_result, LEAN_RESPONSES
+from common.metrics import MetricsMiddleware, metrics_endpoint, traces_endpoint, stage, observe_size
+from prompt_cache import PromptCache, make_key, PROMPT_CACHE_KEY_MODE
+from prompt_builder import build_history_text, build_recent_history_text
+from driver_store import DriverStore
+from sections import SectionStream, extract_sections
+from fine_stats import FineColumns, compute_statistics, compute_fleet_statistics
+
+app = FastAPI(title="Traffic Fine Analyzer API", default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,9 +32,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON bodies for clients that accept brotli or gzip
+app.add_middleware(CompressionMiddleware)
+
+# Rate limit and bound the analyses running at once, shedding batch work first
+admission = AdmissionController()
+rate_limiter = RateLimiter()
+app.add_middleware(
+    AdmissionMiddleware,
+    routes={
+        "/analyze": "interactive",
+        "/analyze-stream": "interactive",
+        "/drivers/{driver_id}/fines": "interactive",
+        "/analyze-fleet": "batch"
+    },
+    controller=admission,
+    rate_limiter=rate_limiter
+)
+
+# Count and time every request, including those rejected above
+app.add_middleware(MetricsMiddleware)
+
 # DeepSeek API configuration
 DEEPSEEK_API_URL = os.environ.get("DEEPSEEK_API_URL", "http://deepseek:8080/v1/chat/completions")
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")  # Will be set in docker-compose
+DEEPSEEK_MODEL = "deepseek-chat"  # DeepSeek V3 model
+DEEPSEEK_TEMPERATURE = 0.7
+SYSTEM_MESSAGE = "You are Salama AI Assistant, a helpful traffic safety advisor that analyzes fine history and provides personalized advice to improve driving behavior and reduce fines."
+
+# Bump whenever the analysis prompt changes so cached analyses are not reused
+PROMPT_VERSION = "2"
+
+# Cache of DeepSeek analyses keyed on the normalized fine history
+prompt_cache = PromptCache()
+
+# Analyses in progress, so concurrent identical requests share one DeepSeek call
+in_flight = SingleFlight()
+
+# Running aggregates and last advice per driver, for /drivers deltas
+driver_store = DriverStore()
+
+@app.on_event("startup")
+async def startup():
+    await deepseek_client.start_client()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await deepseek_client.close_client()
+    prompt_cache.close()
+    driver_store.close()
 
 class FineEntry(BaseModel):
     date: str
@@ -34,17 +93,53 @@ class FineHistory(BaseModel):
     fines: List[FineEntry]
     user_info: Optional[Dict[str, Any]] = None
 
+class FleetBatch(BaseModel):
+    drivers: Dict[str, FineHistory]
+
+class FineDelta(BaseModel):
+    fines: List[FineEntry]
+
 @app.get("/")
 async def root():
     return {"message": "Traffic Fine Analyzer API is running"}
 
+@app.get("/health")
+async def health_check():
+    """Service health with the DeepSeek circuit breaker state"""
+    upstream = deepseek_client.breaker.snapshot()
+    return {
+        "status": "healthy" if upstream["state"] == "closed" else "degraded",
+        "upstreams": {"deepseek": upstream}
+    }
+
+# Prometheus metrics and recently sampled traces
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+app.add_api_route("/traces", traces_endpoint, methods=["GET"])
+
+@app.get("/admission")
+async def admission_status():
+    """Running and queued analyses, rejections and rate limiter state"""
+    return admission_stats(admission, rate_limiter)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = prompt_cache.stats()
+    stats["single_flight"] = in_flight.stats()
+    stats["drivers"] = driver_store.stats()
+    return stats
+
+def history_statistics(fines):
+    """Statistics of one fine history, computed over a columnar copy of it"""
+    return compute_statistics(FineColumns.from_fines(fines))
+
 @app.post("/analyze")
-async def analyze_fines(fine_history: FineHistory):
+async def analyze_fines(fine_history: FineHistory, lean: bool = Query(LEAN_RESPONSES)):
     """
     Analyze traffic fine history using DeepSeek V3 model.
     
     Parameters:
     - fine_history: JSON object containing fine history data
+    - lean: Leave out full_analysis, which repeats the parsed sections
     
     Returns:
     - JSON response with analysis results
@@ -56,39 +151,195 @@ async def analyze_fines(fine_history: FineHistory):
         if not fines:
             raise HTTPException(status_code=400, detail="No fine history provided")
         
-        # Calculate basic statistics
-        total_fines = len(fines)
-        total_amount = sum(fine.amount for fine in fines)
-        fine_types = {}
-        
-        for fine in fines:
-            if fine.type in fine_types:
-                fine_types[fine.type] += 1
-            else:
-                fine_types[fine.type] = 1
-        
-        # Sort fine types by frequency
-        sorted_fine_types = sorted(fine_types.items(), key=lambda x: x[1], reverse=True)
-        most_common_fine = sorted_fine_types[0][0] if sorted_fine_types else "None"
-        
-        # Prepare prompt for DeepSeek V3
-        fine_history_text = "Fine History:\n"
-        for i, fine in enumerate(fines, 1):
-            fine_history_text += f"{i}. Date: {fine.date}, Type: {fine.type}, Amount: {fine.amount}"
-            if fine.location:
-                fine_history_text += f", Location: {fine.location}"
-            if fine.description:
-                fine_history_text += f", Description: {fine.description}"
-            fine_history_text += "\n"
+        # Calculate statistics off the event loop, as long histories take a while
+        with stage("stats"):
+            statistics = await run_in_threadpool(history_statistics, fines)
         
-        prompt = f"""As the Salama AI Assistant, analyze the following traffic fine history and provide personalized safety advice:
+        result = await run_analysis(fines, statistics, build_prompt(fines, statistics))
+        response = FastJSONResponse(content=lean_result(result) if lean else result)
+        observe_size("response", len(response.body))
+        return response
+    
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/analyze-stream")
+async def analyze_fines_stream(fine_history: FineHistory, lean: bool = Query(LEAN_RESPONSES)):
+    """
+    Analyze traffic fine history, streaming the analysis as it is generated.
+    
+    Parameters:
+    - fine_history: JSON object containing fine history data
+    - lean: Leave full_analysis out of the done event
+    
+    Returns:
+    - Server-sent events: statistics, token (text deltas), section (each
+      completed section), error (stream interrupted) and a final done event
+      carrying the same result as /analyze
+    """
+    fines = fine_history.fines
+    
+    if not fines:
+        raise HTTPException(status_code=400, detail="No fine history provided")
+    
+    with stage("stats"):
+        statistics = await run_in_threadpool(history_statistics, fines)
+    return StreamingResponse(
+        stream_analysis(fines, statistics, build_prompt(fines, statistics), lean),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/analyze-fleet")
+async def analyze_fleet(batch: FleetBatch, lean: bool = Query(LEAN_RESPONSES)):
+    """
+    Analyze the fine histories of many drivers in one request.
+    
+    Parameters:
+    - batch: JSON object mapping driver ids to fine histories
+    - lean: Leave full_analysis out of each driver's result
+    
+    Returns:
+    - NDJSON stream with one line per driver in completion order, followed by a summary line
+    """
+    if not batch.drivers:
+        raise HTTPException(status_code=400, detail="No drivers provided")
+    if len(batch.drivers) > fleet.FLEET_MAX_DRIVERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {fleet.FLEET_MAX_DRIVERS} drivers per request"
+        )
+    
+    driver_ids = list(batch.drivers)
+    histories = [batch.drivers[driver_id].fines for driver_id in driver_ids]
+    
+    # One columnar pass over every driver's fines, off the event loop
+    with stage("stats"):
+        all_statistics = await run_in_threadpool(compute_fleet_statistics, histories)
+    
+    drivers = []
+    for driver_id, fines, statistics in zip(driver_ids, histories, all_statistics):
+        if statistics is None:
+            drivers.append(fleet.FleetDriver(driver_id, fines, error="No fine history provided"))
+        else:
+            drivers.append(fleet.FleetDriver(
+                driver_id, fines, statistics, build_prompt(fines, statistics),
+                profile_key=analysis_cache_key(fines, mode="profile")
+            ))
+    
+    async def analyze(driver):
+        return await run_analysis(driver.fines, driver.statistics, driver.prompt)
+    
+    def present(driver, result):
+        # Drivers sharing an analysis still get their own statistics
+        result = dict(result, statistics=driver.statistics)
+        return lean_result(result) if lean else result
+    
+    return StreamingResponse(
+        fleet.stream_results(drivers, analyze, present),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/drivers/{driver_id}/fines")
+async def add_driver_fines(driver_id: str, delta: FineDelta, lean: bool = Query(LEAN_RESPONSES)):
+    """
+    Append new fines to a driver's running state and return the driver's analysis.
+    
+    Parameters:
+    - driver_id: Driver the fines belong to (created on first use)
+    - delta: JSON object with only the fines added since the last call
+    - lean: Leave out full_analysis, which repeats the parsed sections
+    
+    Returns:
+    - JSON response like /analyze, plus reanalyzed and the reasons for it.
+      The advice is only regenerated when the driver's profile changed
+      materially; otherwise the stored advice is returned. When the
+      regeneration fails, reanalyzed is false, analysis_stale is true and
+      the previous (or fallback) advice is returned; the reasons stay
+      pending so the next delta retries.
+    """
+    if not delta.fines:
+        raise HTTPException(status_code=400, detail="No fines provided")
+    
+    with stage("stats"):
+        state, reasons = await run_in_threadpool(driver_store.append, driver_id, delta.fines, PROMPT_VERSION)
+        statistics = state.statistics()
+    
+    reanalyzed = False
+    if not reasons:
+        result = dict(state.analysis, statistics=statistics)
+    else:
+        profile = state.profile(PROMPT_VERSION)
+        with stage("prompt"):
+            history_text = build_recent_history_text(
+                state.recent, state.first_recent_number,
+                state.types, state.type_amounts, state.months, state.locations
+            )
+        prompt = analysis_prompt(history_text, statistics)
+        # Deltas for the same driver arriving meanwhile share this call
+        result = await in_flight.run(
+            f"driver:{driver_id}", lambda: fetch_driver_analysis(driver_id, profile, statistics, prompt)
+        )
+        if result is not None:
+            reanalyzed = True
+            result = dict(result, statistics=statistics)
+        elif state.analysis is not None:
+            # Older advice for this driver beats the generic fallback
+            result = dict(
+                state.analysis,
+                statistics=statistics,
+                analysis_stale=True,
+                note="The DeepSeek API was unavailable, so this is the driver's previous analysis."
+            )
+        else:
+            with stage("fallback"):
+                result = dict(fallback_analysis(state.recent, statistics), analysis_stale=True)
+    
+    result = dict(result, driver_id=driver_id, reanalyzed=reanalyzed, reasons=reasons)
+    response = FastJSONResponse(content=lean_result(result) if lean else result)
+    observe_size("response", len(response.body))
+    return response
+
+@app.get("/drivers/{driver_id}")
+async def get_driver(driver_id: str):
+    """A driver's running statistics and stored analysis, without calling DeepSeek"""
+    state = await run_in_threadpool(driver_store.get, driver_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    return {
+        "driver_id": driver_id,
+        "statistics": state.statistics(),
+        "analysis": (state.analysis or {}).get("analysis"),
+        "full_analysis": (state.analysis or {}).get("full_analysis"),
+        "analyzed_at": (state.analyzed or {}).get("at"),
+        "pending_reasons": state.reanalysis_reasons(PROMPT_VERSION)
+    }
+
+@app.delete("/drivers/{driver_id}")
+async def delete_driver(driver_id: str):
+    """Forget a driver's state so the next delta starts a new history"""
+    if not await run_in_threadpool(driver_store.delete, driver_id):
+        raise HTTPException(status_code=404, detail="Driver not found")
+    return {"driver_id": driver_id, "deleted": True}
+
+def build_prompt(fines, statistics):
+    """Build the DeepSeek prompt for a fine history and its statistics"""
+    with stage("prompt"):
+        fine_history_text = build_history_text(fines)
+    return analysis_prompt(fine_history_text, statistics)
+
+def analysis_prompt(fine_history_text, statistics):
+    """Wrap the fine history section and statistics in the analysis instructions"""
+    return f"""As the Salama AI Assistant, analyze the following traffic fine history and provide personalized safety advice:
 
 {fine_history_text}
 
 Statistics:
-- Total number of fines: {total_fines}
-- Total amount paid: {total_amount}
-- Most common fine type: {most_common_fine}
+- Total number of fines: {statistics["total_fines"]}
+- Total amount paid: {statistics["total_amount"]}
+- Most common fine type: {statistics["most_common_fine"]}
 
 Based on this history, please provide:
 1. A pattern analysis of the user's traffic violations
@@ -99,111 +350,166 @@ Based on this history, please provide:
 
 Format your response in clear sections with headings.
 """
-        
-        # Prepare request to DeepSeek API
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        if DEEPSEEK_API_KEY:
-            headers["Authorization"] = f"Bearer {DEEPSEEK_API_KEY}"
-        
-        payload = {
-            "model": "deepseek-chat",  # DeepSeek V3 model
-            "messages": [
-                {"role": "system", "content": "You are Salama AI Assistant, a helpful traffic safety advisor that analyzes fine history and provides personalized advice to improve driving behavior and reduce fines."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-        
-        # Call DeepSeek API
-        try:
-            response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            # Fallback to local analysis if API is unavailable
-            return generate_fallback_analysis(fines, total_fines, total_amount, most_common_fine)
-        
-        # Process the response
-        result = response.json()
-        analysis_text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-        
-        if not analysis_text:
-            # Fallback if no valid response
-            return generate_fallback_analysis(fines, total_fines, total_amount, most_common_fine)
-        
-        # Extract sections from analysis text
-        pattern_analysis = extract_section(analysis_text, "Pattern Analysis", "Personalized Safety Tips")
-        safety_tips = extract_section(analysis_text, "Personalized Safety Tips", "Educational Information")
-        educational_info = extract_section(analysis_text, "Educational Information", "Potential Financial Savings")
-        financial_savings = extract_section(analysis_text, "Potential Financial Savings", "Recommended Behavioral Changes")
-        behavioral_changes = extract_section(analysis_text, "Recommended Behavioral Changes", None)
-        
-        # Prepare the response
-        result = {
-            "statistics": {
-                "total_fines": total_fines,
-                "total_amount": total_amount,
-                "fine_types": dict(sorted_fine_types),
-                "most_common_fine": most_common_fine
-            },
-            "analysis": {
-                "pattern_analysis": pattern_analysis,
-                "safety_tips": safety_tips,
-                "educational_info": educational_info,
-                "financial_savings": financial_savings,
-                "behavioral_changes": behavioral_changes
-            },
-            "full_analysis": analysis_text
-        }
-        
-        return JSONResponse(content=result)
+
+def deepseek_request(prompt):
+    """Return (headers, payload) for a DeepSeek chat completion of the prompt"""
+    headers = {
+        "Content-Type": "application/json"
+    }
     
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    if DEEPSEEK_API_KEY:
+        headers["Authorization"] = f"Bearer {DEEPSEEK_API_KEY}"
+    
+    payload = {
+        "model": DEEPSEEK_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": DEEPSEEK_TEMPERATURE,
+        "max_tokens": 1000
+    }
+    return headers, payload
+
+def analysis_cache_key(fines, mode=PROMPT_CACHE_KEY_MODE):
+    return make_key(fines, DEEPSEEK_MODEL, DEEPSEEK_TEMPERATURE, SYSTEM_MESSAGE, PROMPT_VERSION, mode)
 
-def extract_section(text, start_marker, end_marker):
-    """Extract a section from the analysis text"""
+async def run_analysis(fines, statistics, prompt):
+    """Send the prompt to DeepSeek and return the analysis result, falling back to a local analysis"""
+    cache_key = analysis_cache_key(fines)
+    result = await prompt_cache.get(cache_key)
+    if result is None:
+        # Identical requests arriving while this one is analyzed wait for its result
+        result = await in_flight.run(cache_key, lambda: fetch_analysis(cache_key, statistics, prompt))
+    
+    if result is None:
+        # Fallback to local analysis if API is unavailable, too slow or gave no content
+        with stage("fallback"):
+            return fallback_analysis(fines, statistics)
+    
+    # The statistics are always the request's own, even when the analysis is shared
+    return dict(result, statistics=statistics)
+
+async def fetch_analysis(cache_key, statistics, prompt):
+    """
+    Call DeepSeek for a prompt and cache the parsed analysis under cache_key
+    (None skips the cache); None if DeepSeek is unavailable.
+    """
+    headers, payload = deepseek_request(prompt)
+    observe_size("deepseek_prompt", len(prompt.encode("utf-8")))
+    
+    # Call DeepSeek API
+    started = time.perf_counter()
     try:
-        # Try to find the section with heading format (## Section Name)
-        start_pattern = f"## {start_marker}"
-        if start_pattern not in text:
-            # Try alternative formats
-            start_pattern = f"**{start_marker}**"
-            if start_pattern not in text:
-                start_pattern = start_marker
-        
-        start_idx = text.find(start_pattern)
-        if start_idx == -1:
-            return None
-        
-        # Move past the heading
-        start_idx = text.find("\n", start_idx)
-        if start_idx == -1:
-            return None
-        start_idx += 1
-        
-        if end_marker:
-            # Try to find the end marker with heading format
-            end_pattern = f"## {end_marker}"
-            if end_pattern not in text[start_idx:]:
-                # Try alternative formats
-                end_pattern = f"**{end_marker}**"
-                if end_pattern not in text[start_idx:]:
-                    end_pattern = end_marker
-            
-            end_idx = text.find(end_pattern, start_idx)
-            if end_idx == -1:
-                return text[start_idx:].strip()
-            return text[start_idx:end_idx].strip()
-        else:
-            return text[start_idx:].strip()
-    except:
+        result = await deepseek_client.chat_completion(DEEPSEEK_API_URL, payload, headers)
+    except deepseek_client.UpstreamUnavailable:
+        return None
+    
+    # Process the response
+    analysis_text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+    
+    if not analysis_text:
         return None
+    observe_size("deepseek_response", len(analysis_text.encode("utf-8")))
+    
+    # Prepare the response
+    with stage("parse"):
+        analysis = extract_sections(analysis_text)
+    result = {
+        "statistics": statistics,
+        "analysis": analysis,
+        "full_analysis": analysis_text
+    }
+    
+    # Fallback analyses are not cached, so the next request retries DeepSeek
+    if cache_key is not None:
+        await prompt_cache.set(cache_key, result, time.perf_counter() - started)
+    return result
+
+async def fetch_driver_analysis(driver_id, profile, statistics, prompt):
+    """Analyze a driver's state and store the advice with the profile it was generated for"""
+    result = await fetch_analysis(None, statistics, prompt)
+    if result is not None:
+        analysis = {key: value for key, value in result.items() if key != "statistics"}
+        await run_in_threadpool(driver_store.record_analysis, driver_id, analysis, profile)
+    return result
+
+def sse_event(event, data):
+    """Encode one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {dumps_text(data)}\n\n"
+
+async def stream_analysis(fines, statistics, prompt, lean=False):
+    """
+    Yield the analysis of a fine history as server-sent events.
+
+    Events: statistics first, then token events with each text delta from
+    DeepSeek and a section event as each section completes, then done with
+    the same result /analyze would return (without full_analysis when lean,
+    as the tokens already carried it). Cached and fallback analyses are
+    sent as their sections followed by done.
+    """
+    yield sse_event("statistics", statistics)
+    
+    cache_key = analysis_cache_key(fines)
+    cached = await prompt_cache.get(cache_key)
+    if cached is not None:
+        for name, content in cached["analysis"].items():
+            yield sse_event("section", {"name": name, "content": content})
+        result = dict(cached, statistics=statistics)
+        yield sse_event("done", lean_result(result) if lean else result)
+        return
+    
+    headers, payload = deepseek_request(prompt)
+    parser = SectionStream()
+    interrupted = None
+    started = time.perf_counter()
+    try:
+        async with aclosing(deepseek_client.stream_chat_completion(DEEPSEEK_API_URL, payload, headers)) as deltas:
+            async for delta in deltas:
+                yield sse_event("token", {"text": delta})
+                for name, content in parser.feed(delta):
+                    yield sse_event("section", {"name": name, "content": content})
+    except deepseek_client.UpstreamUnavailable as e:
+        interrupted = str(e)
+    
+    analysis_text = parser.text
+    if not analysis_text:
+        # Nothing arrived: fall back to local analysis as /analyze does
+        result = fallback_analysis(fines, statistics)
+        for name, content in result["analysis"].items():
+            yield sse_event("section", {"name": name, "content": content})
+        yield sse_event("done", lean_result(result) if lean else result)
+        return
+    
+    if interrupted:
+        # Keep what already streamed rather than replacing it with a fallback
+        yield sse_event("error", {"detail": interrupted})
+    for name, content in parser.close():
+        yield sse_event("section", {"name": name, "content": content})
+    
+    with stage("parse"):
+        analysis = extract_sections(analysis_text)
+    result = {
+        "statistics": statistics,
+        "analysis": analysis,
+        "full_analysis": analysis_text
+    }
+    if interrupted:
+        result["note"] = "The DeepSeek stream was interrupted, so this analysis may be incomplete."
+    else:
+        await prompt_cache.set(cache_key, result, time.perf_counter() - started)
+    yield sse_event("done", lean_result(result) if lean else result)
+
+def fallback_analysis(fines, statistics):
+    """
+    The local fallback analysis carrying the request's full statistics, so the
+    response has the same shape whether or not DeepSeek answered
+    """
+    result = generate_fallback_analysis(
+        fines, statistics["total_fines"], statistics["total_amount"], statistics["most_common_fine"]
+    )
+    result["statistics"] = statistics
+    return result
 
 def generate_fallback_analysis(fines, total_fines, total_amount, most_common_fine):
     """Generate a fallback analysis when the API is unavailable"""
@@ -269,7 +575,7 @@ def generate_fallback_analysis(fines, total_fines, total_amount, most_common_fin
         "note": "This is a fallback analysis generated locally as the DeepSeek API was unavailable."
     }
     
-    return JSONResponse(content=result)
+    return result
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,157 @@
+import os
+import json
+import asyncio
+import time
+import httpx
+
+from common.circuit_breaker import CircuitBreaker
+from common.metrics import upstream_call, upstream_rejected
+
+# Connection pool, deadline and concurrency settings for the DeepSeek API
+DEEPSEEK_CONNECT_TIMEOUT = float(os.environ.get("DEEPSEEK_CONNECT_TIMEOUT", "3"))
+DEEPSEEK_TIMEOUT = float(os.environ.get("DEEPSEEK_TIMEOUT", "20"))
+DEEPSEEK_MAX_CONNECTIONS = int(os.environ.get("DEEPSEEK_MAX_CONNECTIONS", "64"))
+DEEPSEEK_MAX_KEEPALIVE = int(os.environ.get("DEEPSEEK_MAX_KEEPALIVE", "16"))
+DEEPSEEK_MAX_CONCURRENCY = int(os.environ.get("DEEPSEEK_MAX_CONCURRENCY", "32"))
+DEEPSEEK_QUEUE_TIMEOUT = float(os.environ.get("DEEPSEEK_QUEUE_TIMEOUT", "2"))
+
+_client = None
+_semaphore = asyncio.Semaphore(DEEPSEEK_MAX_CONCURRENCY)
+
+# Opens after repeated failures or slow answers; settings via DEEPSEEK_BREAKER_*
+breaker = CircuitBreaker.from_env("deepseek", "DEEPSEEK", slow_call_seconds=DEEPSEEK_TIMEOUT / 2)
+
+class UpstreamUnavailable(Exception):
+    """Raised when DeepSeek cannot be called or does not answer in time"""
+
+def _build_client():
+    """Create an AsyncClient with a bounded connection pool"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(DEEPSEEK_TIMEOUT, connect=DEEPSEEK_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=DEEPSEEK_MAX_CONNECTIONS,
+            max_keepalive_connections=DEEPSEEK_MAX_KEEPALIVE
+        )
+    )
+
+async def start_client():
+    """Open the shared client (called on app startup)"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+async def close_client():
+    """Close the shared client and its pooled connections (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_client():
+    """Return the shared client, creating it if startup hooks did not run"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+async def chat_completion(url, payload, headers):
+    """
+    Send a chat completion request to DeepSeek and return the decoded JSON body.
+
+    At most DEEPSEEK_MAX_CONCURRENCY calls are in flight at once. A caller waits
+    up to DEEPSEEK_QUEUE_TIMEOUT for a slot and then up to DEEPSEEK_TIMEOUT for
+    the whole upstream call, so the worst case is bounded by their sum.
+    Raises UpstreamUnavailable on queue timeout, deadline or HTTP errors, and
+    straight away while the circuit breaker is open.
+    """
+    await _acquire_slot()
+
+    started = time.monotonic()
+    try:
+        with upstream_call("deepseek") as call:
+            response = await asyncio.wait_for(
+                get_client().post(url, headers=headers, json=payload),
+                DEEPSEEK_TIMEOUT
+            )
+            call.set_status(response.status_code)
+        response.raise_for_status()
+    except asyncio.TimeoutError:
+        breaker.failure()
+        raise UpstreamUnavailable(f"DeepSeek did not answer within {DEEPSEEK_TIMEOUT}s")
+    except httpx.HTTPError as e:
+        breaker.failure()
+        raise UpstreamUnavailable(str(e))
+    except BaseException:
+        breaker.release()
+        raise
+    finally:
+        _semaphore.release()
+
+    breaker.success(time.monotonic() - started)
+    return response.json()
+
+async def _acquire_slot():
+    """Check the circuit breaker, then wait for a concurrency slot"""
+    if not breaker.allow():
+        upstream_rejected("deepseek")
+        raise UpstreamUnavailable(f"DeepSeek circuit is open, retrying in {breaker.retry_after():.0f}s")
+    try:
+        await asyncio.wait_for(_semaphore.acquire(), DEEPSEEK_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        # Local saturation says nothing about DeepSeek's health
+        breaker.release()
+        upstream_rejected("deepseek")
+        raise UpstreamUnavailable("Too many DeepSeek calls in flight")
+    except BaseException:
+        breaker.release()
+        raise
+
+async def stream_chat_completion(url, payload, headers):
+    """
+    Stream a chat completion from DeepSeek, yielding content deltas as they arrive.
+
+    The request is sent with stream: true and the server-sent event chunks are
+    decoded as they arrive. Slots are limited and queued as in
+    chat_completion; DEEPSEEK_TIMEOUT bounds the wait for each chunk rather
+    than the whole response. Raises UpstreamUnavailable on queue timeout, read
+    timeout or HTTP errors, including after some deltas have been yielded.
+    The circuit breaker judges a stream by its time to first delta.
+    """
+    await _acquire_slot()
+
+    started = time.monotonic()
+    first_delta = None
+    try:
+        with upstream_call("deepseek") as call:
+            async with get_client().stream("POST", url, headers=headers, json=dict(payload, stream=True)) as response:
+                call.set_status(response.status_code)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    delta = chunk.get("choices", [{}])[0].get("delta", {}).get("content")
+                    if delta:
+                        if first_delta is None:
+                            first_delta = time.monotonic() - started
+                        yield delta
+    except httpx.TimeoutException:
+        breaker.failure()
+        raise UpstreamUnavailable(f"DeepSeek stream stalled for more than {DEEPSEEK_TIMEOUT}s")
+    except httpx.HTTPError as e:
+        breaker.failure()
+        raise UpstreamUnavailable(str(e))
+    except json.JSONDecodeError as e:
+        breaker.failure()
+        raise UpstreamUnavailable(f"Invalid stream chunk from DeepSeek: {str(e)}")
+    except BaseException:
+        # Cancelled, or the consumer stopped reading
+        breaker.release()
+        raise
+    finally:
+        _semaphore.release()
+
+    breaker.success(first_delta if first_delta is not None else time.monotonic() - started)
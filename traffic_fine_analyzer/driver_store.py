@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import date
+from collections import Counter, namedtuple
+
+from common.metrics import counter
+from fine_stats import WEEKDAYS, TOP_LOCATIONS
+
+# Per-driver state settings
+DRIVER_DB = os.environ.get("DRIVER_DB", "drivers.db")
+DRIVER_RECENT_FINES = int(os.environ.get("DRIVER_RECENT_FINES", "50"))  # Kept verbatim for the prompt
+# What counts as a material change since the last analysis
+DRIVER_REANALYZE_GROWTH = float(os.environ.get("DRIVER_REANALYZE_GROWTH", "0.25"))  # Share of new fines
+DRIVER_REANALYZE_AMOUNT_STEP = float(os.environ.get("DRIVER_REANALYZE_AMOUNT_STEP", "1000"))
+DRIVER_ADVICE_MAX_AGE = float(os.environ.get("DRIVER_ADVICE_MAX_AGE", str(30 * 86400)))  # 0 keeps advice forever
+
+DRIVER_UPDATES = counter(
+    "driver_updates_total",
+    "Fine deltas applied to driver state, by whether the advice was regenerated",
+    ("outcome",)
+)
+
+StoredFine = namedtuple("StoredFine", "date type amount location description")
+
+def _parse_date(text):
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return None
+
+class DriverState:
+    """
+    Running aggregates of one driver's fines and the advice last generated for them.
+
+    add() folds new fines into the counts in O(new fines); the latest
+    DRIVER_RECENT_FINES fines are kept verbatim so a prompt can list them.
+    Percentiles and repeat-offense intervals need the whole history, so they
+    are left to /analyze.
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.total_fines = data.get("total_fines", 0)
+        self.total_amount = data.get("total_amount", 0.0)
+        self.min_amount = data.get("min_amount")
+        self.max_amount = data.get("max_amount")
+        # Dicts keep first-seen order, which breaks ties as compute_statistics does
+        self.types = Counter(data.get("types", {}))
+        self.type_amounts = Counter(data.get("type_amounts", {}))
+        self.months = Counter(data.get("months", {}))  # Raw date[:7], as in the prompt summary
+        self.calendar_months = Counter(data.get("calendar_months", {}))  # Parseable dates only
+        self.weekdays = data.get("weekdays", [0] * 7)
+        self.locations = Counter(data.get("locations", {}))
+        self.recent = [StoredFine(*fine) for fine in data.get("recent", [])]
+        self.analysis = data.get("analysis")
+        self.analyzed = data.get("analyzed")  # Profile the analysis was generated for
+        self.updated_at = data.get("updated_at")
+
+    def to_dict(self):
+        return {
+            "total_fines": self.total_fines,
+            "total_amount": self.total_amount,
+            "min_amount": self.min_amount,
+            "max_amount": self.max_amount,
+            "types": self.types,
+            "type_amounts": self.type_amounts,
+            "months": self.months,
+            "calendar_months": self.calendar_months,
+            "weekdays": self.weekdays,
+            "locations": self.locations,
+            "recent": [list(fine) for fine in self.recent],
+            "analysis": self.analysis,
+            "analyzed": self.analyzed,
+            "updated_at": self.updated_at
+        }
+
+    def add(self, fines):
+        """Fold appended fines into the aggregates"""
+        for fine in fines:
+            self.total_fines += 1
+            self.total_amount += fine.amount
+            self.min_amount = fine.amount if self.min_amount is None else min(self.min_amount, fine.amount)
+            self.max_amount = fine.amount if self.max_amount is None else max(self.max_amount, fine.amount)
+            self.types[fine.type] += 1
+            self.type_amounts[fine.type] += fine.amount
+            self.months[fine.date[:7]] += 1
+            day = _parse_date(fine.date)
+            if day is not None:
+                self.calendar_months[f"{day.year:04d}-{day.month:02d}"] += 1
+                self.weekdays[day.weekday()] += 1
+            if fine.location:
+                self.locations[fine.location] += 1
+            self.recent.append(StoredFine(fine.date, fine.type, fine.amount, fine.location, fine.description))
+        del self.recent[:-DRIVER_RECENT_FINES]
+        self.updated_at = time.time()
+
+    @property
+    def most_common_fine(self):
+        # max() returns the first of equal counts, i.e. the type seen first
+        return max(self.types, key=self.types.get) if self.types else "None"
+
+    @property
+    def first_recent_number(self):
+        """Position of the oldest kept fine in the driver's whole history"""
+        return self.total_fines - len(self.recent) + 1
+
+    def statistics(self):
+        """The statistics block of /analyze, minus what needs the whole history"""
+        top_locations = sorted(self.locations.items(), key=lambda item: -item[1])[:TOP_LOCATIONS]
+        return {
+            "total_fines": self.total_fines,
+            "total_amount": round(self.total_amount, 2),
+            "fine_types": dict(sorted(self.types.items(), key=lambda item: -item[1])),
+            "most_common_fine": self.most_common_fine,
+            "amount_by_type": {name: round(self.type_amounts[name], 2) for name in self.types},
+            "amount_range": {
+                "min": self.min_amount,
+                "max": self.max_amount,
+                "mean": round(self.total_amount / self.total_fines, 2) if self.total_fines else None
+            },
+            "monthly_histogram": dict(sorted(self.calendar_months.items())),
+            "weekday_histogram": dict(zip(WEEKDAYS, self.weekdays)),
+            "top_locations": [{"location": name, "count": count} for name, count in top_locations]
+        }
+
+    def reanalysis_reasons(self, version, now=None):
+        """
+        Why the advice should be regenerated ("kind: detail"), or an empty list to reuse it.
+
+        The advice is regenerated when there is none yet, the prompt version
+        changed, a new fine type appeared, the most common type changed, the
+        fine count grew by DRIVER_REANALYZE_GROWTH, the total amount crossed
+        a multiple of DRIVER_REANALYZE_AMOUNT_STEP or the advice is older
+        than DRIVER_ADVICE_MAX_AGE.
+        """
+        analyzed = self.analyzed
+        if self.analysis is None or analyzed is None:
+            return ["first analysis"]
+
+        reasons = []
+        if analyzed["version"] != version:
+            reasons.append("prompt changed")
+        new_types = [name for name in self.types if name not in analyzed["types"]]
+        if new_types:
+            reasons.append("new fine type: " + ", ".join(new_types))
+        if self.most_common_fine != analyzed["most_common_fine"]:
+            reasons.append(f"most common fine changed: {analyzed['most_common_fine']} -> {self.most_common_fine}")
+        if self.total_fines >= analyzed["total_fines"] * (1 + DRIVER_REANALYZE_GROWTH):
+            reasons.append(f"fines grew: {analyzed['total_fines']} -> {self.total_fines}")
+        if DRIVER_REANALYZE_AMOUNT_STEP > 0:
+            step = DRIVER_REANALYZE_AMOUNT_STEP
+            if self.total_amount // step != analyzed["total_amount"] // step:
+                reasons.append(f"total amount crossed: {max(self.total_amount, analyzed['total_amount']) // step * step:g}")
+        now = time.time() if now is None else now
+        if DRIVER_ADVICE_MAX_AGE > 0 and now - analyzed["at"] > DRIVER_ADVICE_MAX_AGE:
+            reasons.append("advice expired")
+        return reasons
+
+    def profile(self, version):
+        """What reanalysis_reasons() compares against once advice for the current state is stored"""
+        return {
+            "version": version,
+            "types": list(self.types),
+            "most_common_fine": self.most_common_fine,
+            "total_fines": self.total_fines,
+            "total_amount": self.total_amount,
+            "at": time.time()
+        }
+
+class DriverStore:
+    """SQLite store of DriverState per driver id"""
+
+    def __init__(self, db_path=DRIVER_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS drivers ("
+            "driver_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.updates = 0
+        self.reanalyzed = 0
+        self.reused = 0
+        self.reasons = Counter()
+
+    def get(self, driver_id):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM drivers WHERE driver_id = ?", (driver_id,)).fetchone()
+        return DriverState(json.loads(row[0])) if row is not None else None
+
+    def save(self, driver_id, state):
+        serialized = json.dumps(state.to_dict())
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO drivers (driver_id, state, updated_at) VALUES (?, ?, ?)",
+                (driver_id, serialized, state.updated_at or time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, driver_id):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM drivers WHERE driver_id = ?", (driver_id,)).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def append(self, driver_id, fines, version):
+        """
+        Add fines to a driver's state and return (state, reasons to regenerate the advice).
+
+        Reads, updates and writes one row, so the cost follows the number of
+        new fines rather than the length of the history.
+        """
+        state = self.get(driver_id) or DriverState()
+        state.add(fines)
+        reasons = state.reanalysis_reasons(version)
+        self.save(driver_id, state)
+
+        self.updates += 1
+        if reasons:
+            self.reanalyzed += 1
+            self.reasons.update(reason.split(":")[0] for reason in reasons)
+            DRIVER_UPDATES.labels("reanalyzed").inc()
+        else:
+            self.reused += 1
+            DRIVER_UPDATES.labels("reused").inc()
+        return state, reasons
+
+    def record_analysis(self, driver_id, analysis, profile):
+        """Store advice generated for the profile, keeping any fines added meanwhile"""
+        state = self.get(driver_id)
+        if state is None:
+            # Deleted while the analysis was running
+            return
+        state.analysis = analysis
+        state.analyzed = profile
+        self.save(driver_id, state)
+
+    def stats(self):
+        with self._lock:
+            drivers = self._conn.execute("SELECT COUNT(*) FROM drivers").fetchone()[0]
+        return {
+            "drivers": drivers,
+            "updates": self.updates,
+            "reanalyzed": self.reanalyzed,
+            "advice_reused": self.reused,
+            "reuse_ratio": self.reused / self.updates if self.updates else 0.0,
+            "reanalysis_reasons": dict(self.reasons.most_common())
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
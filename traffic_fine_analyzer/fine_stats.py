@@ -0,0 +1,207 @@
+import itertools
+import numpy as np
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+TOP_LOCATIONS = 5
+
+def _rank_codes(codes, names):
+    """
+    Renumber dictionary codes so code 0 is the most common value.
+
+    Codes are assigned in order of first occurrence, so ranking by descending
+    count with the code as tie-breaker matches a stable sort by frequency.
+    Returns (codes, names, counts).
+    """
+    counts = np.bincount(codes, minlength=len(names))
+    order = np.lexsort((np.arange(len(names)), -counts))
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    return remap[codes], [names[i] for i in order], counts[order]
+
+def _local_codes(codes, names):
+    """
+    Re-encode a slice of dictionary codes against only the values it uses.
+
+    Local codes follow the order of first occurrence within the slice, as
+    if the slice had been encoded on its own. Returns (codes, names).
+    """
+    unique, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    return remap[inverse], [names[code] for code in unique[order].tolist()]
+
+def _parse_dates(dates):
+    """Parse date strings to datetime64[D], using NaT for unparseable entries"""
+    try:
+        return np.array(dates, dtype="datetime64[D]")
+    except ValueError:
+        pass
+    parsed = np.empty(len(dates), dtype="datetime64[D]")
+    for i, d in enumerate(dates):
+        try:
+            parsed[i] = np.datetime64(d[:10], "D")
+        except ValueError:
+            parsed[i] = np.datetime64("NaT")
+    return parsed
+
+class FineColumns:
+    """Columnar view of a fine history: one NumPy array per field"""
+
+    def __init__(self, amounts, dates, type_codes, type_names, type_counts, location_codes, location_names):
+        self.amounts = amounts
+        self.dates = dates
+        self.type_codes = type_codes
+        self.type_names = type_names
+        self.type_counts = type_counts
+        self.location_codes = location_codes
+        self.location_names = location_names
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @classmethod
+    def from_fines(cls, fines):
+        """Convert a list of FineEntry objects to columns in a single pass"""
+        amounts, dates, type_codes, location_codes = [], [], [], []
+        type_index, location_index = {}, {}
+        for fine in fines:
+            amounts.append(fine.amount)
+            dates.append(fine.date)
+            type_codes.append(type_index.setdefault(fine.type, len(type_index)))
+            location_codes.append(location_index.setdefault(fine.location or "", len(location_index)))
+
+        type_codes, type_names, type_counts = _rank_codes(np.asarray(type_codes, dtype=np.int64), list(type_index))
+        location_codes, location_names, _ = _rank_codes(np.asarray(location_codes, dtype=np.int64), list(location_index))
+        return cls(
+            np.asarray(amounts, dtype=np.float64),
+            _parse_dates(dates),
+            type_codes,
+            type_names,
+            type_counts,
+            location_codes,
+            location_names
+        )
+
+    @classmethod
+    def from_histories(cls, histories):
+        """
+        Convert many fine lists to one set of columns in a single pass.
+
+        Returns (columns, bounds) where bounds[i] is the (start, stop) row
+        range of histories[i]; use slice() to get one history's columns.
+        """
+        bounds = []
+        start = 0
+        for fines in histories:
+            bounds.append((start, start + len(fines)))
+            start += len(fines)
+        return cls.from_fines(itertools.chain.from_iterable(histories)), bounds
+
+    def slice(self, start, stop):
+        """Columns for rows start:stop, with codes re-ranked within the slice"""
+        type_codes, type_names = _local_codes(self.type_codes[start:stop], self.type_names)
+        location_codes, location_names = _local_codes(self.location_codes[start:stop], self.location_names)
+        type_codes, type_names, type_counts = _rank_codes(type_codes, type_names)
+        location_codes, location_names, _ = _rank_codes(location_codes, location_names)
+        return FineColumns(
+            self.amounts[start:stop],
+            self.dates[start:stop],
+            type_codes,
+            type_names,
+            type_counts,
+            location_codes,
+            location_names
+        )
+
+def compute_statistics(columns):
+    """
+    Compute the statistics block for a fine history with vectorized aggregates.
+
+    Keeps the original keys (total_fines, total_amount, fine_types,
+    most_common_fine) and adds per-type totals, amount percentiles, monthly
+    and weekday histograms, repeat-offense intervals and top locations.
+    """
+    n_types = len(columns.type_names)
+    amounts = columns.amounts
+
+    fine_types = dict(zip(columns.type_names, columns.type_counts.tolist()))
+    amount_by_type = np.bincount(columns.type_codes, weights=amounts, minlength=n_types)
+
+    percentiles = np.percentile(amounts, [25, 50, 75, 90])
+
+    valid = ~np.isnat(columns.dates)
+    days = columns.dates[valid].astype(np.int64)
+    months = columns.dates[valid].astype("datetime64[M]").astype(np.int64)
+    month_counts = np.bincount(months - months.min()) if len(months) else np.zeros(0, dtype=np.int64)
+    month_start = months.min() if len(months) else 0
+    # 1970-01-01 was a Thursday (weekday index 3)
+    weekday_counts = np.bincount((days + 3) % 7, minlength=7)
+
+    # Days between consecutive fines of the same type: sort on one packed
+    # (type, day) key, then diff neighbours that share a type
+    day_offset = days.min() if len(days) else 0
+    keys = np.sort((columns.type_codes[valid].astype(np.int64) << 32) | (days - day_offset))
+    sorted_types = keys >> 32
+    same_type = sorted_types[1:] == sorted_types[:-1]
+    gap_types = sorted_types[1:][same_type]
+    gaps = np.diff(keys & 0xFFFFFFFF)[same_type]
+    repeat_counts = np.bincount(gap_types, minlength=n_types)
+    gap_sums = np.bincount(gap_types, weights=gaps, minlength=n_types)
+    repeat_offense_intervals = {}
+    if len(gaps):
+        # gap_types is sorted, so each type's gaps form one contiguous run
+        starts = np.flatnonzero(np.r_[True, gap_types[1:] != gap_types[:-1]])
+        gap_mins = np.minimum.reduceat(gaps, starts)
+        for code, gap_min in zip(gap_types[starts].tolist(), gap_mins.tolist()):
+            repeat_offense_intervals[columns.type_names[code]] = {
+                "repeats": int(repeat_counts[code]),
+                "mean_days": round(float(gap_sums[code] / repeat_counts[code]), 1),
+                "min_days": int(gap_min)
+            }
+
+    location_counts = np.bincount(columns.location_codes, minlength=len(columns.location_names))
+    top_locations = [
+        {"location": columns.location_names[code], "count": int(location_counts[code])}
+        for code in np.argsort(-location_counts, kind="stable")[:TOP_LOCATIONS + 1]
+        if columns.location_names[code]
+    ][:TOP_LOCATIONS]
+
+    return {
+        "total_fines": len(columns),
+        "total_amount": float(amounts.sum()),
+        "fine_types": fine_types,
+        "most_common_fine": columns.type_names[0] if n_types else "None",
+        "amount_by_type": {
+            name: round(float(total), 2) for name, total in zip(columns.type_names, amount_by_type)
+        },
+        "amount_percentiles": {
+            "min": float(amounts.min()),
+            "p25": round(float(percentiles[0]), 2),
+            "p50": round(float(percentiles[1]), 2),
+            "p75": round(float(percentiles[2]), 2),
+            "p90": round(float(percentiles[3]), 2),
+            "max": float(amounts.max()),
+            "mean": round(float(amounts.mean()), 2)
+        },
+        "monthly_histogram": {
+            str(np.datetime64(int(month_start + offset), "M")): int(count)
+            for offset, count in enumerate(month_counts.tolist()) if count
+        },
+        "weekday_histogram": dict(zip(WEEKDAYS, weekday_counts.tolist())),
+        "repeat_offense_intervals": repeat_offense_intervals,
+        "top_locations": top_locations
+    }
+
+def compute_fleet_statistics(histories):
+    """
+    Compute the statistics block for many fine histories at once.
+
+    All histories are converted and their dates parsed in one columnar pass,
+    then aggregated per history over array slices. Empty histories get None.
+    """
+    columns, bounds = FineColumns.from_histories(histories)
+    return [
+        compute_statistics(columns.slice(start, stop)) if stop > start else None
+        for start, stop in bounds
+    ]
@@ -0,0 +1,41 @@
+import os
+from fastapi import HTTPException
+
+from common.ndjson import stream_shared_results
+
+# Fleet batch settings
+FLEET_MAX_DRIVERS = int(os.environ.get("FLEET_MAX_DRIVERS", "10000"))
+FLEET_CONCURRENCY = int(os.environ.get("FLEET_CONCURRENCY", "8"))
+
+class FleetDriver:
+    """
+    One driver of a fleet batch with its precomputed statistics and prompt.
+    Drivers with the same profile key share one analysis.
+    """
+
+    def __init__(self, driver_id, fines, statistics=None, prompt=None, profile_key=None, error=None):
+        self.driver_id = driver_id
+        self.fines = fines
+        self.statistics = statistics
+        self.prompt = prompt
+        self.profile_key = profile_key
+        self.error = error
+
+def stream_results(drivers, analyze, present):
+    """
+    Analyze fleet drivers with bounded concurrency and yield NDJSON lines as each finishes.
+
+    analyze(driver) returns the analysis result. Drivers with the same
+    statistical profile share one completion, requested with the first such
+    driver's prompt; present(driver, result) turns it into that driver's own
+    result. A final summary line reports driver, unique and error counts.
+    """
+    def label(driver):
+        return {"driver_id": driver.driver_id}
+
+    async def prepare(driver):
+        if driver.error:
+            raise HTTPException(status_code=400, detail=driver.error)
+        return driver.profile_key, lambda: analyze(driver)
+
+    return stream_shared_results(drivers, label, prepare, FLEET_CONCURRENCY, "drivers", present)
@@ -1,10 +1,11 @@
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 # Import the API routes
-from app import app as api_app
+from app import app as api_app, health_check as api_health_check
+from common.metrics import metrics_endpoint
+from common.static_files import PrecompressedStaticFiles
 
 app = FastAPI(title="Traffic Fine Analyzer")
 
@@ -20,12 +21,25 @@ app.add_middleware(
 # Mount the API routes
 app.mount("/api/traffic-fine", api_app)
 
-# Mount static files
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+# Mounted sub-apps do not receive lifespan events, so forward them
+@app.on_event("startup")
+async def startup():
+    await api_app.router.startup()
 
+@app.on_event("shutdown")
+async def shutdown():
+    await api_app.router.shutdown()
+
+# Registered before the static mount, which would otherwise match /health
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return await api_health_check()
+
+# Metrics of the whole process, at the path scrapers expect
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+# Static files, compressed once here and served from memory with ETags
+app.mount("/", PrecompressedStaticFiles(directory="static", html=True), name="static")
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=True)
@@ -0,0 +1,149 @@
+import os
+from collections import Counter
+
+# Prompt size settings
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "3000"))  # For the fine history section
+PROMPT_FINE_PRIORITY = os.environ.get("PROMPT_FINE_PRIORITY", "recent")  # "recent" or "severe"
+PROMPT_SUMMARY_TOKENS = 400  # Reserved for the summary of fines that are not listed
+PROMPT_FIELD_CHARS = 200
+SUMMARY_TYPES = 10
+SUMMARY_MONTHS = 12
+SUMMARY_LOCATIONS = 5
+
+def estimate_tokens(text):
+    """Rough token count for English text (about four characters per token)"""
+    return len(text) // 4 + 1
+
+def _clip(text, limit=PROMPT_FIELD_CHARS):
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def format_fine(number, fine):
+    line = f"{number}. Date: {fine.date}, Type: {_clip(fine.type)}, Amount: {fine.amount}"
+    if fine.location:
+        line += f", Location: {_clip(fine.location)}"
+    if fine.description:
+        line += f", Description: {_clip(fine.description)}"
+    return line
+
+def _priority_order(fines, priority):
+    """Indices of fines, most important first"""
+    if priority == "severe":
+        return sorted(range(len(fines)), key=lambda i: (fines[i].amount, fines[i].date), reverse=True)
+    return sorted(range(len(fines)), key=lambda i: fines[i].date, reverse=True)
+
+def _summarize(fines):
+    """Aggregate counts per type, month and location for fines that are not listed"""
+    types = Counter()
+    type_amounts = Counter()
+    months = Counter()
+    locations = Counter()
+    for fine in fines:
+        types[fine.type] += 1
+        type_amounts[fine.type] += fine.amount
+        months[fine.date[:7]] += 1
+        if fine.location:
+            locations[fine.location] += 1
+    return summary_lines(types, type_amounts, months, locations)
+
+def summary_lines(types, type_amounts, months, locations):
+    """Summary of the fines that are not listed, from their counts per type, month and location"""
+    total_amount = round(sum(type_amounts.values()), 2)
+    lines = [f"Earlier fines not listed above: {sum(types.values())} fines, total amount {total_amount}"]
+
+    by_type = [
+        f"{_clip(name, 60)} x{count} ({round(type_amounts[name], 2)})"
+        for name, count in types.most_common(SUMMARY_TYPES)
+    ]
+    if len(types) > SUMMARY_TYPES:
+        by_type.append(f"{len(types) - SUMMARY_TYPES} other types")
+    lines.append("- By type: " + ", ".join(by_type))
+
+    recent_months = sorted(months)[-SUMMARY_MONTHS:]
+    by_month = [f"{_clip(month, 10)}: {months[month]}" for month in recent_months]
+    if len(months) > SUMMARY_MONTHS:
+        earlier = sum(months.values()) - sum(months[month] for month in recent_months)
+        by_month.insert(0, f"before {recent_months[0]}: {earlier}")
+    lines.append("- By month: " + ", ".join(by_month))
+
+    if locations:
+        by_location = [
+            f"{_clip(name, 60)}: {count}"
+            for name, count in locations.most_common(SUMMARY_LOCATIONS)
+        ]
+        lines.append("- By location: " + ", ".join(by_location))
+    return lines
+
+def build_history_text(fines, budget=PROMPT_TOKEN_BUDGET, priority=PROMPT_FINE_PRIORITY):
+    """
+    Build the fine history section of the prompt within a token budget.
+
+    Short histories are listed in full. Otherwise the most recent (or, with
+    priority "severe", the most expensive) fines are listed in their original
+    order and numbering, and the rest are summarized as counts per type,
+    month and location, so the section stays bounded however long the
+    history is.
+    """
+    lines = []
+    used = 0
+    for i, fine in enumerate(fines, 1):
+        line = format_fine(i, fine)
+        used += estimate_tokens(line)
+        if used > budget:
+            break
+        lines.append(line)
+    else:
+        return "Fine History:\n" + "\n".join(lines) + "\n"
+
+    listed = []
+    used = 0
+    for i in _priority_order(fines, priority):
+        line = format_fine(i + 1, fines[i])
+        tokens = estimate_tokens(line)
+        if used + tokens > budget - PROMPT_SUMMARY_TOKENS:
+            break
+        listed.append(i)
+        used += tokens
+
+    listed.sort()
+    shown = set(listed)
+    lines = [format_fine(i + 1, fines[i]) for i in listed]
+    lines += [""] + _summarize([fine for i, fine in enumerate(fines) if i not in shown])
+    return "Fine History:\n" + "\n".join(lines) + "\n"
+
+def build_recent_history_text(recent, first_number, types, type_amounts, months, locations,
+                              budget=PROMPT_TOKEN_BUDGET):
+    """
+    Build the fine history section from a driver's latest fines and running counts.
+
+    recent holds the latest fines in order, numbered from first_number; the
+    Counters cover every fine, recent ones included. As many of the latest
+    fines as fit are listed and everything older is summarized from the
+    counts, so the cost follows len(recent) rather than the history length.
+    """
+    if first_number == 1:
+        return build_history_text(recent, budget, priority="recent")
+
+    listed = []
+    used = 0
+    for i in range(len(recent) - 1, -1, -1):
+        line = format_fine(first_number + i, recent[i])
+        tokens = estimate_tokens(line)
+        if used + tokens > budget - PROMPT_SUMMARY_TOKENS:
+            break
+        listed.append(line)
+        used += tokens
+    listed.reverse()
+
+    # The summary covers whatever is not listed: the counts minus the listed fines
+    types, type_amounts, months, locations = Counter(types), Counter(type_amounts), Counter(months), Counter(locations)
+    for fine in recent[len(recent) - len(listed):]:
+        types[fine.type] -= 1
+        type_amounts[fine.type] -= fine.amount
+        months[fine.date[:7]] -= 1
+        if fine.location:
+            locations[fine.location] -= 1
+    types, months, locations = +types, +months, +locations
+    type_amounts = Counter({name: type_amounts[name] for name in types})
+
+    lines = listed + [""] + summary_lines(types, type_amounts, months, locations)
+    return "Fine History:\n" + "\n".join(lines) + "\n"
@@ -0,0 +1,72 @@
+import os
+import json
+import hashlib
+from collections import Counter
+
+from common.cache import TieredCache
+
+# Prompt cache settings
+PROMPT_CACHE_MAX_ENTRIES = int(os.environ.get("PROMPT_CACHE_MAX_ENTRIES", "4096"))
+PROMPT_CACHE_MAX_BYTES = int(os.environ.get("PROMPT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PROMPT_CACHE_TTL = float(os.environ.get("PROMPT_CACHE_TTL", "86400"))
+PROMPT_CACHE_DB = os.environ.get("PROMPT_CACHE_DB", "")  # Empty disables the disk tier
+# "history" keys on the full normalized fine history; "profile" keys on fine
+# type counts and bucketed amounts, so similar drivers share one completion
+PROMPT_CACHE_KEY_MODE = os.environ.get("PROMPT_CACHE_KEY_MODE", "history")
+PROMPT_CACHE_AMOUNT_BUCKET = float(os.environ.get("PROMPT_CACHE_AMOUNT_BUCKET", "500"))
+
+def _normalize_text(text):
+    return " ".join((text or "").split())
+
+def history_profile(fines):
+    """Canonical form of a fine history: whitespace-normalized fines in sorted order"""
+    return sorted(
+        (
+            _normalize_text(fine.date),
+            _normalize_text(fine.type),
+            round(fine.amount, 2),
+            _normalize_text(fine.location),
+            _normalize_text(fine.description)
+        )
+        for fine in fines
+    )
+
+def statistical_profile(fines, amount_bucket=PROMPT_CACHE_AMOUNT_BUCKET):
+    """Coarse profile of a fine history: sorted type counts and bucketed total amount"""
+    type_counts = Counter(_normalize_text(fine.type).lower() for fine in fines)
+    total_amount = sum(fine.amount for fine in fines)
+    return [sorted(type_counts.items()), int(total_amount // amount_bucket)]
+
+def make_key(fines, model, temperature, system_message, prompt_version, mode=PROMPT_CACHE_KEY_MODE):
+    """Build a cache key from a fine history and the completion parameters"""
+    profile = statistical_profile(fines) if mode == "profile" else history_profile(fines)
+    meta = json.dumps([mode, model, temperature, system_message, prompt_version, profile])
+    return hashlib.sha256(meta.encode("utf-8")).hexdigest()
+
+class PromptCache(TieredCache):
+    """
+    Two-tier cache of DeepSeek analyses: in-memory LRU in front of an optional SQLite store.
+
+    Each entry remembers how long its upstream call took, so hits can report
+    the upstream latency they saved.
+    """
+
+    def __init__(self, max_entries=PROMPT_CACHE_MAX_ENTRIES, max_bytes=PROMPT_CACHE_MAX_BYTES,
+                 ttl=PROMPT_CACHE_TTL, db_path=PROMPT_CACHE_DB):
+        super().__init__(max_entries, max_bytes, ttl, db_path, "prompt_cache")
+        self.saved_seconds = 0.0
+
+    async def get(self, key):
+        entry = await super().get(key)
+        if entry is None:
+            return None
+        self.saved_seconds += entry["latency"]
+        return entry["value"]
+
+    async def set(self, key, value, latency):
+        await super().set(key, {"value": value, "latency": latency})
+
+    def stats(self):
+        stats = super().stats()
+        stats["saved_upstream_seconds"] = round(self.saved_seconds, 3)
+        return {"key_mode": PROMPT_CACHE_KEY_MODE, **stats}
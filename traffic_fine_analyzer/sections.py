@@ -0,0 +1,75 @@
+from common.section_parser import SectionParser, StreamScanner
+
+# Sections of the analysis, in the order the prompt asks for them:
+# (result key, heading, heading of the next section)
+SECTIONS = [
+    ("pattern_analysis", "Pattern Analysis", "Personalized Safety Tips"),
+    ("safety_tips", "Personalized Safety Tips", "Educational Information"),
+    ("educational_info", "Educational Information", "Potential Financial Savings"),
+    ("financial_savings", "Potential Financial Savings", "Recommended Behavioral Changes"),
+    ("behavioral_changes", "Recommended Behavioral Changes", None)
+]
+
+parser = SectionParser(SECTIONS)
+
+def extract_sections(text):
+    """Extract every section from a complete analysis text, keyed by result key"""
+    return parser.headings(text)
+
+class SectionStream:
+    """
+    Incremental section parser for a streamed analysis.
+
+    feed() takes each text delta and returns the sections whose content is
+    final, which is once both its "## " heading line and the next
+    section's have fully arrived.
+    close() returns the rest at the end of the stream. Sections come from
+    the same parser as extract_sections, so they match what the complete
+    text would give. Headings are tracked with a StreamScanner, so each
+    delta is scanned once and the text is only parsed when a section
+    completes.
+    """
+
+    def __init__(self):
+        self._scanner = StreamScanner([f"## {start}" for _, start, _ in SECTIONS] + ["\n"])
+        self._next = 0
+
+    @property
+    def text(self):
+        return self._scanner.text
+
+    def feed(self, delta):
+        scanner = self._scanner
+        scanner.feed(delta)
+        if "\n" not in delta:
+            # A heading line can only be complete once its newline arrives
+            return []
+
+        # Only "## " headings are final while text is still arriving: extract_sections
+        # prefers them, so a bold or plain heading seen now could still lose to a
+        # "## " one later. Sections with other heading forms are left to close().
+        first = self._next
+        while self._next < len(SECTIONS):
+            key, start, end = SECTIONS[self._next]
+            if end is None:
+                break
+            start_idx = scanner.find(f"## {start}")
+            if start_idx == -1:
+                break
+            start_idx = scanner.find("\n", start_idx)
+            if start_idx == -1:
+                break
+            end_idx = scanner.find(f"## {end}", start_idx + 1)
+            if end_idx == -1 or scanner.find("\n", end_idx) == -1:
+                break
+            self._next += 1
+        if self._next == first:
+            return []
+        sections = parser.headings(scanner.text)
+        return [(key, sections[key]) for key, _, _ in SECTIONS[first:self._next]]
+
+    def close(self):
+        sections = parser.headings(self.text)
+        remaining = [(key, sections[key]) for key, _, _ in SECTIONS[self._next:]]
+        self._next = len(SECTIONS)
+        return remaining